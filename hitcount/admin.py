@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.core.exceptions import PermissionDenied
 from django.utils.translation import gettext_lazy as _
 
+from hitcount.backends import get_backend
 from hitcount.conf import settings
 from hitcount.models import BlockedIP
 from hitcount.models import BlockedUserAgent
@@ -88,12 +89,19 @@ admin.site.register(Hit, HitAdmin)
 
 
 class HitCountAdmin(admin.ModelAdmin):
-    list_display = ("content_object", "hits", "modified")
+    list_display = ("content_object", "total_hits", "modified")
     fields = ("hits",)
 
     def has_add_permission(self, request):
         return False
 
+    def get_queryset(self, request):
+        return get_backend().annotate_totals(super().get_queryset(request))
+
+    @admin.display(description=_("hits"), ordering="hits")
+    def total_hits(self, obj):
+        return get_backend().get_total(obj)
+
 
 admin.site.register(_get_model_from_string(settings.HITCOUNT_HITCOUNT_MODEL), HitCountAdmin)
 
@@ -106,7 +114,8 @@ admin.site.register(BlockedIP, BlockedIPAdmin)
 
 
 class BlockedUserAgentAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("user_agent", "match_type")
+    list_filter = ("match_type",)
 
 
 admin.site.register(BlockedUserAgent, BlockedUserAgentAdmin)
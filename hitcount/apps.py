@@ -7,4 +7,11 @@ class HitCountAppConfig(AppConfig):
     verbose_name = _("hitcount")
 
     def ready(self):
-        import hitcount.signals  # noqa: F401
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import m2m_changed
+
+        from hitcount.signals import invalidate_user_groups_handler
+
+        User = get_user_model()
+        if hasattr(User, "groups"):
+            m2m_changed.connect(invalidate_user_groups_handler, sender=User.groups.through)
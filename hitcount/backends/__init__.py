@@ -0,0 +1,16 @@
+from django.utils.module_loading import import_string
+
+from hitcount.conf import settings
+
+
+_backends = {}
+
+
+def get_backend():
+    """Return the instance of the backend set by HITCOUNT_BACKEND."""
+    path = settings.HITCOUNT_BACKEND
+    try:
+        return _backends[path]
+    except KeyError:
+        backend = _backends[path] = import_string(path)()
+        return backend
@@ -0,0 +1,105 @@
+from asgiref.sync import sync_to_async
+
+from hitcount.exclusions import excluded_users
+from hitcount.models import BlockedIP
+from hitcount.models import BlockedUserAgent
+
+
+class BaseBackend:
+    """
+    Interface of the storage used for counting hits.
+
+    A backend increments and reads the totals of HitCount objects, tells
+    whether a visitor has reached its limit of active hits, and counts the
+    hits of an object over a recent window of time.
+    """
+
+    def increment(self, hitcount, amount=1):
+        """
+        Add `amount` (which may be negative) to the total of `hitcount`.
+
+        Returns the new total, or None when it can't be known without another
+        query.
+        """
+        raise NotImplementedError("subclasses of BaseBackend must provide an increment() method")
+
+    def get_total(self, hitcount):
+        """Return the total number of hits of `hitcount`."""
+        raise NotImplementedError("subclasses of BaseBackend must provide a get_total() method")
+
+    def annotate_totals(self, queryset):
+        """
+        Return `queryset`, of HitCount objects, loading along with them what
+        `get_total()` needs, so that reading the totals of many of them
+        doesn't take a query each.
+        """
+        return queryset
+
+    def has_limit_reached_by_ip(self, ip=None):
+        """Return whether `ip` has reached HITCOUNT_HITS_PER_IP_LIMIT."""
+        raise NotImplementedError("subclasses of BaseBackend must provide a has_limit_reached_by_ip() method")
+
+    def has_limit_reached_by_session(self, session_key, hitcount):
+        """Return whether `session_key` has reached HITCOUNT_HITS_PER_SESSION_LIMIT for `hitcount`."""
+        raise NotImplementedError("subclasses of BaseBackend must provide a has_limit_reached_by_session() method")
+
+    def get_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        """
+        Return the reason for not counting a hit on `hitcount`, or None if it
+        should be counted.
+
+        The reason is one of "blocked_ip", "blocked_user_agent",
+        "excluded_user_group", "ip_limit" and "session_limit", checked in that
+        order.
+        """
+        # first, check our request against the IP blocked
+        if BlockedIP.objects.is_blocked(ip):
+            return "blocked_ip"
+
+        # second, check our request against the user agent blocked
+        if BlockedUserAgent.objects.is_blocked(user_agent):
+            return "blocked_user_agent"
+
+        # third, see if we are excluding a specific user group or not
+        if excluded_users.is_excluded(user):
+            return "excluded_user_group"
+
+        # eliminated first three possible exclusions, now on to checking the
+        # active hits to see if we should count another one
+        if self.has_limit_reached_by_ip(ip):
+            return "ip_limit"
+
+        if self.has_limit_reached_by_session(session_key, hitcount):
+            return "session_limit"
+
+        return None
+
+    def get_exclusion_reasons(self, hitcounts, ip=None, user_agent=None, user=None, session_key=None):
+        """
+        Return the reason for not counting a hit on each of `hitcounts`, or
+        None for the ones it should be counted on, by their pk.
+        """
+        return {
+            hitcount.pk: self.get_exclusion_reason(
+                hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+            )
+            for hitcount in hitcounts
+        }
+
+    async def aget_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        """Asynchronous version of `get_exclusion_reason()`."""
+        return await sync_to_async(self.get_exclusion_reason)(
+            hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+        )
+
+    def hits_in_last(self, hitcount, **kwargs):
+        """Return the number of hits of `hitcount` in the given `timedelta` period."""
+        raise NotImplementedError("subclasses of BaseBackend must provide a hits_in_last() method")
+
+    def reconcile(self):
+        """
+        Write the totals kept outside the HitCount table back to it.
+
+        Returns the number of HitCount objects that were updated.
+        """
+        return 0
@@ -0,0 +1,86 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F
+
+from hitcount.backends.db import DatabaseBackend
+from hitcount.conf import settings
+from hitcount.utils import get_hitcount_model
+
+
+class CacheBackend(DatabaseBackend):
+    """
+    Keeps the increments of the totals in the cache set by HITCOUNT_BACKEND_CACHE.
+
+    The increments are added atomically with the cache's `incr()` and are
+    written back to the HitCount table by `reconcile()` (see the
+    `hitcount_flush` management command). Active hits and hits in a period
+    are still read from the Hit table.
+    """
+
+    key_prefix = "hitcount:hits"
+    reconcile_batch_size = 1000
+    # how long a running reconciliation keeps others from starting, in seconds.
+    reconcile_lock_timeout = 60 * 10
+
+    def __init__(self):
+        self.cache = caches[settings.HITCOUNT_BACKEND_CACHE]
+
+    def make_key(self, pk):
+        return "%s:%s" % (self.key_prefix, pk)
+
+    def increment(self, hitcount, amount=1):
+        key = self.make_key(hitcount.pk)
+        self.cache.add(key, 0, timeout=None)
+        try:
+            increments = self.cache.incr(key, amount)
+        except ValueError:
+            # the key was evicted in between.
+            self.cache.set(key, amount, timeout=None)
+            increments = amount
+        return super().get_total(hitcount) + increments
+
+    def get_total(self, hitcount):
+        return super().get_total(hitcount) + (self.cache.get(self.make_key(hitcount.pk)) or 0)
+
+    def reconcile(self):
+        lock_key = "%s:reconcile" % self.key_prefix
+        if not self.cache.add(lock_key, 1, timeout=self.reconcile_lock_timeout):
+            return 0
+
+        HitCount = get_hitcount_model()
+        number_updated = 0
+        try:
+            last_pk = 0
+            while True:
+                pks = HitCount.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)
+                keys = {self.make_key(pk): pk for pk in pks[: self.reconcile_batch_size]}
+                if not keys:
+                    break
+                last_pk = max(keys.values())
+
+                for key, amount in self.cache.get_many(keys).items():
+                    if not amount:
+                        continue
+                    HitCount.objects.filter(pk=keys[key]).update(hits=F("hits") + amount)
+                    # other processes may have incremented it since we read it.
+                    try:
+                        self.cache.incr(key, -amount)
+                    except ValueError:
+                        # the key was evicted in between, along with the increments just written.
+                        pass
+                    number_updated += 1
+        finally:
+            self.cache.delete(lock_key)
+
+        return number_updated
+
+
+class LocMemBackend(CacheBackend):
+    """
+    Keeps the increments of the totals in memory of the current process.
+
+    This is mostly useful for tests.
+    """
+
+    def __init__(self):
+        self.cache = LocMemCache("hitcount-backend", {"TIMEOUT": None})
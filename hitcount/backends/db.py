@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.db import connections
+from django.db import router
+from django.db.models import F
+from django.db.models.expressions import Combinable
+from django.utils import timezone
+
+from hitcount.backends.base import BaseBackend
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.models import HitRollup
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Default backend, stores everything in the HitCount and Hit tables.
+    """
+
+    def increment(self, hitcount, amount=1):
+        total = self._increment_returning(hitcount, amount)
+        if total is None:
+            hitcount.hits = F("hits") + amount
+            hitcount.save(update_fields=["hits"])
+        else:
+            hitcount.hits = total
+        return total
+
+    def _increment_returning(self, hitcount, amount):
+        """
+        Increment the total with an UPDATE ... RETURNING, on the databases
+        supporting it, and return the new total. Unlike the fallback, it
+        doesn't go through HitCount.save() nor send its signals.
+        """
+        model = type(hitcount)
+        connection = connections[router.db_for_write(model, instance=hitcount)]
+        if connection.vendor == "sqlite":
+            supported = connection.Database.sqlite_version_info >= (3, 35)
+        else:
+            supported = connection.vendor == "postgresql"
+        if not supported:
+            return None
+
+        quote_name = connection.ops.quote_name
+        hits = quote_name(model._meta.get_field("hits").column)
+        sql = "UPDATE %s SET %s = %s + %%s WHERE %s = %%s RETURNING %s" % (
+            quote_name(model._meta.db_table),
+            hits,
+            hits,
+            quote_name(model._meta.pk.column),
+            hits,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [amount, hitcount.pk])
+            row = cursor.fetchone()
+        # without a row, the save() of the fallback raises the usual error.
+        return row[0] if row else None
+
+    def get_total(self, hitcount):
+        if isinstance(hitcount.hits, Combinable):
+            # the total was just incremented, the value is only known to the database.
+            hitcount.refresh_from_db(fields=["hits"])
+        return hitcount.hits
+
+    def has_limit_reached_by_ip(self, ip=None):
+        return Hit.objects.has_limit_reached_by_ip(ip)
+
+    def has_limit_reached_by_session(self, session_key, hitcount):
+        return Hit.objects.has_limit_reached_by_session(session_key, hitcount)
+
+    def get_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        return Hit.objects.get_exclusion_reason(
+            hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+        )
+
+    def get_exclusion_reasons(self, hitcounts, ip=None, user_agent=None, user=None, session_key=None):
+        return Hit.objects.get_exclusion_reasons(
+            hitcounts, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+        )
+
+    async def aget_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        return await Hit.objects.aget_exclusion_reason(
+            hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+        )
+
+    def hits_in_last(self, hitcount, **kwargs):
+        period = timezone.now() - timedelta(**kwargs)
+        if settings.HITCOUNT_ROLLUPS:
+            return HitRollup.objects.count_hits(hitcount, period)
+        return hitcount.hit_set.filter(created__gte=period).count()
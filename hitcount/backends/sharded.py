@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from hitcount.backends.db import DatabaseBackend
+from hitcount.conf import settings
+from hitcount.models import HitCountShard
+from hitcount.utils import get_hitcount_model
+
+
+class ShardedBackend(DatabaseBackend):
+    """
+    Spreads the increments of popular objects over several rows.
+
+    Once an object gets more than HITCOUNT_SHARD_PROMOTION_RATE hits in a
+    minute in a process, that process adds its increments, for the rest of
+    that minute and the next one, to one of HITCOUNT_SHARDS `HitCountShard`
+    rows picked at random, instead of the row of the HitCount. An object
+    stays promoted as long as it keeps up the rate. Totals are the sum of
+    both, and `reconcile()` (see the `hitcount_flush` management command)
+    folds the shards back into the HitCount.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window = None
+        self._rates = Counter()
+        # the objects promoted in the current minute and in the one before.
+        self._promoted = set()
+        self._previously_promoted = set()
+
+    def _is_promoted(self, pk):
+        promotion_rate = settings.HITCOUNT_SHARD_PROMOTION_RATE
+        if not promotion_rate:
+            return True
+
+        window = int(time.monotonic() // 60)
+        with self._lock:
+            if window != self._window:
+                # only the rates of the current minute are kept, and the older promotions expire.
+                if self._window is not None and window - self._window == 1:
+                    self._previously_promoted = self._promoted
+                else:
+                    self._previously_promoted = set()
+                self._promoted = set()
+                self._window = window
+                self._rates.clear()
+            if pk in self._promoted:
+                return True
+            self._rates[pk] += 1
+            if self._rates[pk] > promotion_rate:
+                self._promoted.add(pk)
+                return True
+            return pk in self._previously_promoted
+
+    def increment(self, hitcount, amount=1):
+        if not self._is_promoted(hitcount.pk):
+            return super().increment(hitcount, amount)
+
+        # the sum of the shards loaded by annotate_totals() is out of date.
+        vars(hitcount).pop("sharded_hits", None)
+        shard = random.randrange(settings.HITCOUNT_SHARDS)
+        shards = HitCountShard.objects.filter(hitcount_id=hitcount.pk, shard=shard)
+        if not shards.update(hits=F("hits") + amount):
+            # the shards were folded back by a reconciliation.
+            HitCountShard.objects.bulk_create(
+                [HitCountShard(hitcount_id=hitcount.pk, shard=i) for i in range(settings.HITCOUNT_SHARDS)],
+                ignore_conflicts=True,
+            )
+            shards.update(hits=F("hits") + amount)
+        # summing the shards would take another query.
+        return None
+
+    def annotate_totals(self, queryset):
+        shards = (
+            HitCountShard.objects.filter(hitcount=OuterRef("pk"))
+            .order_by()
+            .values("hitcount")
+            .annotate(hits=Sum("hits"))
+            .values("hits")
+        )
+        return queryset.annotate(sharded_hits=Coalesce(Subquery(shards), 0))
+
+    def get_total(self, hitcount):
+        if hitcount.pk is None:
+            # not saved, it can't have shards.
+            return super().get_total(hitcount)
+
+        sharded_hits = getattr(hitcount, "sharded_hits", None)
+        if sharded_hits is None:
+            sharded_hits = HitCountShard.objects.filter(hitcount_id=hitcount.pk).aggregate(hits=Sum("hits"))["hits"]
+        return super().get_total(hitcount) + (sharded_hits or 0)
+
+    def reconcile(self):
+        HitCount = get_hitcount_model()
+
+        with transaction.atomic():
+            shards = HitCountShard.objects.select_for_update().order_by("pk")
+            pks = []
+            totals = Counter()
+            for pk, hitcount_id, hits in shards.values_list("pk", "hitcount_id", "hits"):
+                pks.append(pk)
+                totals[hitcount_id] += hits
+            HitCountShard.objects.filter(pk__in=pks).delete()
+
+            for hitcount_id, hits in totals.items():
+                if hits:
+                    HitCount.objects.filter(pk=hitcount_id).update(hits=F("hits") + hits)
+
+        return len(totals)
@@ -0,0 +1,270 @@
+import ipaddress
+import re
+import threading
+import time
+
+from django.apps import apps
+from django.core.cache import caches
+
+from hitcount.conf import settings
+from hitcount.utils import VersionedCacheMixin
+from hitcount.utils import get_trie_pattern
+
+
+class IPNetworkSet:
+    """
+    Set of IPv4 and IPv6 networks that tells whether it contains an address.
+
+    The networks are kept in a prefix table: for each IP version and prefix
+    length, the set of the network prefixes as integers. An address is looked
+    up with one hash lookup per distinct prefix length (at most 33 for IPv4
+    and 129 for IPv6), however many networks the set holds.
+    """
+
+    def __init__(self, networks=()):
+        self._prefixes = {4: {}, 6: {}}
+        for network in networks:
+            self.add(network)
+
+    def add(self, network):
+        network = ipaddress.ip_network(network, strict=False)
+        shift = network.max_prefixlen - network.prefixlen
+        self._prefixes[network.version].setdefault(network.prefixlen, set()).add(int(network.network_address) >> shift)
+
+    def __contains__(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        value = int(address)
+        for prefixlen, prefixes in self._prefixes[address.version].items():
+            if value >> (address.max_prefixlen - prefixlen) in prefixes:
+                return True
+        return False
+
+    def __len__(self):
+        return sum(len(prefixes) for by_length in self._prefixes.values() for prefixes in by_length.values())
+
+
+class UserAgentMatcher:
+    """
+    Tells whether a user agent matches any of the blocked user agents.
+
+    Exact user agents are kept in a set. All the others are compiled together
+    into a single regular expression, in which the case-insensitive substrings
+    are arranged as a trie, so a user agent is scanned only once however many
+    of them there are.
+    """
+
+    def __init__(self, rules=()):
+        """`rules` is an iterable of `(user_agent, match_type)` pairs."""
+        exact = set()
+        substrings = set()
+        expressions = []
+        for user_agent, match_type in rules:
+            if match_type == "contains":
+                substrings.add(user_agent.lower())
+            elif match_type == "regex":
+                expressions.append(user_agent)
+            else:
+                exact.add(user_agent)
+
+        self.exact = frozenset(exact)
+        self.patterns = []
+
+        alternatives = []
+        if substrings:
+            alternatives.append("(?i:%s)" % get_trie_pattern(substrings))
+        for expression in expressions:
+            try:
+                re.compile("(?:%s)" % expression)
+            except re.error:
+                # not a valid expression, it can't match any user agent.
+                continue
+            alternatives.append("(?:%s)" % expression)
+
+        if alternatives:
+            try:
+                self.patterns = [re.compile("|".join(alternatives))]
+            except re.error:
+                # e.g. the same group name used by more than one expression.
+                self.patterns = [re.compile(alternative) for alternative in alternatives]
+
+    def __contains__(self, user_agent):
+        if user_agent in self.exact:
+            return True
+        return any(pattern.search(user_agent) for pattern in self.patterns)
+
+
+class Blocklist(VersionedCacheMixin):
+    """
+    In-process copy of the blocked IPs and user agents.
+
+    The copy is stamped with a version shared by all the processes through the
+    cache set by HITCOUNT_BLOCKLIST_CACHE. Saving or deleting a BlockedIP or
+    a BlockedUserAgent changes the version, and every process reloads its copy
+    the next time it notices it, which it checks for at most once every
+    HITCOUNT_BLOCKLIST_CHECK_INTERVAL seconds.
+    """
+
+    version_key = "hitcount:blocklist:version"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+        self.ips = IPNetworkSet()
+        self.user_agents = UserAgentMatcher()
+
+    @property
+    def cache(self):
+        return caches[settings.HITCOUNT_BLOCKLIST_CACHE]
+
+    def _is_check_due(self, now):
+        return self._checked_at is None or now - self._checked_at >= settings.HITCOUNT_BLOCKLIST_CHECK_INTERVAL
+
+    def refresh(self):
+        """Reload the blocklists if they have changed since they were loaded."""
+        now = time.monotonic()
+        if not self._is_check_due(now):
+            return
+
+        version = self.get_version()
+        with self._lock:
+            if version != self._version:
+                self.load()
+                self._version = version
+            self._checked_at = now
+
+    async def arefresh(self):
+        now = time.monotonic()
+        if not self._is_check_due(now):
+            return
+
+        version = await self.aget_version()
+        if version != self._version:
+            # the lock can't be held across the queries, the last load wins.
+            ips = [ip async for ip in self._get_blocked_ips()]
+            user_agents = [rule async for rule in self._get_blocked_user_agents()]
+            with self._lock:
+                self._set(ips, user_agents)
+                self._version = version
+        self._checked_at = now
+
+    def _get_blocked_ips(self):
+        return apps.get_model("hitcount", "BlockedIP").objects.values_list("ip", flat=True)
+
+    def _get_blocked_user_agents(self):
+        return apps.get_model("hitcount", "BlockedUserAgent").objects.values_list("user_agent", "match_type")
+
+    def _set(self, ips, user_agents):
+        ip_set = IPNetworkSet()
+        for ip in ips:
+            try:
+                ip_set.add(ip)
+            except ValueError:
+                # not a valid network, it can't match any address.
+                continue
+        self.ips = ip_set
+        self.user_agents = UserAgentMatcher(user_agents)
+
+    def load(self):
+        self._set(self._get_blocked_ips().iterator(), self._get_blocked_user_agents())
+
+    def clear(self):
+        """Make the current process reload its blocklists."""
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+    def invalidate(self):
+        """Make every process reload its blocklists."""
+        self.change_version()
+        self.clear()
+
+    def is_ip_blocked(self, ip):
+        self.refresh()
+        return ip in self.ips
+
+    def is_user_agent_blocked(self, user_agent):
+        self.refresh()
+        return user_agent in self.user_agents
+
+    async def ais_ip_blocked(self, ip):
+        await self.arefresh()
+        return ip in self.ips
+
+    async def ais_user_agent_blocked(self, user_agent):
+        await self.arefresh()
+        return user_agent in self.user_agents
+
+
+class BlockedExpressions:
+    """
+    In-process UserAgentMatcher of the blocked regular expressions, used when
+    HITCOUNT_BLOCKLIST_CACHE is not set, since they are matched in Python.
+
+    The expressions are read again at most once every
+    HITCOUNT_BLOCKLIST_CHECK_INTERVAL seconds, and only compiled again when
+    they have changed. Saving or deleting a BlockedUserAgent makes the current
+    process read them again on its next check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expressions = None
+        self._checked_at = None
+        self.matcher = UserAgentMatcher()
+
+    def _is_check_due(self, now):
+        return self._checked_at is None or now - self._checked_at >= settings.HITCOUNT_BLOCKLIST_CHECK_INTERVAL
+
+    def _get_expressions(self):
+        BlockedUserAgent = apps.get_model("hitcount", "BlockedUserAgent")
+        return (
+            BlockedUserAgent.objects.filter(match_type=BlockedUserAgent.MatchType.REGEX)
+            .order_by("pk")
+            .values_list("user_agent", flat=True)
+        )
+
+    def _set(self, expressions, now):
+        expressions = tuple(expressions)
+        if expressions != self._expressions:
+            self.matcher = UserAgentMatcher((expression, "regex") for expression in expressions)
+            self._expressions = expressions
+        self._checked_at = now
+
+    def refresh(self):
+        now = time.monotonic()
+        if not self._is_check_due(now):
+            return
+
+        with self._lock:
+            self._set(self._get_expressions(), now)
+
+    async def arefresh(self):
+        now = time.monotonic()
+        if not self._is_check_due(now):
+            return
+
+        expressions = [expression async for expression in self._get_expressions()]
+        with self._lock:
+            self._set(expressions, now)
+
+    def clear(self):
+        with self._lock:
+            self._checked_at = None
+
+    def is_blocked(self, user_agent):
+        self.refresh()
+        return user_agent in self.matcher
+
+    async def ais_blocked(self, user_agent):
+        await self.arefresh()
+        return user_agent in self.matcher
+
+
+blocklist = Blocklist()
+
+blocked_expressions = BlockedExpressions()
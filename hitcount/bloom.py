@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db import connections
+
+from hitcount.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings, of a fixed size.
+
+    It never says that a string it was given is missing, but may say, with a
+    probability close to `error_rate` once it holds `capacity` strings, that
+    it contains one it was never given. `count` is the number of strings
+    added, and goes over `capacity` once the filter is saturated.
+    """
+
+    def __init__(self, capacity, error_rate, bits=None):
+        self.count = 0
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        if bits is not None:
+            self.update(bits)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # double hashing, see Kirsch and Mitzenmacher, "Less Hashing, Same Performance".
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def update(self, bits):
+        """Add all the strings of another filter of the same size, given its bits."""
+        if len(bits) != len(self.bits):
+            raise ValueError("Bloom filters of different sizes can't be merged.")
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filters that forget the strings added to them after `period`.
+
+    The period is split in `slices`, each with its own filter. Strings are
+    added to the filter of the current slice, and looked up in the filters of
+    the slices still within the period. The filters of older slices are
+    dropped, which keeps the memory used bounded.
+
+    When a `cache` alias is given, the filters are merged every
+    `sync_interval` seconds with the ones stored in that cache, which is how
+    processes learn about the strings added by the others.
+    """
+
+    key_prefix = "hitcount:bloom"
+    sync_interval = 5
+
+    def __init__(self, period, slices, capacity, error_rate, cache=None):
+        self.slice_duration = period.total_seconds() / slices
+        self.slices = slices
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache = caches[cache] if cache else None
+        self._lock = threading.Lock()
+        self._filters = {}
+        self._synced_at = None
+
+    def _get_current_index(self):
+        return int(time.time() // self.slice_duration)
+
+    def _get_live_indexes(self):
+        current = self._get_current_index()
+        return range(current - self.slices, current + 1)
+
+    def _get_filter(self, index):
+        try:
+            return self._filters[index]
+        except KeyError:
+            bloom_filter = self._filters[index] = BloomFilter(self.capacity, self.error_rate)
+            return bloom_filter
+
+    def _rotate(self):
+        live_indexes = self._get_live_indexes()
+        for index in list(self._filters):
+            if index not in live_indexes:
+                del self._filters[index]
+
+    def _sync_if_due(self):
+        """
+        Merge the filters with the ones stored in the cache, at most once
+        every `sync_interval` seconds.
+
+        The lock is only held to read and merge the filters, not while talking
+        to the cache.
+        """
+        if self.cache is None:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            # the other threads leave this sync to the current one.
+            self._synced_at = now
+            keys = {"%s:%s" % (self.key_prefix, index): index for index in self._get_live_indexes()}
+
+        shared = self.cache.get_many(keys)
+
+        with self._lock:
+            for key, index in keys.items():
+                bloom_filter = self._get_filter(index)
+                try:
+                    bloom_filter.update(shared[key])
+                except (KeyError, ValueError):
+                    # not stored yet, or by a filter of another size.
+                    pass
+            merged = {key: bytes(self._filters[index].bits) for key, index in keys.items()}
+
+        timeout = math.ceil(self.slice_duration * (self.slices + 1))
+        self.cache.set_many(merged, timeout=timeout)
+
+    def sync(self):
+        """Merge the filters with the ones stored in the cache now."""
+        with self._lock:
+            self._synced_at = None
+        self._sync_if_due()
+
+    def is_shared(self):
+        """Return whether the cache already holds filters of the period, stored by another process."""
+        if self.cache is None:
+            return False
+        return bool(self.cache.get_many(["%s:%s" % (self.key_prefix, index) for index in self._get_live_indexes()]))
+
+    def add(self, key, timestamp=None):
+        """Add a string, to the slice of `timestamp` if given, unless it's already out of the period."""
+        self._sync_if_due()
+        with self._lock:
+            self._rotate()
+            index = self._get_current_index() if timestamp is None else int(timestamp // self.slice_duration)
+            if index not in self._get_live_indexes():
+                return
+            bloom_filter = self._get_filter(index)
+            bloom_filter.add(key)
+            saturated = bloom_filter.count == self.capacity + 1
+
+        if saturated:
+            logger.warning(
+                "A slice of the Bloom filter holds more than its capacity of %s strings, its false positive rate "
+                "is now over %s.",
+                self.capacity,
+                self.error_rate,
+            )
+
+    def __contains__(self, key):
+        self._sync_if_due()
+        with self._lock:
+            self._rotate()
+            return any(key in bloom_filter for bloom_filter in self._filters.values())
+
+    def clear(self):
+        with self._lock:
+            self._filters.clear()
+            self._synced_at = None
+
+
+class SessionHitFilter:
+    """
+    Remembers which sessions hit which HitCount within HITCOUNT_KEEP_HIT_ACTIVE.
+
+    A session that it says has not hit a HitCount definitely has no active hit
+    on it, so there is no need to ask the database. For that to hold from the
+    start, the filter is seeded with the active hits when it's built, e.g.
+    after a restart or once it's enabled, on a thread of its own, unless
+    HITCOUNT_BLOOM_FILTER_CACHE already holds the filters. Until then, it
+    says that every session might have hit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._options = None
+        self._seeded = None
+
+    def _get_filter(self):
+        options = (
+            timedelta(**settings.HITCOUNT_KEEP_HIT_ACTIVE),
+            settings.HITCOUNT_BLOOM_FILTER_SLICES,
+            settings.HITCOUNT_BLOOM_FILTER_CAPACITY,
+            settings.HITCOUNT_BLOOM_FILTER_ERROR_RATE,
+            settings.HITCOUNT_BLOOM_FILTER_CACHE,
+        )
+        with self._lock:
+            if options != self._options:
+                self._filter, self._options, self._seeded = RotatingBloomFilter(*options), options, threading.Event()
+                self._start_seeding(self._filter, self._seeded)
+            return self._filter, self._seeded
+
+    def get_filter(self):
+        return self._get_filter()[0]
+
+    def _start_seeding(self, bloom_filter, seeded):
+        threading.Thread(
+            target=self._seed_in_background, args=(bloom_filter, seeded), name="hitcount-bloom-seed", daemon=True
+        ).start()
+
+    def _seed_in_background(self, bloom_filter, seeded):
+        try:
+            self._seed(bloom_filter)
+        except Exception:
+            # the database keeps being asked about every session.
+            logger.exception("Seeding the Bloom filter failed")
+        else:
+            seeded.set()
+        finally:
+            connections.close_all()
+
+    def _seed(self, bloom_filter):
+        if bloom_filter.is_shared():
+            return
+        hits = apps.get_model("hitcount", "Hit").objects.filter_active().order_by()
+        for session_key, hitcount_pk, created in hits.values_list("session", "hitcount_id", "created").iterator():
+            bloom_filter.add(self.make_key(session_key, hitcount_pk), created.timestamp())
+        # for the processes started in the meantime.
+        bloom_filter.sync()
+
+    def wait(self, timeout=None):
+        """Wait for the filter to be seeded and return whether it was."""
+        return self._get_filter()[1].wait(timeout)
+
+    @staticmethod
+    def make_key(session_key, hitcount_pk):
+        return "%s:%s" % (session_key, hitcount_pk)
+
+    def add(self, session_key, hitcount):
+        self.get_filter().add(self.make_key(session_key, hitcount.pk))
+
+    def might_contain(self, session_key, hitcount):
+        bloom_filter, seeded = self._get_filter()
+        return not seeded.is_set() or self.make_key(session_key, hitcount.pk) in bloom_filter
+
+    def clear(self):
+        with self._lock:
+            self._filter = None
+            self._options = None
+            self._seeded = None
+
+
+session_hit_filter = SessionHitFilter()
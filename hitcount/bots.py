@@ -0,0 +1,88 @@
+import functools
+import re
+
+try:
+    from django.utils.regex_helper import _lazy_re_compile
+except ImportError:
+    from django.core.validators import _lazy_re_compile
+
+from hitcount.utils import get_trie_pattern
+
+
+# lowercase substrings found in the user agents of well-known bots, crawlers,
+# link previewers, monitoring services and HTTP libraries. Most crawlers
+# (Googlebot, bingbot, AhrefsBot, Baiduspider...) are caught by the first few.
+BOT_SIGNATURES = (
+    "bot",
+    "crawl",
+    "spider",
+    "slurp",
+    "scrapy",
+    "headlesschrome",
+    "phantomjs",
+    "puppeteer",
+    "playwright",
+    "selenium",
+    "lighthouse",
+    "pagespeed",
+    "gtmetrix",
+    "pingdom",
+    "uptimerobot",
+    "statuscake",
+    "site24x7",
+    "mediapartners-google",
+    "feedfetcher",
+    "google-inspectiontool",
+    "google-read-aloud",
+    "bingpreview",
+    "yandex",
+    "sogou",
+    "ia_archiver",
+    "archive.org",
+    "semrush",
+    "ahrefs",
+    "bytespider",
+    "facebookexternalhit",
+    "facebookcatalog",
+    "meta-externalagent",
+    "embedly",
+    "quora link preview",
+    "whatsapp",
+    "skypeuripreview",
+    "vkshare",
+    "w3c_validator",
+    "feedburner",
+    "feedly",
+    "python-requests",
+    "python-urllib",
+    "aiohttp",
+    "httpx",
+    "curl/",
+    "wget/",
+    "libwww-perl",
+    "go-http-client",
+    "okhttp",
+    "java/",
+    "apache-httpclient",
+    "axios/",
+    "node-fetch",
+    "undici",
+    "postmanruntime",
+    "insomnia",
+    "httpie",
+)
+
+BOT_RE = _lazy_re_compile(get_trie_pattern(BOT_SIGNATURES), re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=4096)
+def is_bot(user_agent):
+    """
+    Return whether `user_agent` belongs to a well-known bot or crawler.
+
+    Browsers always send a user agent, so an empty one is considered a bot.
+    """
+    if not user_agent:
+        return True
+
+    return BOT_RE.search(user_agent) is not None
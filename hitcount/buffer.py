@@ -0,0 +1,119 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.db import connections
+from django.db import router
+from django.db import transaction
+
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.utils import get_hitcount_model
+
+
+logger = logging.getLogger(__name__)
+
+
+class HitBuffer:
+    """
+    Queues accepted hits in the current process and writes them in bulk.
+
+    The queued hits are written with `Hit.objects.bulk_record()` once
+    HITCOUNT_BUFFER_SIZE hits have been queued, or when a hit arrives more
+    than HITCOUNT_BUFFER_FLUSH_INTERVAL seconds after the last flush. Whatever
+    is left is flushed when the process exits.
+
+    The hits of HitCounts deleted in the meantime are dropped. The flushes
+    triggered by a hit queued in a transaction wait for it to be committed,
+    so that the hits of other requests aren't rolled back with it, and their
+    errors are logged rather than raised, so that the request that queued it
+    isn't failed for the hits of others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._hits)
+
+    def _append(self, hit):
+        """Queue a hit and return whether the queue should be flushed."""
+        with self._lock:
+            self._hits.append(hit)
+            return (
+                len(self._hits) >= settings.HITCOUNT_BUFFER_SIZE
+                or time.monotonic() - self._last_flush >= settings.HITCOUNT_BUFFER_FLUSH_INTERVAL
+            )
+
+    def add(self, hit):
+        if self._append(hit):
+            self._flush_soon()
+
+    def _flush_soon(self):
+        using = router.db_for_write(Hit)
+        if connections[using].in_atomic_block:
+            # a rollback discards the callback, the hits are left for the next flush.
+            transaction.on_commit(self._flush_quietly, using=using)
+        else:
+            self._flush_quietly()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing the buffered hits failed, they will be retried by the next flush")
+
+    def flush(self):
+        """Write all the queued hits and return how many were written."""
+        with self._lock:
+            hits, self._hits = self._hits, []
+            self._last_flush = time.monotonic()
+
+        if not hits:
+            return 0
+
+        try:
+            hits = self._drop_orphans(hits)
+            Hit.objects.bulk_record(hits)
+        except Exception:
+            # put the hits back so that they are retried by the next flush.
+            with self._lock:
+                self._hits[:0] = hits
+            raise
+
+        return len(hits)
+
+    def _drop_orphans(self, hits):
+        """Return the hits whose HitCount still exists, logging the others."""
+        pks = {hit.hitcount_id for hit in hits}
+        existing = set(get_hitcount_model().objects.filter(pk__in=pks).values_list("pk", flat=True))
+        if len(existing) == len(pks):
+            return hits
+
+        kept = [hit for hit in hits if hit.hitcount_id in existing]
+        logger.warning(
+            "Dropped %s buffered hits of deleted HitCounts %s",
+            len(hits) - len(kept),
+            sorted(pks - existing),
+        )
+        return kept
+
+
+hit_buffer = HitBuffer()
+
+
+def flush_hits(*args, **kwargs):
+    """
+    Write the hits buffered by the current process.
+
+    Meant to be called from the worker shutdown hooks of the servers whose
+    workers don't exit through `atexit`, e.g. gunicorn's `worker_exit` or
+    uWSGI's `uwsgi.atexit`; the arguments passed by the hook are ignored.
+    """
+    hit_buffer._flush_quietly()
+
+
+atexit.register(flush_hits)
@@ -6,8 +6,86 @@ HITCOUNT_HITS_PER_SESSION_LIMIT = 0
 
 HITCOUNT_EXCLUDE_USER_GROUP = ()
 
+HITCOUNT_EXCLUDE_USER_GROUP_CACHE = None
+
+HITCOUNT_EXCLUDE_USER_GROUP_CACHE_TIMEOUT = 300
+
 HITCOUNT_KEEP_HIT_IN_DATABASE = {"days": 30}
 
 HITCOUNT_USE_IP = True
 
 HITCOUNT_HITCOUNT_MODEL = "hitcount.HitCount"
+
+HITCOUNT_BUFFER_HITS = False
+
+HITCOUNT_BUFFER_SIZE = 100
+
+HITCOUNT_BUFFER_FLUSH_INTERVAL = 10
+
+HITCOUNT_BACKEND = "hitcount.backends.db.DatabaseBackend"
+
+HITCOUNT_BACKEND_CACHE = "default"
+
+HITCOUNT_BLOCKLIST_CACHE = None
+
+HITCOUNT_BLOCKLIST_CHECK_INTERVAL = 5
+
+HITCOUNT_EXCLUDE_BOTS = False
+
+HITCOUNT_BLOOM_FILTER = False
+
+HITCOUNT_BLOOM_FILTER_CAPACITY = 100000
+
+HITCOUNT_BLOOM_FILTER_ERROR_RATE = 0.001
+
+HITCOUNT_BLOOM_FILTER_SLICES = 4
+
+HITCOUNT_BLOOM_FILTER_CACHE = None
+
+HITCOUNT_UNIQUE_VISITORS = False
+
+HITCOUNT_UNIQUE_VISITORS_PRECISION = 12
+
+HITCOUNT_BACKGROUND_HITS = False
+
+HITCOUNT_BACKGROUND_WORKERS = 2
+
+HITCOUNT_BACKGROUND_QUEUE_SIZE = 1000
+
+HITCOUNT_BACKGROUND_OVERFLOW = "sync"
+
+HITCOUNT_IDENTITY = "session"
+
+HITCOUNT_SHARDS = 8
+
+HITCOUNT_SHARD_PROMOTION_RATE = 600
+
+HITCOUNT_TOTALS_CACHE = None
+
+HITCOUNT_TOTALS_CACHE_TIMEOUT = 60
+
+HITCOUNT_TOTALS_CACHE_STALE_TIMEOUT = 300
+
+HITCOUNT_ROLLUPS = False
+
+HITCOUNT_KEEP_HOURLY_ROLLUPS = {"weeks": 4}
+
+HITCOUNT_KEEP_DAILY_ROLLUPS = {"days": 365 * 3}
+
+HITCOUNT_LEADERBOARD_CACHE = None
+
+HITCOUNT_LEADERBOARD_SIZE = 100
+
+HITCOUNT_LEADERBOARD_TIMEOUT = 300
+
+HITCOUNT_TRENDING = False
+
+HITCOUNT_TRENDING_HALF_LIFE = {"days": 1}
+
+HITCOUNT_RECENT_HITS_CACHE = None
+
+HITCOUNT_RECENT_HITS_MINUTES = 60
+
+HITCOUNT_RECENT_HITS_MAX_OBJECTS = 1000
+
+HITCOUNT_RECENT_HITS_FLUSH_INTERVAL = 5
@@ -0,0 +1,74 @@
+from django.core.cache import caches
+
+from hitcount.conf import settings
+from hitcount.utils import VersionedCacheMixin
+
+
+class ExcludedUsers(VersionedCacheMixin):
+    """
+    Tells whether users belong to one of HITCOUNT_EXCLUDE_USER_GROUP.
+
+    With HITCOUNT_EXCLUDE_USER_GROUP_CACHE set, the answer for each user is
+    kept in that cache for HITCOUNT_EXCLUDE_USER_GROUP_CACHE_TIMEOUT seconds.
+    The answers are stamped with a version, changed when the groups
+    themselves change, while changes to the groups of a user only drop the
+    answer for that user.
+    """
+
+    key_prefix = "hitcount:excluded_users"
+    version_key = "hitcount:excluded_users:version"
+
+    @property
+    def cache(self):
+        return caches[settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE]
+
+    def make_key(self, version, user_pk):
+        return "%s:%s:%s" % (self.key_prefix, version, user_pk)
+
+    def _get_excluded_groups(self, user):
+        groups = settings.HITCOUNT_EXCLUDE_USER_GROUP
+        if not groups or user is None or not user.is_authenticated:
+            return None
+        return user.groups.filter(name__in=groups)
+
+    def is_excluded(self, user):
+        excluded_groups = self._get_excluded_groups(user)
+        if excluded_groups is None:
+            return False
+
+        if not settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE:
+            return excluded_groups.exists()
+
+        key = self.make_key(self.get_version(), user.pk)
+        excluded = self.cache.get(key)
+        if excluded is None:
+            excluded = excluded_groups.exists()
+            self.cache.set(key, excluded, timeout=settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE_TIMEOUT)
+        return excluded
+
+    async def ais_excluded(self, user):
+        excluded_groups = self._get_excluded_groups(user)
+        if excluded_groups is None:
+            return False
+
+        if not settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE:
+            return await excluded_groups.aexists()
+
+        key = self.make_key(await self.aget_version(), user.pk)
+        excluded = await self.cache.aget(key)
+        if excluded is None:
+            excluded = await excluded_groups.aexists()
+            await self.cache.aset(key, excluded, timeout=settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE_TIMEOUT)
+        return excluded
+
+    def invalidate_users(self, user_pks):
+        """Drop the answers for some users."""
+        version = self.get_version()
+        self.cache.delete_many([self.make_key(version, pk) for pk in user_pks])
+
+    def invalidate(self):
+        """Drop the answers for all the users."""
+        self.change_version()
+
+
+excluded_users = ExcludedUsers()
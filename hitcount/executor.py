@@ -0,0 +1,90 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from hitcount.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class HitExecutor:
+    """
+    Runs tasks, such as recording hits, on a bounded pool of threads.
+
+    At most HITCOUNT_BACKGROUND_QUEUE_SIZE tasks wait or run at once;
+    `submit()` refuses the others, leaving it to the caller to drop them or
+    to run them itself. The pool is started on the first task, with
+    HITCOUNT_BACKGROUND_WORKERS threads, and the remaining tasks are run
+    before the process exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = None
+        self._pending = 0
+        self._stats = dict.fromkeys(("submitted", "rejected", "completed", "failed"), 0)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue `fn(*args, **kwargs)` and return whether there was room for it."""
+        with self._lock:
+            if self._pending >= settings.HITCOUNT_BACKGROUND_QUEUE_SIZE:
+                self._stats["rejected"] += 1
+                return False
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.HITCOUNT_BACKGROUND_WORKERS, thread_name_prefix="hitcount"
+                )
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._executor.submit(self._run, fn, args, kwargs)
+
+        return True
+
+    def _run(self, fn, args, kwargs):
+        # each thread has its own connections, they are recycled like the ones of requests.
+        close_old_connections()
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %r failed", fn)
+            outcome = "failed"
+        else:
+            outcome = "completed"
+        finally:
+            close_old_connections()
+
+        with self._lock:
+            self._pending -= 1
+            self._stats[outcome] += 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def get_stats(self):
+        """
+        Return the number of tasks queued or running, and the number of
+        tasks submitted, rejected, completed and failed so far.
+        """
+        with self._lock:
+            return {"queued": self._pending, **self._stats}
+
+    def wait(self, timeout=None):
+        """Wait for all the submitted tasks to finish and return whether they did."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hit_executor = HitExecutor()
+
+atexit.register(hit_executor.shutdown)
@@ -0,0 +1,86 @@
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct strings added to it, in fixed memory.
+
+    It keeps `2 ** precision` one-byte registers, 4 KB for the default
+    precision of 12, for a standard error of about `1.04 / sqrt(2 ** precision)`,
+    1.6% by default. Sketches can be merged, which gives the sketch of all the
+    strings added to any of them, at the lowest of their precisions.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        if registers:
+            precision = int(math.log2(len(registers)))
+        if not 4 <= precision <= 16 or (registers and len(registers) != 2**precision):
+            raise ValueError("The precision of a HyperLogLog must be between 4 and 16.")
+
+        self.precision = precision
+        self.registers = bytearray(registers or 2**precision)
+
+    def __len__(self):
+        return self.count()
+
+    def add(self, value):
+        """Add a string and return whether this changed the sketch."""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (hashed & ((1 << remaining_bits) - 1)).bit_length() + 1
+
+        if rank <= self.registers[index]:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def update(self, registers):
+        """
+        Merge in another sketch, given its registers. The more precise of the
+        two is folded down to the precision of the other first.
+        """
+        other = HyperLogLog(registers=registers)
+        if other.precision > self.precision:
+            other = other.fold(self.precision)
+        elif other.precision < self.precision:
+            folded = self.fold(other.precision)
+            self.precision, self.registers = folded.precision, folded.registers
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def fold(self, precision):
+        """
+        Return the sketch of the same strings at a lower precision, as if they
+        had been added to it.
+        """
+        if precision > self.precision:
+            raise ValueError("A HyperLogLog can't be folded to a higher precision.")
+
+        folded = HyperLogLog(precision)
+        shift = self.precision - precision
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            # the bits dropped from the index now come first in the rest of the hash.
+            dropped_bits = index & ((1 << shift) - 1)
+            if dropped_bits:
+                rank = shift - dropped_bits.bit_length() + 1
+            else:
+                rank += shift
+            folded_index = index >> shift
+            if rank > folded.registers[folded_index]:
+                folded.registers[folded_index] = rank
+        return folded
+
+    def count(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size**2 / math.fsum(2.0**-register for register in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # linear counting is more accurate for small cardinalities.
+            estimate = size * math.log(size / zeros)
+
+        return round(estimate)
@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+
+from hitcount.conf import settings
+
+
+def get_sort_key(entry):
+    pk, _object_pk, hits = entry
+    return -hits, pk
+
+
+class Leaderboards:
+    """
+    Keeps the HITCOUNT_LEADERBOARD_SIZE HitCounts with the most hits of each
+    content type, overall or over a period, in the cache set by
+    HITCOUNT_LEADERBOARD_CACHE.
+
+    A board is read from the database when it's missing and kept for
+    HITCOUNT_LEADERBOARD_TIMEOUT seconds. The overall boards are updated in
+    the meantime as the HitCounts are, with the totals returned by the
+    backend, while the boards over a period are only read again. Concurrent
+    updates of a board may be lost until it's read again.
+    """
+
+    key_prefix = "hitcount:leaderboard"
+
+    @property
+    def cache(self):
+        return caches[settings.HITCOUNT_LEADERBOARD_CACHE]
+
+    def make_key(self, content_type_id, period=None):
+        seconds = int(timedelta(**period).total_seconds()) if period else "all"
+        return "%s:%s:%s" % (self.key_prefix, content_type_id, seconds)
+
+    def get(self, manager, content_type_id, period=None):
+        """
+        Return the pk, object pk and hits of the HitCounts on the board of a
+        content type, read with `manager` when it's missing.
+        """
+        key = self.make_key(content_type_id, period)
+        board = self.cache.get(key)
+        if board is not None:
+            return board[1]
+
+        entries = manager.get_top(content_type_id, settings.HITCOUNT_LEADERBOARD_SIZE, **(period or {}))
+        timeout = settings.HITCOUNT_LEADERBOARD_TIMEOUT
+        self.cache.set(key, (time.time() + timeout, entries), timeout=timeout)
+        return entries
+
+    def update(self, hit_count, total):
+        """Move `hit_count` on the overall board of its content type, if it's there, to its new total."""
+        key = self.make_key(hit_count.content_type_id)
+        board = self.cache.get(key)
+        if board is None:
+            return
+
+        expires, entries = board
+        size = settings.HITCOUNT_LEADERBOARD_SIZE
+        entry = (hit_count.pk, hit_count.object_pk, total)
+        old = next((other for other in entries if other[0] == hit_count.pk), None)
+        others = [other for other in entries if other[0] != hit_count.pk]
+        # a board with less entries than its size holds all the HitCounts of the content type.
+        if len(entries) >= size:
+            if old is None and get_sort_key(entry) > get_sort_key(entries[-1]):
+                return
+            if (
+                old is not None
+                and get_sort_key(entry) > get_sort_key(old)
+                and (not others or get_sort_key(entry) > get_sort_key(others[-1]))
+            ):
+                # the HitCounts off the board may have more hits now.
+                self.cache.delete(key)
+                return
+
+        entries = sorted(others + [entry], key=get_sort_key)[:size]
+        self.cache.set(key, (expires, entries), timeout=max(expires - time.time(), 1))
+
+
+leaderboards = Leaderboards()
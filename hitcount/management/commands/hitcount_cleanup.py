@@ -1,10 +1,12 @@
 from datetime import timedelta
 
 from django.core.management import BaseCommand
+from django.db.models import Q
 from django.utils import timezone
 
 from hitcount.conf import settings
 from hitcount.models import Hit
+from hitcount.models import HitRollup
 
 
 class Command(BaseCommand):
@@ -23,3 +25,12 @@ class Command(BaseCommand):
         number_removed = qs.count()
         qs.delete()
         self.stdout.write("Successfully removed %s Hits" % number_removed)
+
+        if settings.HITCOUNT_ROLLUPS:
+            now = timezone.now()
+            qs = HitRollup.objects.filter(
+                Q(period=HitRollup.Period.HOUR, start__lt=now - timedelta(**settings.HITCOUNT_KEEP_HOURLY_ROLLUPS))
+                | Q(period=HitRollup.Period.DAY, start__lt=now - timedelta(**settings.HITCOUNT_KEEP_DAILY_ROLLUPS))
+            )
+            number_removed, __ = qs.delete()
+            self.stdout.write("Successfully removed %s rollups" % number_removed)
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from hitcount.backends import get_backend
+
+
+class Command(BaseCommand):
+    help = "Writes the totals kept by the HITCOUNT_BACKEND back to the HitCount table."
+
+    def handle(self, *args, **kwargs):
+        number_reconciled = get_backend().reconcile()
+        self.stdout.write("Successfully reconciled %s HitCounts" % number_reconciled)
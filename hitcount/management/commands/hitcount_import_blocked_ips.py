@@ -0,0 +1,59 @@
+import sys
+
+from django.core.management import BaseCommand
+from django.core.management import CommandError
+
+from hitcount.blocklist import blocklist
+from hitcount.conf import settings
+from hitcount.models import BlockedIP
+from hitcount.utils import normalize_ip_network
+
+
+class Command(BaseCommand):
+    help = (
+        "Blocks the IP addresses and networks (in CIDR notation) listed, one per line, in the given files. "
+        "Use '-' to read them from the standard input. Anything after a '#' is ignored."
+    )
+
+    batch_size = 5000
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", metavar="file")
+
+    def handle(self, *args, **options):
+        networks = set()
+        for path in options["files"]:
+            networks.update(self.read_networks(path))
+
+        number_blocked = BlockedIP.objects.count()
+        BlockedIP.objects.bulk_create(
+            [BlockedIP(ip=network) for network in networks], batch_size=self.batch_size, ignore_conflicts=True
+        )
+        number_imported = BlockedIP.objects.count() - number_blocked
+
+        # bulk_create() doesn't send any signal.
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            blocklist.invalidate()
+
+        self.stdout.write("Successfully blocked %s IPs" % number_imported)
+
+    def read_networks(self, path):
+        if path == "-":
+            return list(self._parse(sys.stdin, "<stdin>"))
+
+        try:
+            with open(path) as stream:
+                return list(self._parse(stream, path))
+        except OSError as e:
+            raise CommandError("Could not read %s: %s" % (path, e))
+
+    def _parse(self, lines, name):
+        for line_number, line in enumerate(lines, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+
+            try:
+                yield normalize_ip_network(line)
+            except ValueError:
+                self.stderr.write("Skipped invalid network on line %s of %s: %s" % (line_number, name, line))
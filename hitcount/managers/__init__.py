@@ -2,11 +2,15 @@ from hitcount.managers.blockers import BlockedIPManager
 from hitcount.managers.blockers import BlockedUserAgentManager
 from hitcount.managers.hits import HitCountManager
 from hitcount.managers.hits import HitManager
+from hitcount.managers.rollups import HitRollupManager
+from hitcount.managers.sketches import VisitorSketchManager
 
 
 __all__ = (
     "HitCountManager",
     "HitManager",
+    "HitRollupManager",
     "BlockedIPManager",
     "BlockedUserAgentManager",
+    "VisitorSketchManager",
 )
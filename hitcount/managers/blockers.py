@@ -1,16 +1,72 @@
 from django.db import models
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Value
+
+from hitcount.blocklist import blocked_expressions
+from hitcount.blocklist import blocklist
+from hitcount.conf import settings
+from hitcount.utils import get_ip_networks
 
 
 class BlockedIPManager(models.Manager):
     def is_blocked(self, ip=None):
         if not ip:
             return False
-        return self.filter(ip__exact=ip).exists()
+
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            return blocklist.is_ip_blocked(ip)
+
+        return self.filter(ip__in=get_ip_networks(ip)).exists()
+
+    async def ais_blocked(self, ip=None):
+        if not ip:
+            return False
+
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            return await blocklist.ais_ip_blocked(ip)
+
+        return await self.filter(ip__in=get_ip_networks(ip)).aexists()
 
 
 class BlockedUserAgentManager(models.Manager):
+    def matching(self, user_agent):
+        """
+        Return the blocked user agents, other than the regular expressions,
+        that match `user_agent`.
+
+        The regular expressions are Python ones, as validated by
+        `BlockedUserAgent.clean()`, so they are matched by
+        `matches_expression()` rather than by the regex dialect of the
+        database.
+        """
+        MatchType = self.model.MatchType
+        return self.alias(hit_user_agent=Value(user_agent)).filter(
+            Q(match_type=MatchType.EXACT, user_agent__exact=user_agent)
+            | Q(match_type=MatchType.CONTAINS, hit_user_agent__icontains=F("user_agent"))
+        )
+
+    def matches_expression(self, user_agent):
+        """Tell whether `user_agent` matches one of the blocked regular expressions, compiled once per process."""
+        return bool(user_agent) and blocked_expressions.is_blocked(user_agent)
+
+    async def amatches_expression(self, user_agent):
+        return bool(user_agent) and await blocked_expressions.ais_blocked(user_agent)
+
     def is_blocked(self, user_agent=None):
         if not user_agent:
             return False
 
-        return self.filter(user_agent__exact=user_agent).exists()
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            return blocklist.is_user_agent_blocked(user_agent)
+
+        return self.matches_expression(user_agent) or self.matching(user_agent).exists()
+
+    async def ais_blocked(self, user_agent=None):
+        if not user_agent:
+            return False
+
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            return await blocklist.ais_user_agent_blocked(user_agent)
+
+        return await self.amatches_expression(user_agent) or await self.matching(user_agent).aexists()
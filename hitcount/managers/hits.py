@@ -1,17 +1,224 @@
+import math
+from collections import Counter
+from collections import defaultdict
+from collections import namedtuple
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
+from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Exists
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models.functions import Abs
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Exp
+from django.db.models.functions import Greatest
+from django.db.models.functions import Ln
 from django.utils import timezone
 
+from hitcount.backends import get_backend
+from hitcount.bloom import session_hit_filter
 from hitcount.conf import settings
+from hitcount.exclusions import excluded_users
+from hitcount.leaderboards import leaderboards
+from hitcount.signals import hits_counted
+from hitcount.utils import get_ip_networks
+
+
+LeaderboardEntry = namedtuple("LeaderboardEntry", "hit_count hits")
+
+
+def get_trending_rate():
+    """Return the rate at which the trending scores decay, per second."""
+    return math.log(2) / timedelta(**settings.HITCOUNT_TRENDING_HALF_LIFE).total_seconds()
 
 
 class HitCountManager(models.Manager):
-    def get_for_object(self, obj):
+    def get_for_object(self, obj, create=True):
+        """
+        Return the HitCount of `obj`.
+
+        A missing HitCount is inserted with a single statement ignoring the
+        conflict with one inserted concurrently, unlike `get_or_create()`
+        which has to catch the IntegrityError in a savepoint. With
+        `create=False`, nothing is written and an unsaved HitCount without
+        hits is returned instead.
+        """
         ctype = ContentType.objects.get_for_model(obj)
-        hit_count, created = self.get_or_create(content_type=ctype, object_pk=obj.pk)
-        return hit_count
+        try:
+            return self.get(content_type=ctype, object_pk=obj.pk)
+        except self.model.DoesNotExist:
+            hit_count = self.model(content_type=ctype, object_pk=obj.pk)
+            if not create:
+                return hit_count
+
+        self.bulk_create([hit_count], ignore_conflicts=True)
+        return self.get(content_type=ctype, object_pk=obj.pk)
+
+    def get_for_objects(self, objs, create=True):
+        """
+        Return the HitCount of each of `objs`, which may be of different
+        models, by object.
+
+        They are read with a single query and the missing ones are inserted
+        together, like in `get_for_object()`.
+        """
+        objs = list({(type(obj), obj.pk): obj for obj in objs}.values())
+        if not objs:
+            return {}
+
+        ctypes = ContentType.objects.get_for_models(*{type(obj) for obj in objs})
+        keys = {obj: (ctypes[type(obj)].pk, obj.pk) for obj in objs}
+
+        hit_counts = self._get_by_keys(keys.values())
+        missing = [key for key in keys.values() if key not in hit_counts]
+        if missing:
+            new_hit_counts = [self.model(content_type_id=ctype_id, object_pk=pk) for ctype_id, pk in missing]
+            if create:
+                self.bulk_create(new_hit_counts, ignore_conflicts=True)
+                hit_counts.update(self._get_by_keys(missing))
+            else:
+                hit_counts.update(zip(missing, new_hit_counts))
+
+        return {obj: hit_counts[key] for obj, key in keys.items()}
+
+    def _get_by_keys(self, keys):
+        pks_by_ctype = defaultdict(list)
+        for ctype_id, pk in keys:
+            pks_by_ctype[ctype_id].append(pk)
+
+        condition = Q()
+        for ctype_id, pks in pks_by_ctype.items():
+            condition |= Q(content_type_id=ctype_id, object_pk__in=pks)
+        # the totals of the HitCounts are usually read next.
+        hit_counts = get_backend().annotate_totals(self.filter(condition).order_by())
+        return {(hit_count.content_type_id, hit_count.object_pk): hit_count for hit_count in hit_counts}
+
+    async def aget_for_object(self, obj, create=True):
+        ctype = await sync_to_async(ContentType.objects.get_for_model)(obj)
+        try:
+            return await self.aget(content_type=ctype, object_pk=obj.pk)
+        except self.model.DoesNotExist:
+            hit_count = self.model(content_type=ctype, object_pk=obj.pk)
+            if not create:
+                return hit_count
+
+        await self.abulk_create([hit_count], ignore_conflicts=True)
+        return await self.aget(content_type=ctype, object_pk=obj.pk)
+
+    def top(self, model, n=10, **period):
+        """
+        Return the `n` HitCounts of a model, or of the model of an object,
+        with the most hits, as LeaderboardEntry tuples of the HitCount and
+        its hits.
+
+        For example: top(Post, n=5, days=7) for the five posts with the most
+        hits over the last seven days, read from the rollups with
+        HITCOUNT_ROLLUPS or from the hits otherwise.
+
+        The HitCounts only have their pk, object_pk and, without a period,
+        their hits loaded. With HITCOUNT_LEADERBOARD_CACHE set, they are read
+        from the leaderboards for `n` up to HITCOUNT_LEADERBOARD_SIZE.
+        """
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        if settings.HITCOUNT_LEADERBOARD_CACHE and n <= settings.HITCOUNT_LEADERBOARD_SIZE:
+            entries = leaderboards.get(self, content_type_id, period)[:n]
+        else:
+            entries = self.get_top(content_type_id, n, **period)
+
+        return [LeaderboardEntry(self._from_entry(content_type_id, entry, period), entry[2]) for entry in entries]
+
+    def _from_entry(self, content_type_id, entry, period):
+        pk, object_pk, hits = entry
+        values = {self.model._meta.pk.attname: pk, "content_type_id": content_type_id, "object_pk": object_pk}
+        if not period:
+            # over a period, the hits of the entries aren't the hits of the HitCounts, which are left deferred.
+            values["hits"] = hits
+        field_names = [field.attname for field in self.model._meta.concrete_fields if field.attname in values]
+        return self.model.from_db(self.db, field_names, [values[name] for name in field_names])
+
+    def get_top(self, content_type_id, n, **period):
+        """
+        Return the pk, object pk and hits of the `n` HitCounts of a content
+        type with the most hits, using the index on their content type and
+        hits without a period.
+        """
+        if not period:
+            return list(
+                self.filter(content_type_id=content_type_id)
+                .order_by("-hits", "pk")
+                .values_list("pk", "object_pk", "hits")[:n]
+            )
+
+        since = timezone.now() - timedelta(**period)
+        if settings.HITCOUNT_ROLLUPS:
+            HitRollup = apps.get_model("hitcount", "HitRollup")
+            return HitRollup.objects.get_top(content_type_id, since, n)
+
+        Hit = apps.get_model("hitcount", "Hit")
+        return list(
+            Hit.objects.filter(hitcount__content_type_id=content_type_id, created__gte=since)
+            .values("hitcount", "hitcount__object_pk")
+            .annotate(total=Count("pk"))
+            .order_by("-total", "hitcount")
+            .values_list("hitcount", "hitcount__object_pk", "total")[:n]
+        )
+
+    def series(self, hit_counts, interval="day", *, since):
+        """
+        Return the hits of each of `hit_counts` in each hour or local day
+        from `since` to now, as lists of (start, hits) tuples by HitCount.
+
+        The hits are read from the rollups, so only the hits counted while
+        HITCOUNT_ROLLUPS is enabled are there.
+        """
+        HitRollup = apps.get_model("hitcount", "HitRollup")
+        hit_counts = list(hit_counts)
+        starts, series = HitRollup.objects.get_series([hit_count.pk for hit_count in hit_counts], since, interval)
+        return {hit_count: list(zip(starts, series[hit_count.pk])) for hit_count in hit_counts}
+
+    def model_series(self, model, interval="day", *, since):
+        """Like `series()`, with the hits of all the HitCounts of a model together."""
+        HitRollup = apps.get_model("hitcount", "HitRollup")
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        return list(zip(*HitRollup.objects.get_content_type_series(content_type_id, since, interval)))
+
+    def trending(self, model, n=10):
+        """
+        Return the `n` HitCounts of a model, or of the model of an object,
+        with the highest trending scores, read with the index on their
+        content type and scores.
+        """
+        ctype = ContentType.objects.get_for_model(model)
+        return self.filter(content_type=ctype, trending__isnull=False).order_by("-trending", "pk")[:n]
+
+    def update_trending(self, hits):
+        """
+        Add saved hits to the trending scores of their HitCounts.
+
+        The score of a HitCount is the sum of 2 ** (-age / half-life) over its
+        hits. It's kept as the logarithm of the sum of e ** (rate * created),
+        which a hit adds to without reading the others, and which keeps the
+        order of the scores as time passes.
+        """
+        rate = get_trending_rate()
+        values = defaultdict(list)
+        for hit in hits:
+            values[hit.hitcount_id].append(rate * hit.created.timestamp())
+
+        for hitcount_id, hit_values in values.items():
+            # log(sum(e ** value)), without overflowing.
+            greatest = max(hit_values)
+            value = Value(greatest + math.log(sum(math.exp(v - greatest) for v in hit_values)))
+            trending = Greatest(F("trending"), value) + Ln(Value(1.0) + Exp(-Abs(F("trending") - value)))
+            # a HitCount without a score yet gets the one of its new hits.
+            self.filter(pk=hitcount_id).update(trending=Coalesce(trending, value))
 
 
 class HitManager(models.Manager):
@@ -41,15 +248,237 @@ class HitManager(models.Manager):
         return self.filter(created__gte=period).filter(*args, **kwargs)
 
     def has_limit_reached_by_ip(self, ip=None):
+        hits = self._get_ip_limit_hits(ip)
+        return hits is not None and hits.exists()
+
+    async def ahas_limit_reached_by_ip(self, ip=None):
+        hits = self._get_ip_limit_hits(ip)
+        return hits is not None and await hits.aexists()
+
+    def has_limit_reached_by_session(self, session, hitcount):
+        hits = self._get_session_limit_hits(session, hitcount)
+        return hits is not None and hits.exists()
+
+    async def ahas_limit_reached_by_session(self, session, hitcount):
+        hits = self._get_session_limit_hits(session, hitcount)
+        return hits is not None and await hits.aexists()
+
+    def _get_ip_limit_hits(self, ip):
+        """
+        Return the hits that exist once `ip` has reached its limit, or None if
+        it can't reach it.
+        """
         hits_per_ip_limit = settings.HITCOUNT_HITS_PER_IP_LIMIT
         if not ip or not hits_per_ip_limit:
-            return False
+            return None
 
-        return self.filter_active(ip=ip).count() >= hits_per_ip_limit
+        return self._active_hits_beyond(hits_per_ip_limit, ip=ip)
 
-    def has_limit_reached_by_session(self, session, hitcount):
+    def _get_session_limit_hits(self, session, hitcount):
+        """
+        Return the hits that exist once `session` has reached its limit for
+        `hitcount`, or None if it can't have reached it.
+        """
         hits_per_session_limit = settings.HITCOUNT_HITS_PER_SESSION_LIMIT
         if not hits_per_session_limit:
-            return False
+            return None
+
+        # a session unknown to the filter definitely has no active hit.
+        if settings.HITCOUNT_BLOOM_FILTER and not session_hit_filter.might_contain(session, hitcount):
+            return None
+
+        return self._active_hits_beyond(hits_per_session_limit, session=session, hitcount=hitcount)
+
+    def _active_hits_beyond(self, limit, **kwargs):
+        """
+        Return the active hits, filtered with `kwargs`, that come after the
+        first `limit - 1` ones.
+
+        It is non-empty once the limit is reached, without having to count all
+        the active hits.
+        """
+        return self.filter_active(**kwargs).order_by()[limit - 1 :]
+
+    def get_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        """
+        Return the reason for not counting a hit on `hitcount`, or None if it
+        should be counted.
+
+        The reason is one of "blocked_ip", "blocked_user_agent",
+        "excluded_user_group", "ip_limit" and "session_limit", checked in that
+        order. All of them are checked with a single query, but for the
+        blocked regular expressions, read at most once every
+        HITCOUNT_BLOCKLIST_CHECK_INTERVAL seconds.
+        """
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            # the blocklists are kept in memory, no need to query them.
+            if apps.get_model("hitcount", "BlockedIP").objects.is_blocked(ip):
+                return "blocked_ip"
+            if apps.get_model("hitcount", "BlockedUserAgent").objects.is_blocked(user_agent):
+                return "blocked_user_agent"
+
+        user_excluded = settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE and excluded_users.is_excluded(user)
+        expression_matched = not settings.HITCOUNT_BLOCKLIST_CACHE and apps.get_model(
+            "hitcount", "BlockedUserAgent"
+        ).objects.matches_expression(user_agent)
+        checks = self._get_exclusion_checks(ip, user_agent, user, user_excluded, expression_matched)
+        session_limit_hits = self._get_session_limit_hits(session_key, hitcount)
+        if session_limit_hits is not None:
+            checks["session_limit"] = Exists(session_limit_hits)
+        if checks:
+            for row in self._get_exclusion_results(hitcount, checks):
+                for reason, excluded in zip(checks, row):
+                    if excluded:
+                        return reason
+
+        return None
+
+    async def aget_exclusion_reason(self, hitcount, ip=None, user_agent=None, user=None, session_key=None):
+        """
+        Asynchronous version of `get_exclusion_reason()`.
+
+        `user` must already be loaded, e.g. with `request.auser()`.
+        """
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            if await apps.get_model("hitcount", "BlockedIP").objects.ais_blocked(ip):
+                return "blocked_ip"
+            if await apps.get_model("hitcount", "BlockedUserAgent").objects.ais_blocked(user_agent):
+                return "blocked_user_agent"
+
+        user_excluded = settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE and await excluded_users.ais_excluded(user)
+        expression_matched = not settings.HITCOUNT_BLOCKLIST_CACHE and await apps.get_model(
+            "hitcount", "BlockedUserAgent"
+        ).objects.amatches_expression(user_agent)
+        checks = self._get_exclusion_checks(ip, user_agent, user, user_excluded, expression_matched)
+        session_limit_hits = self._get_session_limit_hits(session_key, hitcount)
+        if session_limit_hits is not None:
+            checks["session_limit"] = Exists(session_limit_hits)
+        if checks:
+            async for row in self._get_exclusion_results(hitcount, checks):
+                for reason, excluded in zip(checks, row):
+                    if excluded:
+                        return reason
+
+        return None
+
+    def get_exclusion_reasons(self, hitcounts, ip=None, user_agent=None, user=None, session_key=None):
+        """
+        Return the reason for not counting a hit on each of `hitcounts`, or
+        None for the ones it should be counted on, by their pk.
+
+        The reasons are the ones of `get_exclusion_reason()`, but they are
+        checked for all the HitCount objects with a single query. The hits
+        are assumed to be recorded in the given order, the ones beyond what
+        is left of the limit of active hits per IP being excluded.
+        """
+        hitcounts = list({hitcount.pk: hitcount for hitcount in hitcounts}.values())
+        reasons = dict.fromkeys(hitcount.pk for hitcount in hitcounts)
+        if not hitcounts:
+            return reasons
+
+        if settings.HITCOUNT_BLOCKLIST_CACHE:
+            if apps.get_model("hitcount", "BlockedIP").objects.is_blocked(ip):
+                return dict.fromkeys(reasons, "blocked_ip")
+            if apps.get_model("hitcount", "BlockedUserAgent").objects.is_blocked(user_agent):
+                return dict.fromkeys(reasons, "blocked_user_agent")
+
+        user_excluded = settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE and excluded_users.is_excluded(user)
+        expression_matched = not settings.HITCOUNT_BLOCKLIST_CACHE and apps.get_model(
+            "hitcount", "BlockedUserAgent"
+        ).objects.matches_expression(user_agent)
+        checks = self._get_exclusion_checks(ip, user_agent, user, user_excluded, expression_matched)
+        hits_per_session_limit = settings.HITCOUNT_HITS_PER_SESSION_LIMIT
+        if hits_per_session_limit and (
+            not settings.HITCOUNT_BLOOM_FILTER
+            or any(session_hit_filter.might_contain(session_key, hitcount) for hitcount in hitcounts)
+        ):
+            checks["session_limit"] = Exists(
+                self._active_hits_beyond(hits_per_session_limit, session=session_key, hitcount=OuterRef("pk"))
+            )
+
+        if checks:
+            results = (
+                type(hitcounts[0])
+                ._default_manager.filter(pk__in=reasons)
+                .order_by()
+                .values_list("pk", *checks.values())
+            )
+            for pk, *row in results:
+                reasons[pk] = next((reason for reason, value in zip(checks, row) if value), None)
+
+        if "ip_limit" in checks and None in reasons.values():
+            # the IP may reach its limit within the hits themselves.
+            hits_per_ip_limit = settings.HITCOUNT_HITS_PER_IP_LIMIT
+            allowance = hits_per_ip_limit - self.filter_active(ip=ip).order_by()[:hits_per_ip_limit].count()
+            for pk, reason in reasons.items():
+                if reason is None:
+                    if allowance > 0:
+                        allowance -= 1
+                    else:
+                        reasons[pk] = "ip_limit"
+
+        return reasons
+
+    def _get_exclusion_checks(self, ip, user_agent, user, user_excluded=False, expression_matched=False):
+        """
+        Return the reasons for not counting a hit from a visitor that are left
+        to the database, whatever the HitCount, mapped to the expressions
+        telling whether they apply.
+
+        `user_excluded` is the cached answer of whether `user` is excluded,
+        when HITCOUNT_EXCLUDE_USER_GROUP_CACHE is set, and `expression_matched`
+        whether `user_agent` matches a blocked regular expression.
+        """
+        checks = {}
+        if not settings.HITCOUNT_BLOCKLIST_CACHE:
+            if ip:
+                BlockedIP = apps.get_model("hitcount", "BlockedIP")
+                checks["blocked_ip"] = Exists(BlockedIP.objects.filter(ip__in=get_ip_networks(ip)))
+            if expression_matched:
+                # the regular expressions are matched in Python, the answer stands in for the check.
+                checks["blocked_user_agent"] = Value(True)
+            elif user_agent:
+                BlockedUserAgent = apps.get_model("hitcount", "BlockedUserAgent")
+                checks["blocked_user_agent"] = Exists(BlockedUserAgent.objects.matching(user_agent))
+
+        if settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE:
+            # the cached answer stands in for the check, keeping the order of the reasons.
+            if user_excluded:
+                checks["excluded_user_group"] = Value(True)
+        else:
+            exclude_user_group = settings.HITCOUNT_EXCLUDE_USER_GROUP
+            if exclude_user_group and user is not None and user.is_authenticated:
+                checks["excluded_user_group"] = Exists(user.groups.filter(name__in=exclude_user_group))
+
+        ip_limit_hits = self._get_ip_limit_hits(ip)
+        if ip_limit_hits is not None:
+            checks["ip_limit"] = Exists(ip_limit_hits)
+
+        return checks
+
+    def _get_exclusion_results(self, hitcount, checks):
+        # the checks are evaluated alongside the row of the HitCount itself.
+        return type(hitcount)._default_manager.filter(pk=hitcount.pk).order_by().values_list(*checks.values())[:1]
+
+    def bulk_record(self, hits):
+        """
+        Save many new, unsaved hits at once.
+
+        Unlike `Hit.save()`, the hits are written with a single INSERT and each
+        related HitCount is increased with a single UPDATE, however many of
+        its hits were passed in.
+        """
+        hits = list(hits)
+        if not hits:
+            return hits
+
+        amounts = Counter(hit.hitcount_id for hit in hits)
+        hitcounts = {hit.hitcount_id: hit.hitcount for hit in hits}
+
+        with transaction.atomic(using=self.db):
+            hits = self.bulk_create(hits)
+            for hitcount_id, amount in amounts.items():
+                hitcounts[hitcount_id].increase(amount)
+            hits_counted.send(sender=self.model, hits=hits)
 
-        return self.filter_active(session=session, hitcount=hitcount).count() >= hits_per_session_limit
+        return hits
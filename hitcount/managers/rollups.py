@@ -0,0 +1,193 @@
+from collections import Counter
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import models
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Sum
+from django.utils import timezone
+
+from hitcount.conf import settings
+
+
+HOUR = "hour"
+DAY = "day"
+
+
+def get_period_start(value, period):
+    """Return the start of the hour or of the local day of a datetime."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if period == DAY:
+        value = value.replace(hour=0)
+    return value
+
+
+def get_next_period_start(value, period):
+    """Return the start of the first hour or local day from a datetime on."""
+    start = get_period_start(value, period)
+    if start == value:
+        return start
+    return get_period_start(start + (timedelta(days=1) if period == DAY else timedelta(hours=1)), period)
+
+
+def get_period_starts(since, until, period):
+    """Return the starts of the hours or local days from the one of `since` to the one of `until`."""
+    if period not in (HOUR, DAY):
+        raise ValueError("The period must be %r or %r, not %r." % (HOUR, DAY, period))
+
+    start = get_period_start(since, period)
+    end = get_period_start(until, period)
+    starts = []
+    while start <= end:
+        starts.append(start)
+        if period == DAY:
+            # the local days are not all 24 hours long.
+            start = get_period_start(start + timedelta(days=1), DAY)
+        elif timezone.is_aware(start):
+            start = get_period_start(start.astimezone(dt_timezone.utc) + timedelta(hours=1), HOUR)
+        else:
+            start += timedelta(hours=1)
+    return starts
+
+
+def get_index(starts):
+    """
+    Map the period starts to their positions, by instant, since the two
+    hours starting at the same local time in the fall compare equal.
+    """
+    return {
+        start.astimezone(dt_timezone.utc) if timezone.is_aware(start) else start: i for i, start in enumerate(starts)
+    }
+
+
+def get_periods(hour_from, hour_to):
+    """
+    Return the condition on the rollups covering the hours from `hour_from`
+    to `hour_to` included, with daily rollups for the whole days in between.
+    """
+    day_from = get_next_period_start(hour_from, DAY)
+    day_to = get_period_start(hour_to, DAY)
+    if day_from < day_to:
+        return (
+            Q(period=HOUR, start__gte=hour_from, start__lt=day_from)
+            | Q(period=DAY, start__gte=day_from, start__lt=day_to)
+            | Q(period=HOUR, start__gte=day_to, start__lte=hour_to)
+        )
+    return Q(period=HOUR, start__gte=hour_from, start__lte=hour_to)
+
+
+def get_window_start(since, now):
+    """
+    Return the start of a window, moved back to the start of its local day
+    when the hourly rollups of that day may have been removed.
+    """
+    if since < now - timedelta(**settings.HITCOUNT_KEEP_HOURLY_ROLLUPS):
+        return get_period_start(since, DAY)
+    return since
+
+
+class HitRollupManager(models.Manager):
+    def record(self, hits, amount=1):
+        """
+        Add `amount` to the rollups of the hour and of the day of saved hits.
+
+        With a negative `amount`, the hits are taken out of the rollups that
+        exist, without creating the others.
+        """
+        amounts = Counter()
+        for hit in hits:
+            for period in (HOUR, DAY):
+                amounts[hit.hitcount_id, period, get_period_start(hit.created, period)] += amount
+
+        with transaction.atomic(using=self.db):
+            for (hitcount_id, period, start), hits in amounts.items():
+                rollups = self.filter(hitcount_id=hitcount_id, period=period, start=start)
+                if not rollups.update(hits=F("hits") + hits) and hits > 0:
+                    # the first hit of the period, a concurrent one may create the rollup too.
+                    self.bulk_create(
+                        [self.model(hitcount_id=hitcount_id, period=period, start=start)], ignore_conflicts=True
+                    )
+                    rollups.update(hits=F("hits") + hits)
+
+    def count_hits(self, hitcount, since):
+        """
+        Return the number of hits of a HitCount since a datetime.
+
+        The whole days and hours of the window are read from the rollups,
+        along with the current hour, and only the hits of the hour the window
+        starts in are read from the Hit table. The hourly rollups are only
+        kept for a while, so older windows start at the start of their day.
+        """
+        now = timezone.now()
+        since = get_window_start(since, now)
+        hour_from = get_next_period_start(since, HOUR)
+        hour_to = get_period_start(now, HOUR)
+        if hour_from > hour_to:
+            # the window is within the current hour.
+            return hitcount.hit_set.filter(created__gte=since).count()
+
+        rollup_hits = (
+            self.filter(hitcount=hitcount).filter(get_periods(hour_from, hour_to)).aggregate(hits=Sum("hits"))["hits"]
+        )
+        return hitcount.hit_set.filter(created__gte=since, created__lt=hour_from).count() + (rollup_hits or 0)
+
+    def get_top(self, content_type_id, since, n):
+        """
+        Return the pk, object pk and hits of the `n` HitCounts of a content
+        type with the most hits since a datetime, rounded down to the hour,
+        or to the day past the hourly rollups.
+        """
+        now = timezone.now()
+        hour_from = get_period_start(get_window_start(since, now), HOUR)
+        hour_to = get_period_start(now, HOUR)
+        return list(
+            self.filter(hitcount__content_type_id=content_type_id)
+            .filter(get_periods(hour_from, hour_to))
+            .values("hitcount", "hitcount__object_pk")
+            .annotate(total=Sum("hits"))
+            .order_by("-total", "hitcount")
+            .values_list("hitcount", "hitcount__object_pk", "total")[:n]
+        )
+
+    def get_series(self, hitcount_ids, since, period):
+        """
+        Return the starts of the hours or local days from `since` to now, and
+        the hits of each HitCount in each of them, by pk, zero when there is
+        no rollup.
+        """
+        starts = get_period_starts(since, timezone.now(), period)
+        series = {pk: [0] * len(starts) for pk in hitcount_ids}
+        if starts:
+            index = get_index(starts)
+            rollups = self.filter(hitcount__in=series, period=period, start__gte=starts[0], start__lte=starts[-1])
+            for hitcount_id, start, hits in rollups.values_list("hitcount", "start", "hits"):
+                # the rollups saved in another time zone are left out of the local days.
+                if start in index:
+                    series[hitcount_id][index[start]] = hits
+        return starts, series
+
+    def get_content_type_series(self, content_type_id, since, period):
+        """Like `get_series()`, with the hits of all the HitCounts of a content type together."""
+        starts = get_period_starts(since, timezone.now(), period)
+        series = [0] * len(starts)
+        if starts:
+            index = get_index(starts)
+            rollups = (
+                self.filter(
+                    hitcount__content_type_id=content_type_id,
+                    period=period,
+                    start__gte=starts[0],
+                    start__lte=starts[-1],
+                )
+                .values("start")
+                .annotate(total=Sum("hits"))
+                .order_by()
+            )
+            for start, hits in rollups.values_list("start", "total"):
+                if start in index:
+                    series[index[start]] = hits
+        return starts, series
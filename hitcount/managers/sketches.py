@@ -0,0 +1,65 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models
+from django.db import transaction
+from django.utils import timezone
+
+from hitcount.conf import settings
+from hitcount.hyperloglog import HyperLogLog
+
+
+def get_day(value=None):
+    """Return the local date of a datetime, or the current one."""
+    value = value or timezone.now()
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+class VisitorSketchManager(models.Manager):
+    def record(self, hits):
+        """
+        Add the sessions of saved hits to the sketches of their HitCounts.
+
+        Each session is added to the sketch of all the visitors of a HitCount
+        and to the one of the day of the hit.
+        """
+        sessions = defaultdict(set)
+        for hit in hits:
+            for day in (None, get_day(hit.created)):
+                sessions[hit.hitcount_id, day].add(hit.session)
+
+        with transaction.atomic(using=self.db):
+            for (hitcount_id, day), visitors in sessions.items():
+                sketch, created = self.select_for_update().get_or_create(
+                    hitcount_id=hitcount_id, day=day, defaults={"registers": b""}
+                )
+                hyperloglog = HyperLogLog(settings.HITCOUNT_UNIQUE_VISITORS_PRECISION, bytes(sketch.registers))
+                changed = [hyperloglog.add(visitor) for visitor in visitors]
+                if created or any(changed):
+                    sketch.registers = bytes(hyperloglog.registers)
+                    sketch.save(update_fields=["registers"])
+
+    def count_visitors(self, hitcount, days=None):
+        """
+        Estimate the number of distinct sessions with hits for a HitCount.
+
+        With `days`, only the sessions of the last `days` days, today
+        included, are counted.
+        """
+        sketches = self.filter(hitcount=hitcount)
+        if days is None:
+            sketches = sketches.filter(day__isnull=True)
+        else:
+            today = get_day()
+            sketches = sketches.filter(day__gt=today - timedelta(days=days), day__lte=today)
+
+        hyperloglog = None
+        for registers in sketches.values_list("registers", flat=True):
+            if hyperloglog is None:
+                hyperloglog = HyperLogLog(registers=bytes(registers))
+            else:
+                hyperloglog.update(bytes(registers))
+
+        return hyperloglog.count() if hyperloglog else 0
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+from django.db import migrations
+from django.db import models
+
+import hitcount.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0005_auto_20210616_2026'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blockedip',
+            name='ip',
+            field=models.CharField(help_text='An IPv4 or IPv6 address, or a network in CIDR notation, e.g. 192.0.2.0/24.', max_length=43, unique=True, validators=[hitcount.utils.validate_ip_network]),
+        ),
+    ]
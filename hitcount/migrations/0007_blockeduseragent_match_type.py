@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:19
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0006_blockedip_networks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockeduseragent',
+            name='match_type',
+            field=models.CharField(choices=[('exact', 'Exact'), ('contains', 'Contains (case-insensitive)'), ('regex', 'Regular expression')], default='exact', help_text='How the user agent of a hit is compared with this one.', max_length=8),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:24
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0007_blockeduseragent_match_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorSketch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(editable=False, null=True)),
+                ('registers', models.BinaryField()),
+                ('hitcount', models.ForeignKey(editable=False, on_delete=models.CASCADE, related_name='visitor_sketches', to='hitcount.hitcount')),
+            ],
+            options={
+                'verbose_name': 'visitor sketch',
+                'verbose_name_plural': 'visitor sketches',
+                'constraints': [models.UniqueConstraint(fields=('hitcount', 'day'), name='hitcount_visitor_sketch_unique_day'), models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('hitcount',), name='hitcount_visitor_sketch_unique_total')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:41
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0008_visitorsketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HitCountShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(editable=False)),
+                ('hits', models.IntegerField(default=0)),
+                ('hitcount', models.ForeignKey(editable=False, on_delete=models.CASCADE, related_name='shards', to='hitcount.hitcount')),
+            ],
+            options={
+                'verbose_name': 'hit count shard',
+                'verbose_name_plural': 'hit count shards',
+                'constraints': [models.UniqueConstraint(fields=('hitcount', 'shard'), name='hitcount_shard_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0009_hitcountshard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hitcount',
+            index=models.Index(fields=['content_type', 'object_pk', 'hits'], name='hitcount_object_hits_idx'),
+        ),
+    ]
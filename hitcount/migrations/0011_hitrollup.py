@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:47
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0010_hitcount_object_hits_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HitRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], editable=False, max_length=4)),
+                ('start', models.DateTimeField(editable=False)),
+                ('hits', models.IntegerField(default=0)),
+                ('hitcount', models.ForeignKey(editable=False, on_delete=models.CASCADE, related_name='rollups', to='hitcount.hitcount')),
+            ],
+            options={
+                'verbose_name': 'hit rollup',
+                'verbose_name_plural': 'hit rollups',
+                'constraints': [models.UniqueConstraint(fields=('hitcount', 'period', 'start'), name='hitcount_rollup_unique')],
+            },
+        ),
+    ]
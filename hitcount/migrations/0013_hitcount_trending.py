@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hitcount', '0012_hitcount_ctype_hits_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hitcount',
+            name='trending',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='hitcount',
+            index=models.Index(fields=['content_type', 'trending'], name='hitcount_ctype_trending_idx'),
+        ),
+    ]
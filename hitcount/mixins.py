@@ -1,14 +1,37 @@
 from collections import namedtuple
 
-from django.contrib.auth.models import ContentType
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
 from django.http import Http404
 
+from hitcount.backends import get_backend
+from hitcount.bloom import session_hit_filter
+from hitcount.bots import is_bot
+from hitcount.buffer import hit_buffer
 from hitcount.conf import settings
-from hitcount.models import BlockedIP
-from hitcount.models import BlockedUserAgent
+from hitcount.executor import hit_executor
 from hitcount.models import Hit
 from hitcount.utils import get_hitcount_model
 from hitcount.utils import get_ip
+from hitcount.utils import get_visitor_hash
+
+
+UpdateHitCountResponse = namedtuple("UpdateHitCountResponse", "hit_counted hit_message total_hits", defaults=(None,))
+
+EXCLUSION_MESSAGES = {
+    "bot": "Not counted: bot",
+    "blocked_ip": "Not counted: user IP has been blocked",
+    "blocked_user_agent": "Not counted: user agent has been blocked",
+    "excluded_user_group": "Not counted: user group has been excluded",
+    "ip_limit": "Not counted: hits per IP address limit reached",
+    "session_limit": "Not counted: hits per session limit reached.",
+}
 
 
 class AJAXRequiredMixin:
@@ -27,10 +50,37 @@ class HitCountModelMixin:
 
     @property
     def hit_count(self):
-        ctype = ContentType.objects.get_for_model(self.__class__)
-        HitCount = get_hitcount_model()
-        hit_count, __ = HitCount.objects.get_or_create(content_type=ctype, object_pk=self.pk)
-        return hit_count
+        return get_hitcount_model().objects.get_for_object(self)
+
+
+class HitCountQuerySetMixin:
+    """
+    HitCountQuerySetMixin adds the total hits of the objects to the queries
+    of your model, with a subquery on the HitCount table instead of a join.
+
+        class PostQuerySet(HitCountQuerySetMixin, models.QuerySet):
+            pass
+
+        class Post(models.Model):
+            objects = PostQuerySet.as_manager()
+    """
+
+    def with_hit_counts(self, name="hits"):
+        """Annotate the total hits of each object, zero without a HitCount, as `name`."""
+        ctype = ContentType.objects.get_for_model(self.model)
+        hit_counts = get_hitcount_model().objects.filter(content_type=ctype, object_pk=OuterRef("pk")).order_by()
+        return self.annotate(**{name: Coalesce(Subquery(hit_counts.values("hits")[:1]), 0)})
+
+    def order_by_hits(self, name="hits", descending=True):
+        """
+        Order the objects by their total hits, the most hit first unless
+        `descending` is False, annotated as `name`.
+
+        Ties are ordered by pk, so that pages of the results don't overlap.
+        """
+        queryset = self if name in self.query.annotations else self.with_hit_counts(name)
+        prefix = "-" if descending else ""
+        return queryset.order_by(prefix + name, prefix + "pk")
 
 
 class HitCountViewMixin:
@@ -45,65 +95,231 @@ class HitCountViewMixin:
         Called with a HttpRequest and HitCount object it will return a
         namedtuple:
 
-        UpdateHitCountResponse(hit_counted=Boolean, hit_message='Message').
+        UpdateHitCountResponse(hit_counted=Boolean, hit_message='Message', total_hits=Integer).
 
         `hit_counted` will be True if the hit was counted and False if it was
         not.  `'hit_message` will indicate by what means the Hit was either
-        counted or ignored.
+        counted or ignored.  `total_hits` is the total once the Hit was
+        saved, when the backend returned it, and None otherwise.
         """
-        UpdateHitCountResponse = namedtuple("UpdateHitCountResponse", "hit_counted hit_message")
-        # as of Django 1.8.4 empty sessions are not being saved
-        # https://code.djangoproject.com/ticket/25489
-        if not request.session.session_key:
-            request.session.create()
+        user_agent = _get_user_agent(request)
+
+        # known bots are turned away before touching the session or the database.
+        if settings.HITCOUNT_EXCLUDE_BOTS and is_bot(user_agent):
+            return UpdateHitCountResponse(False, EXCLUSION_MESSAGES["bot"])
 
         user = request.user
+        ip, session_key = _get_visitor(request, user, user_agent)
 
-        if settings.HITCOUNT_USE_IP:
-            ip = get_ip(request)
-        else:
-            ip = None
+        if settings.HITCOUNT_BACKGROUND_HITS:
+            # the user is loaded on the request thread, the lazy object is tied to the request.
+            user = user if user.is_authenticated else None
+            if _submit(_record_hit, hitcount, session_key, ip, user_agent, user):
+                return UpdateHitCountResponse(True, "Hit queued")
+            if settings.HITCOUNT_BACKGROUND_OVERFLOW == "drop":
+                return UpdateHitCountResponse(False, "Not counted: too many hits queued")
 
-        user_agent = request.META.get("HTTP_USER_AGENT", "")[:255]
+        return _record_hit(hitcount, session_key, ip, user_agent, user)
 
-        # first, check our request against the IP blocked
-        if BlockedIP.objects.is_blocked(ip):
-            return UpdateHitCountResponse(False, "Not counted: user IP has been blocked")
+    @staticmethod
+    def hit_count_many(request, hitcounts):
+        """
+        Like `hit_count()`, for several HitCount objects at once.
+
+        Returns a dict of the UpdateHitCountResponse for each HitCount, by
+        pk. Whether each hit should be counted is checked with set-based
+        queries and the hits are written together.
+        """
+        hitcounts = list({hitcount.pk: hitcount for hitcount in hitcounts}.values())
+        if not hitcounts:
+            return {}
+
+        user_agent = _get_user_agent(request)
+
+        if settings.HITCOUNT_EXCLUDE_BOTS and is_bot(user_agent):
+            return dict.fromkeys(
+                (hitcount.pk for hitcount in hitcounts), UpdateHitCountResponse(False, EXCLUSION_MESSAGES["bot"])
+            )
+
+        user = request.user
+        ip, session_key = _get_visitor(request, user, user_agent)
 
-        # second, check our request against the user agent blocked
-        if BlockedUserAgent.objects.is_blocked(user_agent):
-            return UpdateHitCountResponse(False, "Not counted: user agent has been blocked")
+        if settings.HITCOUNT_BACKGROUND_HITS:
+            user = user if user.is_authenticated else None
+            if _submit(_record_hits, hitcounts, session_key, ip, user_agent, user):
+                return dict.fromkeys(
+                    (hitcount.pk for hitcount in hitcounts), UpdateHitCountResponse(True, "Hit queued")
+                )
+            if settings.HITCOUNT_BACKGROUND_OVERFLOW == "drop":
+                return dict.fromkeys(
+                    (hitcount.pk for hitcount in hitcounts),
+                    UpdateHitCountResponse(False, "Not counted: too many hits queued"),
+                )
 
-        # third, see if we are excluding a specific user group or not
-        exclude_user_group = settings.HITCOUNT_EXCLUDE_USER_GROUP
-        if exclude_user_group and request.user.is_authenticated:
-            if request.user.groups.filter(name__in=exclude_user_group):
-                return UpdateHitCountResponse(False, "Not counted: user group has been excluded")
+        return _record_hits(hitcounts, session_key, ip, user_agent, user)
 
-        # eliminated first three possible exclusions, now on to checking our database of
-        # active hits to see if we should count another one
+    @staticmethod
+    async def ahit_count(request, hitcount):
+        """
+        Asynchronous version of `hit_count()`, for views running under ASGI.
+        """
+        user_agent = _get_user_agent(request)
+
+        if settings.HITCOUNT_EXCLUDE_BOTS and is_bot(user_agent):
+            return UpdateHitCountResponse(False, EXCLUSION_MESSAGES["bot"])
 
-        # check limit on hits from a unique ip address (HITCOUNT_HITS_PER_IP_LIMIT)
-        if Hit.objects.has_limit_reached_by_ip(ip):
-            return UpdateHitCountResponse(False, "Not counted: hits per IP address limit reached")
+        if hasattr(request, "auser"):
+            user = await request.auser()
+        else:  # Django < 5.0 loads the user lazily, with a synchronous query.
+            await sync_to_async(lambda: request.user.is_authenticated)()
+            user = request.user
+        ip, session_key = await _aget_visitor(request, user, user_agent)
 
-        session_key = request.session.session_key
-        if Hit.objects.has_limit_reached_by_session(session_key, hitcount):
-            return UpdateHitCountResponse(False, "Not counted: hits per session limit reached.")
+        if settings.HITCOUNT_BACKGROUND_HITS:
+            user = user if user.is_authenticated else None
+            if await sync_to_async(_submit)(_record_hit, hitcount, session_key, ip, user_agent, user):
+                return UpdateHitCountResponse(True, "Hit queued")
+            if settings.HITCOUNT_BACKGROUND_OVERFLOW == "drop":
+                return UpdateHitCountResponse(False, "Not counted: too many hits queued")
 
-        hit = Hit(
-            session=session_key,
-            hitcount=hitcount,
-            ip=ip,
-            user_agent=user_agent,
+        reason = await get_backend().aget_exclusion_reason(
+            hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
         )
+        if reason:
+            return UpdateHitCountResponse(False, EXCLUSION_MESSAGES[reason])
 
-        if request.user.is_authenticated:
-            hit.user = user
+        return await sync_to_async(_save_hit)(hitcount, session_key, ip, user_agent, user)
 
-            response = UpdateHitCountResponse(True, "Hit counted: user authentication")
-        else:
-            response = UpdateHitCountResponse(True, "Hit counted: session key")
 
+def _get_user_agent(request):
+    return request.META.get("HTTP_USER_AGENT", "")[:255]
+
+
+def _get_visitor(request, user, user_agent):
+    """
+    Return the IP address of the visitor, when HITCOUNT_USE_IP is set, and the
+    key telling them apart, creating their session if need be.
+    """
+    ip = get_ip(request) if settings.HITCOUNT_USE_IP else None
+
+    if settings.HITCOUNT_IDENTITY == "hash":
+        # a keyed hash of the visitor stands in for the session, which is left alone.
+        return ip, get_visitor_hash(request, user, user_agent)
+
+    # as of Django 1.8.4 empty sessions are not being saved
+    # https://code.djangoproject.com/ticket/25489
+    if not request.session.session_key:
+        request.session.create()
+    return ip, request.session.session_key
+
+
+async def _aget_visitor(request, user, user_agent):
+    if settings.HITCOUNT_IDENTITY != "hash" and not request.session.session_key:
+        if hasattr(request.session, "acreate"):
+            await request.session.acreate()
+        else:  # Django < 5.0
+            await sync_to_async(request.session.create)()
+    # the session exists by now, the rest doesn't query anything.
+    return _get_visitor(request, user, user_agent)
+
+
+def _submit(fn, *args):
+    """
+    Queue `fn(*args)` on the background threads, once the current transaction
+    is committed, and return whether it was, or will be, queued.
+
+    The threads have their own connections, which don't see what the
+    transaction of the request, e.g. with ATOMIC_REQUESTS, hasn't committed
+    yet, such as a HitCount just created. When the queue is full by then,
+    the hits are dropped or recorded on commit, as HITCOUNT_BACKGROUND_OVERFLOW
+    says.
+    """
+    using = router.db_for_write(Hit)
+    if not connections[using].in_atomic_block:
+        return hit_executor.submit(fn, *args)
+
+    def submit():
+        if not hit_executor.submit(fn, *args) and settings.HITCOUNT_BACKGROUND_OVERFLOW != "drop":
+            fn(*args)
+
+    transaction.on_commit(submit, using=using)
+    return True
+
+
+def _record_hit(hitcount, session_key, ip, user_agent, user):
+    """Save the hit, unless it shouldn't be counted, and return the response."""
+    # check the blocked IPs and user agents, the excluded user groups and
+    # the limits of active hits per IP and per session.
+    reason = get_backend().get_exclusion_reason(
+        hitcount, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+    )
+    if reason:
+        return UpdateHitCountResponse(False, EXCLUSION_MESSAGES[reason])
+
+    return _save_hit(hitcount, session_key, ip, user_agent, user)
+
+
+def _save_hit(hitcount, session_key, ip, user_agent, user):
+    """Save the hit, once it's known to be counted, and return the response."""
+    hit, response = _get_hit(hitcount, session_key, ip, user_agent, user)
+
+    if settings.HITCOUNT_BUFFER_HITS:
+        hit_buffer.add(hit)
+    else:
         hit.save()
-        return response
+        response = response._replace(total_hits=hitcount._total_hits)
+
+    if settings.HITCOUNT_BLOOM_FILTER:
+        session_hit_filter.add(session_key, hitcount)
+
+    return response
+
+
+def _record_hits(hitcounts, session_key, ip, user_agent, user):
+    """Save the hits that should be counted and return the responses by HitCount pk."""
+    reasons = get_backend().get_exclusion_reasons(
+        hitcounts, ip=ip, user_agent=user_agent, user=user, session_key=session_key
+    )
+
+    responses = {}
+    hits = []
+    for hitcount in hitcounts:
+        reason = reasons[hitcount.pk]
+        if reason:
+            responses[hitcount.pk] = UpdateHitCountResponse(False, EXCLUSION_MESSAGES[reason])
+        else:
+            hit, responses[hitcount.pk] = _get_hit(hitcount, session_key, ip, user_agent, user)
+            hits.append(hit)
+
+    if settings.HITCOUNT_BUFFER_HITS:
+        for hit in hits:
+            hit_buffer.add(hit)
+    else:
+        Hit.objects.bulk_record(hits)
+        for hit in hits:
+            responses[hit.hitcount_id] = responses[hit.hitcount_id]._replace(total_hits=hit.hitcount._total_hits)
+
+    if settings.HITCOUNT_BLOOM_FILTER:
+        for hit in hits:
+            session_hit_filter.add(session_key, hit.hitcount)
+
+    return responses
+
+
+def _get_hit(hitcount, session_key, ip, user_agent, user):
+    """Return the Hit to record and the response telling it was counted."""
+    hit = Hit(
+        session=session_key,
+        hitcount=hitcount,
+        ip=ip,
+        user_agent=user_agent,
+    )
+
+    if user is not None and user.is_authenticated:
+        hit.user = user
+
+        response = UpdateHitCountResponse(True, "Hit counted: user authentication")
+    else:
+        response = UpdateHitCountResponse(True, "Hit counted: session key")
+
+    return hit, response
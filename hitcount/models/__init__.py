@@ -3,12 +3,18 @@ from hitcount.models.blockers import BlockedUserAgent
 from hitcount.models.hits import Hit
 from hitcount.models.hits import HitCount
 from hitcount.models.hits import HitCountBase
+from hitcount.models.rollups import HitRollup
+from hitcount.models.shards import HitCountShard
+from hitcount.models.sketches import VisitorSketch
 
 
 __all__ = (
     "HitCountBase",
     "HitCount",
     "Hit",
+    "HitCountShard",
+    "HitRollup",
     "BlockedIP",
     "BlockedUserAgent",
+    "VisitorSketch",
 )
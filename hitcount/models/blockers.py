@@ -1,12 +1,22 @@
+import re
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from hitcount.managers import BlockedIPManager
 from hitcount.managers import BlockedUserAgentManager
+from hitcount.utils import normalize_ip_network
+from hitcount.utils import validate_ip_network
 
 
 class BlockedIP(models.Model):
-    ip = models.CharField(max_length=40, unique=True)
+    ip = models.CharField(
+        max_length=43,
+        unique=True,
+        validators=[validate_ip_network],
+        help_text=_("An IPv4 or IPv6 address, or a network in CIDR notation, e.g. 192.0.2.0/24."),
+    )
     objects = BlockedIPManager()
 
     class Meta:
@@ -16,9 +26,28 @@ class BlockedIP(models.Model):
     def __str__(self):
         return self.ip
 
+    def save(self, *args, **kwargs):
+        try:
+            self.ip = normalize_ip_network(self.ip)
+        except ValueError:
+            # keep it as it is, it will simply never match.
+            pass
+        super().save(*args, **kwargs)
+
 
 class BlockedUserAgent(models.Model):
+    class MatchType(models.TextChoices):
+        EXACT = "exact", _("Exact")
+        CONTAINS = "contains", _("Contains (case-insensitive)")
+        REGEX = "regex", _("Regular expression")
+
     user_agent = models.CharField(max_length=255, unique=True)
+    match_type = models.CharField(
+        max_length=8,
+        choices=MatchType.choices,
+        default=MatchType.EXACT,
+        help_text=_("How the user agent of a hit is compared with this one."),
+    )
     objects = BlockedUserAgentManager()
 
     class Meta:
@@ -27,3 +56,11 @@ class BlockedUserAgent(models.Model):
 
     def __str__(self):
         return "%s" % self.user_agent
+
+    def clean(self):
+        if self.match_type == self.MatchType.REGEX:
+            try:
+                # the expressions are combined together, global flags can't be used.
+                re.compile("(?:%s)" % self.user_agent)
+            except re.error as e:
+                raise ValidationError({"user_agent": _("Enter a valid regular expression: %s") % e})
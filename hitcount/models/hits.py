@@ -1,16 +1,23 @@
+import math
 from datetime import timedelta
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import F
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from hitcount.backends import get_backend
 from hitcount.conf import settings
+from hitcount.leaderboards import leaderboards
 from hitcount.managers import HitCountManager
 from hitcount.managers import HitManager
+from hitcount.managers.hits import get_trending_rate
+from hitcount.managers.rollups import get_period_starts
+from hitcount.recent import recent_hits
 from hitcount.signals import delete_hit_count
+from hitcount.signals import hits_counted
+from hitcount.totals import hit_totals
 
 
 class HitCountBase(models.Model):
@@ -28,6 +35,8 @@ class HitCountBase(models.Model):
     )
     object_pk = models.PositiveIntegerField(verbose_name="object ID")
     content_object = GenericForeignKey("content_type", "object_pk")
+    # see HitCount.objects.update_trending().
+    trending = models.FloatField(null=True, editable=False)
 
     objects = HitCountManager()
 
@@ -38,17 +47,32 @@ class HitCountBase(models.Model):
         verbose_name = _("hit count")
         verbose_name_plural = _("hit counts")
         unique_together = ("content_type", "object_pk")
+        indexes = [
+            # covers the subqueries of HitCountQuerySetMixin, which only read the hits.
+            models.Index(fields=["content_type", "object_pk", "hits"], name="%(class)s_object_hits_idx"),
+            # covers HitCount.objects.top(), which reads the HitCounts of a content type by their hits.
+            models.Index(fields=["content_type", "hits"], name="%(class)s_ctype_hits_idx"),
+            # covers HitCount.objects.trending().
+            models.Index(fields=["content_type", "trending"], name="%(class)s_ctype_trending_idx"),
+        ]
 
     def __str__(self):
         return "%s" % self.content_object
 
-    def increase(self):
-        self.hits = F("hits") + 1
-        self.save(update_fields=["hits"])
+    def increase(self, amount=1):
+        """
+        Add hits to the total and return the new total, or None when the
+        backend can't tell it without another query.
+        """
+        self._total_hits = get_backend().increment(self, amount)
+        if settings.HITCOUNT_TOTALS_CACHE:
+            hit_totals.incr(self, amount)
+        if settings.HITCOUNT_LEADERBOARD_CACHE and self._total_hits is not None:
+            leaderboards.update(self, self._total_hits)
+        return self._total_hits
 
-    def decrease(self):
-        self.hits = F("hits") - 1
-        self.save(update_fields=["hits"])
+    def decrease(self, amount=1):
+        return self.increase(-amount)
 
     def hits_in_last(self, **kwargs):
         """
@@ -64,11 +88,69 @@ class HitCountBase(models.Model):
         Accepts days, seconds, microseconds, milliseconds, minutes,
         hours, and weeks.  It's creating a datetime.timedelta object.
 
+        With HITCOUNT_RECENT_HITS_CACHE set, the hits of shorter periods than
+        HITCOUNT_RECENT_HITS_MINUTES are counted from the minute the period
+        starts in, without querying the database.
+
         """
         assert kwargs, "Must provide at least one timedelta arg (eg, days=1)"
 
-        period = timezone.now() - timedelta(**kwargs)
-        return self.hit_set.filter(created__gte=period).count()
+        if self.pk is None:  # see HitCount.objects.get_for_object(obj, create=False)
+            return 0
+
+        if settings.HITCOUNT_RECENT_HITS_CACHE:
+            hits = recent_hits.count(self, timezone.now() - timedelta(**kwargs))
+            if hits is not None:
+                return hits
+
+        return get_backend().hits_in_last(self, **kwargs)
+
+    def unique_visitors(self, days=None):
+        """
+        Returns an estimate of the number of distinct sessions that hit the object.
+
+        For example: unique_visitors(days=7) for the visitors of the last seven
+        days, today included.
+
+        Unlike hits_in_last(), this keeps working after the hits have been
+        cleaned up, but only counts the hits saved while
+        HITCOUNT_UNIQUE_VISITORS is enabled.
+
+        """
+        if self.pk is None:
+            return 0
+
+        return self.visitor_sketches.count_visitors(self, days=days)
+
+    def series(self, interval="day", *, since):
+        """
+        Returns the hits in each hour or local day since a datetime, as a list
+        of (start, hits) tuples, with zero hits for the periods without any.
+
+        For example: series(since=timezone.now() - timedelta(days=89)) for the
+        hits of each of the last 90 days, today included.
+
+        The hits are read from the rollups, so this keeps working after the
+        hits have been cleaned up, but only counts the hits saved while
+        HITCOUNT_ROLLUPS is enabled.
+
+        """
+        if self.pk is None:  # see HitCount.objects.get_for_object(obj, create=False)
+            return [(start, 0) for start in get_period_starts(since, timezone.now(), interval)]
+
+        return type(self).objects.series([self], interval, since=since)[self]
+
+    def trending_score(self):
+        """
+        Returns the number of hits counted while HITCOUNT_TRENDING is enabled,
+        each one halved for every HITCOUNT_TRENDING_HALF_LIFE since it was
+        counted.
+
+        """
+        if self.trending is None:
+            return 0.0
+
+        return math.exp(self.trending - get_trending_rate() * timezone.now().timestamp())
 
     # def get_content_object_url(self):
     #     """
@@ -126,11 +208,15 @@ class Hit(models.Model):
         the associated HitCount object by one. The opposite applies
         if the Hit is deleted.
         """
-        if self.pk is None:
+        created = self.pk is None
+        if created:
             self.hitcount.increase()
 
         super().save(*args, **kwargs)
 
+        if created:
+            hits_counted.send(sender=self.__class__, hits=[self])
+
     def delete(self, save_hitcount=False):
         """
         If a Hit is deleted and save_hitcount=True, it will preserve the
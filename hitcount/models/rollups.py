@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from hitcount.conf import settings
+from hitcount.managers import HitRollupManager
+
+
+class HitRollup(models.Model):
+    """
+    Number of hits of a HitCount in an hour or in a (local) day.
+
+    The rollups are updated as hits are counted while HITCOUNT_ROLLUPS is
+    enabled, and outlive the hits, so that the hits over a window of time
+    are counted from a handful of rows instead of the hits themselves.
+    """
+
+    class Period(models.TextChoices):
+        HOUR = "hour", _("Hour")
+        DAY = "day", _("Day")
+
+    hitcount = models.ForeignKey(
+        settings.HITCOUNT_HITCOUNT_MODEL, related_name="rollups", editable=False, on_delete=models.CASCADE
+    )
+    period = models.CharField(max_length=4, choices=Period.choices, editable=False)
+    start = models.DateTimeField(editable=False)
+    hits = models.IntegerField(default=0)
+
+    objects = HitRollupManager()
+
+    class Meta:
+        verbose_name = _("hit rollup")
+        verbose_name_plural = _("hit rollups")
+        constraints = [
+            models.UniqueConstraint(fields=["hitcount", "period", "start"], name="hitcount_rollup_unique"),
+        ]
+
+    def __str__(self):
+        return "Hit rollup: %s" % self.pk
@@ -0,0 +1,30 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from hitcount.conf import settings
+
+
+class HitCountShard(models.Model):
+    """
+    Part of the hits of a HitCount, spread over several rows.
+
+    Used by `hitcount.backends.sharded.ShardedBackend` so that the hits on a
+    popular object don't all wait for the lock of a single row. The shards
+    are folded back into `HitCount.hits` by its `reconcile()`.
+    """
+
+    hitcount = models.ForeignKey(
+        settings.HITCOUNT_HITCOUNT_MODEL, related_name="shards", editable=False, on_delete=models.CASCADE
+    )
+    shard = models.PositiveSmallIntegerField(editable=False)
+    hits = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("hit count shard")
+        verbose_name_plural = _("hit count shards")
+        constraints = [
+            models.UniqueConstraint(fields=["hitcount", "shard"], name="hitcount_shard_unique"),
+        ]
+
+    def __str__(self):
+        return "Hit count shard: %s" % self.pk
@@ -0,0 +1,37 @@
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from hitcount.conf import settings
+from hitcount.managers import VisitorSketchManager
+
+
+class VisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the sessions that hit a HitCount.
+
+    Every HitCount has one for all of its visitors, without a `day`, and one
+    for the visitors of each day it had hits. They are kept when the hits are
+    cleaned up, so unique visitors can be counted for as long as needed.
+    """
+
+    hitcount = models.ForeignKey(
+        settings.HITCOUNT_HITCOUNT_MODEL, related_name="visitor_sketches", editable=False, on_delete=models.CASCADE
+    )
+    day = models.DateField(null=True, editable=False)
+    registers = models.BinaryField()
+
+    objects = VisitorSketchManager()
+
+    class Meta:
+        verbose_name = _("visitor sketch")
+        verbose_name_plural = _("visitor sketches")
+        constraints = [
+            models.UniqueConstraint(fields=["hitcount", "day"], name="hitcount_visitor_sketch_unique_day"),
+            models.UniqueConstraint(
+                fields=["hitcount"], condition=Q(day__isnull=True), name="hitcount_visitor_sketch_unique_total"
+            ),
+        ]
+
+    def __str__(self):
+        return "Visitor sketch: %s" % self.pk
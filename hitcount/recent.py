@@ -0,0 +1,151 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from hitcount.conf import settings
+
+
+def get_minute(value):
+    """Return the number of the minute of a datetime, since the epoch."""
+    return int(value.timestamp() // 60)
+
+
+class MinuteRing:
+    """
+    Hits per minute over the last minutes, in as many slots, each one reused
+    for a new minute once its own is over.
+    """
+
+    __slots__ = ("minutes", "counts")
+
+    def __init__(self, size):
+        self.minutes = [None] * size
+        self.counts = [0] * size
+
+    def add(self, minute, amount=1):
+        i = minute % len(self.counts)
+        if self.minutes[i] != minute:
+            self.minutes[i] = minute
+            self.counts[i] = 0
+        self.counts[i] += amount
+
+    def count_since(self, minute):
+        return sum(count for m, count in zip(self.minutes, self.counts) if m is not None and m >= minute)
+
+    def drain(self):
+        """Return the minutes with hits and their hits, and empty the slots."""
+        counts = [(m, count) for m, count in zip(self.minutes, self.counts) if m is not None and count]
+        self.minutes = [None] * len(self.minutes)
+        self.counts = [0] * len(self.counts)
+        return counts
+
+
+class RecentHits:
+    """
+    Counts the hits of the last HITCOUNT_RECENT_HITS_MINUTES minutes per
+    minute, for `hits_in_last()` to answer without querying the database.
+
+    Each process counts the hits of the HITCOUNT_RECENT_HITS_MAX_OBJECTS
+    HitCounts hit last in a ring of minutes, and adds them to the counts in
+    the cache set by HITCOUNT_RECENT_HITS_CACHE every
+    HITCOUNT_RECENT_HITS_FLUSH_INTERVAL seconds, and when a HitCount is
+    dropped from the rings. Along with the counts, the cache keeps the minute
+    from which a HitCount is counted, so that the periods starting before it
+    are left to the database.
+    """
+
+    key_prefix = "hitcount:recent"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rings = OrderedDict()
+        self._dropped = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[settings.HITCOUNT_RECENT_HITS_CACHE]
+
+    def make_key(self, hitcount_pk, minute):
+        return "%s:%s:%s" % (self.key_prefix, hitcount_pk, minute)
+
+    def make_since_key(self, hitcount_pk):
+        return "%s:%s:since" % (self.key_prefix, hitcount_pk)
+
+    def record(self, hits):
+        """Count saved hits and add the counts to the cache when it's time to."""
+        with self._lock:
+            for hit in hits:
+                ring = self._rings.get(hit.hitcount_id)
+                if ring is None:
+                    ring = self._rings[hit.hitcount_id] = MinuteRing(settings.HITCOUNT_RECENT_HITS_MINUTES)
+                    while len(self._rings) > settings.HITCOUNT_RECENT_HITS_MAX_OBJECTS:
+                        pk, dropped = self._rings.popitem(last=False)
+                        self._dropped.append((pk, dropped.drain()))
+                else:
+                    self._rings.move_to_end(hit.hitcount_id)
+                ring.add(get_minute(hit.created))
+
+            flush = time.monotonic() - self._last_flush >= settings.HITCOUNT_RECENT_HITS_FLUSH_INTERVAL
+
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Add the hits counted by this process to the counts in the cache."""
+        with self._lock:
+            counts = self._dropped + [(pk, ring.drain()) for pk, ring in self._rings.items()]
+            self._dropped = []
+            self._last_flush = time.monotonic()
+
+        counts = [(pk, minutes) for pk, minutes in counts if minutes]
+        if not counts:
+            return
+
+        cache = self.cache
+        # the counts outlive their minutes by one, for the reads that started during it.
+        timeout = (settings.HITCOUNT_RECENT_HITS_MINUTES + 1) * 60
+        for pk, minutes in counts:
+            since_key = self.make_since_key(pk)
+            if not cache.touch(since_key, timeout):
+                cache.add(since_key, min(minute for minute, __ in minutes), timeout)
+            for minute, count in minutes:
+                key = self.make_key(pk, minute)
+                if not cache.add(key, count, timeout):
+                    try:
+                        cache.incr(key, count)
+                    except ValueError:
+                        # the count expired in the meantime.
+                        cache.add(key, count, timeout)
+
+    def count(self, hitcount, since):
+        """
+        Return the hits of a HitCount from the minute of `since` on, or None
+        when the counts don't go back that far.
+        """
+        since_minute = get_minute(since)
+        minute = get_minute(timezone.now())
+        if minute - since_minute >= settings.HITCOUNT_RECENT_HITS_MINUTES:
+            return None
+
+        since_key = self.make_since_key(hitcount.pk)
+        keys = [self.make_key(hitcount.pk, m) for m in range(since_minute, minute + 1)]
+        values = self.cache.get_many([since_key] + keys)
+        counted_since = values.pop(since_key, None)
+        if counted_since is None or counted_since > since_minute:
+            return None
+
+        with self._lock:
+            ring = self._rings.get(hitcount.pk)
+            # the hits of this process that aren't in the cache yet.
+            pending = ring.count_since(since_minute) if ring is not None else 0
+        return sum(values.values()) + pending
+
+
+recent_hits = RecentHits()
+
+atexit.register(recent_hits.flush)
@@ -1,12 +1,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from functools import partial
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.dispatch import Signal
 
+from hitcount.blocklist import blocked_expressions
+from hitcount.blocklist import blocklist
+from hitcount.conf import settings
+from hitcount.exclusions import excluded_users
+from hitcount.recent import recent_hits
+from hitcount.utils import get_hitcount_model
+
 
 delete_hit_count = Signal()
 
+# sent with the new hits once they are saved, whether one by one or in bulk.
+hits_counted = Signal()
+
 
 @receiver(delete_hit_count)
 def delete_hit_count_handler(sender, instance, *, save_hitcount=False, **kwargs):
@@ -19,3 +36,101 @@ def delete_hit_count_handler(sender, instance, *, save_hitcount=False, **kwargs)
     """
     if not save_hitcount:
         instance.hitcount.decrease()
+
+
+@receiver(delete_hit_count)
+def delete_hit_rollups_handler(sender, instance, *, save_hitcount=False, **kwargs):
+    """Take a deleted hit out of the rollups, unless its HitCount keeps it."""
+    if settings.HITCOUNT_ROLLUPS and not save_hitcount:
+        apps.get_model("hitcount", "HitRollup").objects.record([instance], amount=-1)
+
+
+@receiver(post_save, sender="hitcount.BlockedIP")
+@receiver(post_delete, sender="hitcount.BlockedIP")
+@receiver(post_save, sender="hitcount.BlockedUserAgent")
+@receiver(post_delete, sender="hitcount.BlockedUserAgent")
+def invalidate_blocklist_handler(sender, **kwargs):
+    """
+    Make every process reload its in-memory blocklists when they change.
+
+    It is done right away for the current process and once more after the
+    transaction is committed, for the processes that may have reloaded them
+    before the change was visible to them.
+    """
+    if settings.HITCOUNT_BLOCKLIST_CACHE:
+        blocklist.invalidate()
+        transaction.on_commit(blocklist.invalidate)
+    elif sender is apps.get_model("hitcount", "BlockedUserAgent"):
+        # only the regular expressions are kept in memory, the other processes read them again in a while.
+        blocked_expressions.clear()
+        transaction.on_commit(blocked_expressions.clear)
+
+
+@receiver(hits_counted)
+def record_unique_visitors_handler(sender, hits, **kwargs):
+    """Add the sessions of the new hits to the unique visitor sketches."""
+    if settings.HITCOUNT_UNIQUE_VISITORS:
+        apps.get_model("hitcount", "VisitorSketch").objects.record(hits)
+
+
+@receiver(hits_counted)
+def record_rollups_handler(sender, hits, **kwargs):
+    """Add the new hits to the hourly and daily rollups."""
+    if settings.HITCOUNT_ROLLUPS:
+        apps.get_model("hitcount", "HitRollup").objects.record(hits)
+
+
+@receiver(hits_counted)
+def update_trending_handler(sender, hits, **kwargs):
+    """Add the new hits to the trending scores."""
+    if settings.HITCOUNT_TRENDING:
+        get_hitcount_model().objects.update_trending(hits)
+
+
+@receiver(hits_counted)
+def record_recent_hits_handler(sender, hits, **kwargs):
+    """Count the new hits in the rings of recent hits."""
+    if settings.HITCOUNT_RECENT_HITS_CACHE:
+        recent_hits.record(hits)
+
+
+def invalidate_excluded_users(user_pks=None):
+    """
+    Drop the cached exclusion of some users, or of all of them.
+
+    Like the blocklists, it is done right away and once more after the
+    transaction is committed.
+    """
+    if user_pks is None:
+        invalidate = excluded_users.invalidate
+    else:
+        invalidate = partial(excluded_users.invalidate_users, list(user_pks))
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def invalidate_user_groups_handler(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Drop the cached exclusion of the users whose groups changed.
+
+    It's connected to the changes of the groups of the users only, by
+    `HitCountAppConfig.ready()`, since the user model may not be loaded yet.
+    """
+    if not settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE or not action.startswith("post_"):
+        return
+
+    Group = apps.get_model("auth", "Group")
+    User = get_user_model()
+    if not reverse and model is Group and isinstance(instance, User):
+        invalidate_excluded_users([instance.pk])
+    elif reverse and model is User and isinstance(instance, Group):
+        # the users removed by clear() are not known.
+        invalidate_excluded_users(pk_set)
+
+
+@receiver(post_save, sender="auth.Group")
+@receiver(post_delete, sender="auth.Group")
+def invalidate_groups_handler(sender, **kwargs):
+    """Drop the cached exclusion of all the users when a group changes."""
+    if settings.HITCOUNT_EXCLUDE_USER_GROUP_CACHE:
+        invalidate_excluded_users()
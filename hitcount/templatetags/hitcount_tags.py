@@ -1,19 +1,29 @@
 from collections import namedtuple
 
 from django import template
-from django.contrib.contenttypes.models import ContentType
+from django.apps import apps
+from django.db.models import prefetch_related_objects
 from django.urls import reverse
 
+from hitcount.backends import get_backend
+from hitcount.conf import settings
 from hitcount.models import HitCount
+from hitcount.totals import hit_totals
 
 
 register = template.Library()
 
+# where prefetch_hit_counts keeps the HitCount objects in the context.
+HIT_COUNTS_CONTEXT_KEY = "_hitcount_hit_counts"
 
-def get_hit_count_from_obj_variable(context, obj_variable, tag_name):
+
+def get_hit_count_from_obj_variable(context, obj_variable, tag_name, create=True):
     """
     Helper function to return a HitCount for a given template object variable.
 
+    With `create=False`, a missing HitCount isn't saved, which is enough for
+    the tags only displaying its hits.
+
     Raises TemplateSyntaxError if the passed object variable cannot be parsed.
     """
     error_to_raise = template.TemplateSyntaxError(
@@ -28,13 +38,33 @@ def get_hit_count_from_obj_variable(context, obj_variable, tag_name):
         raise error_to_raise
 
     try:
-        ctype = ContentType.objects.get_for_model(obj)
+        hit_count = context.get(HIT_COUNTS_CONTEXT_KEY, {}).get((type(obj), obj.pk))
+        if hit_count is not None and (hit_count.pk is not None or not create):
+            return hit_count
+
+        return HitCount.objects.get_for_object(obj, create=create)
     except AttributeError:
         raise error_to_raise
 
-    hit_count, created = HitCount.objects.get_or_create(content_type=ctype, object_pk=obj.pk)
 
-    return hit_count
+def get_total_from_obj_variable(context, obj_variable, tag_name, create=False):
+    """
+    Helper function to return the pk of the HitCount, None if there is none,
+    and the total hits for a given template object variable.
+
+    The total is read from HITCOUNT_TOTALS_CACHE, when it's set, unless the
+    HitCount was prefetched.
+    """
+    if settings.HITCOUNT_TOTALS_CACHE:
+        try:
+            obj = obj_variable.resolve(context)
+            if (type(obj), obj.pk) not in context.get(HIT_COUNTS_CONTEXT_KEY, {}):
+                return hit_totals.get(obj, create=create)
+        except (template.VariableDoesNotExist, AttributeError):
+            pass  # raised as a TemplateSyntaxError below.
+
+    hit_count = get_hit_count_from_obj_variable(context, obj_variable, tag_name, create=create)
+    return hit_count.pk, get_backend().get_total(hit_count)
 
 
 def return_period_from_string(arg):
@@ -93,9 +123,8 @@ class GetHitCount(template.Node):
         self.period = period
 
     def render(self, context):
-        hit_count = get_hit_count_from_obj_variable(context, self.obj_variable, "get_hit_count")
-
         if self.period:  # if user sets a time period, use it
+            hit_count = get_hit_count_from_obj_variable(context, self.obj_variable, "get_hit_count", create=False)
             try:
                 hits = hit_count.hits_in_last(**self.period)
             except TypeError:
@@ -106,7 +135,7 @@ class GetHitCount(template.Node):
                     "Got these instead: %s" % self.period
                 )
         else:
-            hits = hit_count.hits
+            __, hits = get_total_from_obj_variable(context, self.obj_variable, "get_hit_count")
 
         if self.as_varname:  # if user gives us a variable to return
             context[self.as_varname] = str(hits)
@@ -142,6 +171,209 @@ def get_hit_count(parser, token):
 register.tag("get_hit_count", get_hit_count)
 
 
+class PrefetchHitCounts(template.Node):
+    @classmethod
+    def handle_token(cls, parser, token):
+        args = token.contents.split()
+
+        if len(args) == 2:
+            return cls(objs_variable=args[1])
+
+        else:
+            raise template.TemplateSyntaxError(
+                "prefetch_hit_counts requires this syntax: "
+                '"prefetch_hit_counts [objects]"\n'
+                "Got: %s" % " ".join(str(i) for i in args)
+            )
+
+    def __init__(self, objs_variable):
+        self.objs_variable = template.Variable(objs_variable)
+
+    def render(self, context):
+        error_to_raise = template.TemplateSyntaxError(
+            "'prefetch_hit_counts' requires a valid list of model objects.\nGot: %s" % self.objs_variable
+        )
+
+        try:
+            objs = self.objs_variable.resolve(context)
+        except template.VariableDoesNotExist:
+            raise error_to_raise
+
+        try:
+            hit_counts = HitCount.objects.get_for_objects(objs, create=False)
+        except (AttributeError, TypeError):
+            raise error_to_raise
+
+        prefetched = context.get(HIT_COUNTS_CONTEXT_KEY, {})
+        context[HIT_COUNTS_CONTEXT_KEY] = {
+            **prefetched,
+            **{(type(obj), obj.pk): hit_count for obj, hit_count in hit_counts.items()},
+        }
+        return ""
+
+
+def prefetch_hit_counts(parser, token):
+    """
+    Reads the HitCount objects of a list of objects with a single query, for
+    the hit count tags used later in the template.
+
+    {% prefetch_hit_counts [objects] %}
+    {% for object in [objects] %}
+        {% get_hit_count for object %}
+    {% endfor %}
+
+    The HitCount objects that don't exist yet are only created by the tags
+    that need them saved, such as get_hit_count_js_variables.
+    """
+    return PrefetchHitCounts.handle_token(parser, token)
+
+
+register.tag("prefetch_hit_counts", prefetch_hit_counts)
+
+
+class GetTopHitCounts(template.Node):
+    @classmethod
+    def handle_token(cls, parser, token):
+        args = token.contents.split()
+
+        # {% get_top_hit_counts for [model] [limit [n]] [within ["days=1,minutes=30"]] as [var] %}
+        if len(args) >= 5 and args[1] == "for" and args[-2] == "as":
+            options = dict(zip(args[3:-2:2], args[4:-2:2]))
+            if len(args) % 2 and set(options) <= {"limit", "within"} and len(options) == (len(args) - 5) // 2:
+                return cls(
+                    model_as_str=args[2],
+                    as_varname=args[-1],
+                    limit=options.get("limit"),
+                    period=return_period_from_string(options["within"]) if "within" in options else None,
+                )
+
+        raise template.TemplateSyntaxError(
+            "'get_top_hit_counts' requires 'for [model] limit [n] within [period] as [var]' (got %r)" % args
+        )
+
+    def __init__(self, model_as_str, as_varname, limit=None, period=None):
+        self.model_variable = template.Variable(model_as_str)
+        self.as_varname = as_varname
+        self.limit = template.Variable(limit) if limit else None
+        self.period = period
+
+    def render(self, context):
+        error_to_raise = template.TemplateSyntaxError(
+            "'get_top_hit_counts' requires a model label, such as \"blog.post\", a model or a model object, "
+            "and a whole number of HitCounts.\nGot: %s" % self.model_variable
+        )
+
+        try:
+            model = self.model_variable.resolve(context)
+            if isinstance(model, str):
+                model = apps.get_model(model)
+            n = int(self.limit.resolve(context)) if self.limit else 10
+            entries = HitCount.objects.top(model, n=n, **(self.period or {}))
+        except (template.VariableDoesNotExist, LookupError, AttributeError, TypeError, ValueError):
+            raise error_to_raise
+
+        prefetch_related_objects([entry.hit_count for entry in entries], "content_object")
+        context[self.as_varname] = entries
+        return ""
+
+
+def get_top_hit_counts(parser, token):
+    """
+    Sets a variable to the HitCounts of a model with the most hits, as
+    (hit_count, hits) tuples, with their objects read along.
+
+    {% get_top_hit_counts for "blog.post" as [var] %}
+    {% for entry in [var] %}
+        {{ entry.hit_count.content_object }}: {{ entry.hits }}
+    {% endfor %}
+
+    - Limit the number of HitCounts, 10 by default:
+    {% get_top_hit_counts for "blog.post" limit 5 as [var] %}
+
+    - Over a certain time period:
+    {% get_top_hit_counts for "blog.post" within "days=7" as [var] %}
+
+    The model may also be a model, or an object of the model, from the context.
+    """
+    return GetTopHitCounts.handle_token(parser, token)
+
+
+register.tag("get_top_hit_counts", get_top_hit_counts)
+
+
+class GetUniqueVisitors(template.Node):
+    @classmethod
+    def handle_token(cls, parser, token):
+        args = token.contents.split()
+
+        # {% get_unique_visitors for [obj] %}
+        if len(args) == 3 and args[1] == "for":
+            return cls(obj_as_str=args[2])
+
+        # {% get_unique_visitors for [obj] as [var] %}
+        elif len(args) == 5 and args[1] == "for" and args[3] == "as":
+            return cls(obj_as_str=args[2], as_varname=args[4])
+
+        # {% get_unique_visitors for [obj] within [days] %}
+        elif len(args) == 5 and args[1] == "for" and args[3] == "within":
+            return cls(obj_as_str=args[2], days=args[4])
+
+        # {% get_unique_visitors for [obj] within [days] as [var] %}
+        elif len(args) == 7 and args[1] == "for" and args[3] == "within" and args[5] == "as":
+            return cls(obj_as_str=args[2], days=args[4], as_varname=args[6])
+
+        else:
+            raise template.TemplateSyntaxError(
+                "'get_unique_visitors' requires 'for [object] within [days] as [var]' (got %r)" % args
+            )
+
+    def __init__(self, obj_as_str, as_varname=None, days=None):
+        self.obj_variable = template.Variable(obj_as_str)
+        self.as_varname = as_varname
+        self.days = template.Variable(days) if days else None
+
+    def render(self, context):
+        hit_count = get_hit_count_from_obj_variable(context, self.obj_variable, "get_unique_visitors", create=False)
+
+        days = None
+        if self.days:
+            try:
+                days = int(self.days.resolve(context))
+            except (template.VariableDoesNotExist, TypeError, ValueError):
+                raise template.TemplateSyntaxError(
+                    "'get_unique_visitors for [obj] within [days]' requires a whole number of days. "
+                    "Got this instead: %s" % self.days
+                )
+
+        visitors = hit_count.unique_visitors(days=days)
+
+        if self.as_varname:
+            context[self.as_varname] = str(visitors)
+            return ""
+        else:
+            return str(visitors)
+
+
+def get_unique_visitors(parser, token):
+    """
+    Returns an estimate of the number of unique visitors of an object.
+
+    - Return the unique visitors of an object:
+    {% get_unique_visitors for [object] %}
+
+    - Return the unique visitors of an object over the last days, today included:
+    {% get_unique_visitors for [object] within 7 %}
+
+    Both forms accept `as [var]` at the end to set a variable instead.
+    Visitors are only counted while HITCOUNT_UNIQUE_VISITORS is enabled.
+
+    """
+    return GetUniqueVisitors.handle_token(parser, token)
+
+
+register.tag("get_unique_visitors", get_unique_visitors)
+
+
 class WriteHitCountJavascriptVariables(template.Node):
     @classmethod
     def handle_token(cls, parser, token):
@@ -215,11 +447,9 @@ class GetHitCountJavascriptVariables(template.Node):
     def render(self, context):
         HitcountVariables = namedtuple("HitcountVariables", "pk ajax_url hits")
 
-        hit_count = get_hit_count_from_obj_variable(context, self.obj_variable, "get_hit_count_js_variables")
+        pk, hits = get_total_from_obj_variable(context, self.obj_variable, "get_hit_count_js_variables", create=True)
 
-        context[self.as_varname] = HitcountVariables(
-            hit_count.pk, str(reverse("hitcount:hit_ajax")), str(hit_count.hits)
-        )
+        context[self.as_varname] = HitcountVariables(pk, str(reverse("hitcount:hit_ajax")), str(hits))
 
         return ""
 
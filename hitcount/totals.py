@@ -0,0 +1,70 @@
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+
+from hitcount.backends import get_backend
+from hitcount.conf import settings
+from hitcount.utils import get_hitcount_model
+
+
+class HitTotals:
+    """
+    Keeps the total hits of objects in the cache set by HITCOUNT_TOTALS_CACHE,
+    by content type and object pk, for displaying them without a query.
+
+    A total is read from the database when it's missing and is fresh for
+    HITCOUNT_TOTALS_CACHE_TIMEOUT seconds. For HITCOUNT_TOTALS_CACHE_STALE_TIMEOUT
+    seconds more, the stale total is still returned while a single caller
+    reads it again. The totals in the cache are incremented along with the
+    HitCount objects, with the atomic `incr()` of the cache.
+    """
+
+    key_prefix = "hitcount:totals"
+    # how long a caller reading a stale total keeps the others from doing it too, in seconds.
+    refresh_lock_timeout = 30
+
+    @property
+    def cache(self):
+        return caches[settings.HITCOUNT_TOTALS_CACHE]
+
+    def make_key(self, content_type_id, object_pk):
+        return "%s:%s:%s" % (self.key_prefix, content_type_id, object_pk)
+
+    def get(self, obj, create=False):
+        """
+        Return the pk of the HitCount of `obj`, None if it has none, and the
+        total hits of `obj`.
+
+        With `create`, a missing HitCount is created, so that its pk is known.
+        """
+        key = self.make_key(ContentType.objects.get_for_model(obj).pk, obj.pk)
+        meta_key = "%s:meta" % key
+        values = self.cache.get_many([key, meta_key])
+        if key in values and meta_key in values:
+            pk, fresh_until = values[meta_key]
+            if (pk is not None or not create) and (
+                time.time() < fresh_until or not self.cache.add("%s:lock" % key, 1, self.refresh_lock_timeout)
+            ):
+                return pk, values[key]
+
+        hit_count = get_hitcount_model().objects.get_for_object(obj, create=create)
+        total = get_backend().get_total(hit_count)
+        timeout = settings.HITCOUNT_TOTALS_CACHE_TIMEOUT
+        self.cache.set_many(
+            {key: total, meta_key: (hit_count.pk, time.time() + timeout)},
+            timeout=timeout + settings.HITCOUNT_TOTALS_CACHE_STALE_TIMEOUT,
+        )
+        self.cache.delete("%s:lock" % key)
+        return hit_count.pk, total
+
+    def incr(self, hit_count, amount=1):
+        """Add `amount` to the cached total of the object of `hit_count`, if it's there."""
+        try:
+            self.cache.incr(self.make_key(hit_count.content_type_id, hit_count.object_pk), amount)
+        except ValueError:
+            # the total isn't cached, it will be read from the database.
+            pass
+
+
+hit_totals = HitTotals()
@@ -1,9 +1,12 @@
 from django.urls import path
 
+from hitcount.views import HitCountBatchView
 from hitcount.views import HitCountJSONView
 
 app_name = "hitcount"
 
 urlpatterns = [
     path("hit/ajax/", HitCountJSONView.as_view(), name="hit_ajax"),
+    path("hit/batch/", HitCountBatchView.as_view(), name="hit_batch"),
+    path("hit/beacon/", HitCountBatchView.as_view(empty_response=True), name="hit_beacon"),
 ]
@@ -1,4 +1,11 @@
+import ipaddress
+import re
+import uuid
+
 from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
 
 try:
     from django.utils.regex_helper import _lazy_re_compile
@@ -29,6 +36,11 @@ def get_ip(request):
     probable_ip_address = request.META.get("HTTP_X_FORWARDED_FOR", request.META.get("REMOTE_ADDR", "127.0.0.1"))
     if probable_ip_address:
         # make sure we have one and only one IP
+        try:
+            return str(ipaddress.ip_address(probable_ip_address.split(",")[0].strip()))
+        except ValueError:
+            pass
+
         match = IP_RE.match(probable_ip_address)
         if match:
             ip_address = match.group(0)
@@ -41,6 +53,107 @@ def get_ip(request):
     return probable_ip_address
 
 
+def get_visitor_hash(request, user, user_agent):
+    """
+    Returns a key identifying the visitor of a request without a session.
+
+    It is a keyed hash of the user for authenticated users, and of the IP
+    address and the user agent for the others. It fits in `Hit.session`.
+    """
+    if user is not None and user.is_authenticated:
+        visitor = "user:%s" % user.pk
+    else:
+        visitor = "%s|%s" % (get_ip(request), user_agent)
+    return salted_hmac("hitcount.utils.get_visitor_hash", visitor).hexdigest()
+
+
+def normalize_ip_network(value):
+    """
+    Return the notation of an IPv4 or IPv6 network, or address, as it is
+    stored in BlockedIP.
+
+    A single address is stored without its prefix length, e.g. "10.0.0.1" and
+    not "10.0.0.1/32". Raises ValueError if `value` isn't a valid network.
+    """
+    network = ipaddress.ip_network(value.strip(), strict=False)
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+def validate_ip_network(value):
+    try:
+        normalize_ip_network(value)
+    except ValueError:
+        raise ValidationError(_("Enter a valid IPv4 or IPv6 address or network."), code="invalid")
+
+
+def get_ip_networks(ip):
+    """
+    Return the notation of every network that contains the address `ip`, from
+    the narrowest one (the address itself) to the widest one.
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return [ip]
+
+    return [str(address)] + [
+        str(ipaddress.ip_network((address, prefixlen), strict=False))
+        for prefixlen in range(address.max_prefixlen - 1, -1, -1)
+    ]
+
+
+def get_trie_pattern(words):
+    """Return a regular expression matching any of `words`, with their common prefixes factored out."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    return _get_trie_node_pattern(trie)
+
+
+def _get_trie_node_pattern(node):
+    if "" in node:
+        # a shorter word is already matched, the longer ones don't matter.
+        return ""
+
+    alternatives = [re.escape(char) + _get_trie_node_pattern(child) for char, child in sorted(node.items())]
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:%s)" % "|".join(alternatives)
+
+
+class VersionedCacheMixin:
+    """
+    Stamps what is kept in `self.cache` with a version shared by all the
+    processes, stored under `version_key`. Changing the version drops all of
+    it at once.
+    """
+
+    version_key = None
+
+    def get_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = self.cache.get(self.version_key)
+        return version
+
+    async def aget_version(self):
+        version = await self.cache.aget(self.version_key)
+        if version is None:
+            await self.cache.aadd(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = await self.cache.aget(self.version_key)
+        return version
+
+    def change_version(self):
+        self.cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+
 def _get_model_from_string(model_path):
     app_name, model_name = model_path.rsplit(".", 1)
     return apps.get_model(app_name, model_name)
@@ -1,11 +1,23 @@
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
 from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView
 from django.views.generic import View
 
+from hitcount.backends import get_backend
+from hitcount.conf import settings
 from hitcount.mixins import AJAXRequiredMixin
 from hitcount.mixins import HitCountViewMixin
+from hitcount.models import HitRollup
+from hitcount.totals import hit_totals
 from hitcount.utils import get_hitcount_model
 
 
@@ -33,6 +45,143 @@ class HitCountJSONView(AJAXRequiredMixin, HitCountViewMixin, View):
         return JsonResponse(hit_count_response._asdict())
 
 
+class AsyncHitCountJSONView(HitCountJSONView):
+    """
+    Asynchronous version of `HitCountJSONView`, for projects served with ASGI.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        hitcount_pk = request.POST.get("hitcountPK")
+
+        try:
+            hitcount = await HitCount.objects.aget(pk=hitcount_pk)
+        except HitCount.DoesNotExist:
+            return HttpResponseBadRequest(_("HitCount object_pk not present."))
+
+        hit_count_response = await self.ahit_count(request, hitcount)
+        return JsonResponse(hit_count_response._asdict())
+
+
+class HitCountBatchView(HitCountViewMixin, View):
+    """
+    View to handle a POST of hits on several HitCount objects at once.
+
+    The pks of the HitCount objects can be sent as form data, in one or more
+    `hitcountPK` fields of comma separated pks, which works with
+    `navigator.sendBeacon()` and a `FormData`, or as JSON, in a
+    `hitcountPKs` list. Unlike `HitCountJSONView`, it doesn't require an
+    AJAX request.
+
+    It responds with the result for each HitCount, by pk, or with an empty
+    204 response when `empty_response` is set.
+    """
+
+    empty_response = False
+    # the most HitCount objects a single request may hit.
+    max_hitcounts = 100
+
+    def get_hitcount_pks(self, request):
+        if request.content_type == "application/json":
+            data = json.loads(request.body)
+            pks = data.get("hitcountPKs", []) if isinstance(data, dict) else []
+            if not isinstance(pks, list):
+                raise ValueError("hitcountPKs must be a list.")
+        else:
+            pks = [pk for value in request.POST.getlist("hitcountPK") for pk in value.split(",") if pk.strip()]
+
+        return list(dict.fromkeys(int(pk) for pk in pks))
+
+    def post(self, request, *args, **kwargs):
+        try:
+            hitcount_pks = self.get_hitcount_pks(request)
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest(_("Invalid HitCount object_pks."))
+
+        if len(hitcount_pks) > self.max_hitcounts:
+            return HttpResponseBadRequest(_("Too many HitCount object_pks."))
+
+        hitcounts = HitCount.objects.in_bulk(hitcount_pks)
+        if not hitcounts:
+            return HttpResponseBadRequest(_("HitCount object_pk not present."))
+
+        responses = self.hit_count_many(request, [hitcounts[pk] for pk in hitcount_pks if pk in hitcounts])
+
+        if self.empty_response:
+            return HttpResponse(status=204)
+        return JsonResponse({str(pk): response._asdict() for pk, response in responses.items()})
+
+
+class HitCountSeriesView(View):
+    """
+    JSON response view with the hits in each hour or local day of the last
+    ones, read from the rollups of HITCOUNT_ROLLUPS.
+
+    The query string has the pks of the HitCount objects, in one or more
+    `hitcountPK` fields of comma separated pks, or the label of a model, in
+    `model`, for the hits of all its objects together. `interval` is either
+    "hour" or "day", the default, and `last` the number of hours or days,
+    the current one included.
+
+    It responds with the start of each hour or day, and the hits in each of
+    them by pk or by model label, which can be cached for `max_age` seconds.
+    """
+
+    # the most HitCount objects, and hours or days, a single request may ask for.
+    max_hitcounts = 100
+    max_intervals = 1000
+    default_intervals = 30
+    max_age = 60
+
+    def get(self, request, *args, **kwargs):
+        interval = request.GET.get("interval", HitRollup.Period.DAY)
+        try:
+            last = int(request.GET.get("last", self.default_intervals))
+            hitcount_pks = list(
+                dict.fromkeys(
+                    int(pk) for value in request.GET.getlist("hitcountPK") for pk in value.split(",") if pk.strip()
+                )
+            )
+        except ValueError:
+            return HttpResponseBadRequest(_("Invalid HitCount object_pks or number of intervals."))
+
+        if interval not in HitRollup.Period.values or not 0 < last <= self.max_intervals:
+            return HttpResponseBadRequest(_("Invalid interval or number of intervals."))
+        if len(hitcount_pks) > self.max_hitcounts:
+            return HttpResponseBadRequest(_("Too many HitCount object_pks."))
+
+        unit = timedelta(days=1) if interval == HitRollup.Period.DAY else timedelta(hours=1)
+        since = timezone.now() - unit * (last - 1)
+
+        label = request.GET.get("model")
+        if label:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                return HttpResponseBadRequest(_("Invalid model."))
+            content_type_id = ContentType.objects.get_for_model(model).pk
+            starts, hits = HitRollup.objects.get_content_type_series(content_type_id, since, interval)
+            series = {label: hits}
+        else:
+            existing = set(HitCount.objects.filter(pk__in=hitcount_pks).values_list("pk", flat=True))
+            pks = [pk for pk in hitcount_pks if pk in existing]
+            if not pks:
+                return HttpResponseBadRequest(_("HitCount object_pk not present."))
+            starts, series = HitRollup.objects.get_series(pks, since, interval)
+
+        response = JsonResponse(
+            {
+                "interval": interval,
+                "starts": [start.isoformat() for start in starts],
+                "series": {str(key): hits for key, hits in series.items()},
+            }
+        )
+        patch_cache_control(response, max_age=self.max_age)
+        return response
+
+
 class HitCountDetailView(DetailView, HitCountViewMixin):
     """
     HitCountDetailView provides an inherited DetailView that will inject the
@@ -52,13 +201,20 @@ class HitCountDetailView(DetailView, HitCountViewMixin):
 
         assert self.object, "The object for Detail view has not been defined"
 
+        if settings.HITCOUNT_TOTALS_CACHE and not self.count_hit:
+            pk, hits = hit_totals.get(self.object, create=True)
+            context["hitcount"] = {"pk": pk, "total_hits": hits}
+            return context
+
         hit_count = HitCount.objects.get_for_object(self.object)
-        hits = hit_count.hits
+        hits = get_backend().get_total(hit_count)
         context["hitcount"] = {"pk": hit_count.pk}
 
         if self.count_hit:
             hit_count_response = self.hit_count(self.request, hit_count)
-            if hit_count_response.hit_counted:
+            if hit_count_response.total_hits is not None:
+                hits = hit_count_response.total_hits
+            elif hit_count_response.hit_counted:
                 hits = hits + 1
             context["hitcount"]["hit_counted"] = hit_count_response.hit_counted
             context["hitcount"]["hit_message"] = hit_count_response.hit_message
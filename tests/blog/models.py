@@ -3,11 +3,17 @@ from django.db import models
 
 from hitcount.conf import settings as hitcount_settings
 from hitcount.mixins import HitCountModelMixin
+from hitcount.mixins import HitCountQuerySetMixin
+
+
+class PostQuerySet(HitCountQuerySetMixin, models.QuerySet):
+    pass
 
 
 class Post(models.Model, HitCountModelMixin):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    objects = PostQuerySet.as_manager()
     hit_count_generic = GenericRelation(
         hitcount_settings.HITCOUNT_HITCOUNT_MODEL,
         object_id_field="object_pk",
@@ -0,0 +1,278 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.backends import get_backend
+from hitcount.backends.base import BaseBackend
+from hitcount.backends.cache import LocMemBackend
+from hitcount.backends.db import DatabaseBackend
+from hitcount.backends.sharded import ShardedBackend
+from hitcount.conf import settings
+from hitcount.models import BlockedIP
+from hitcount.models import BlockedUserAgent
+from hitcount.models import Hit
+from hitcount.models import HitCountShard
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+
+class TestGetBackend(TestCase):
+    def test_default(self):
+        self.assertIsInstance(get_backend(), DatabaseBackend)
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.cache.LocMemBackend")
+    def test_instance_is_reused(self):
+        self.assertIsInstance(get_backend(), LocMemBackend)
+        self.assertIs(get_backend(), get_backend())
+
+
+class TestBaseBackend(TestCase):
+    def test_interface_is_not_implemented(self):
+        backend = BaseBackend()
+        for method, args in [
+            ("increment", (None,)),
+            ("get_total", (None,)),
+            ("has_limit_reached_by_ip", ("127.0.0.1",)),
+            ("has_limit_reached_by_session", (None, None)),
+            ("hits_in_last", (None,)),
+        ]:
+            with self.subTest(method=method):
+                with self.assertRaises(NotImplementedError):
+                    getattr(backend, method)(*args)
+
+        self.assertEqual(backend.reconcile(), 0)
+
+    @patch.object(BaseBackend, "has_limit_reached_by_session", return_value=False)
+    @patch.object(BaseBackend, "has_limit_reached_by_ip", return_value=False)
+    def test_get_exclusion_reason(self, mock_ip_limit, mock_session_limit):
+        backend = BaseBackend()
+        hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+        kwargs = {"ip": "127.0.0.1", "user_agent": "agent", "user": AnonymousUser(), "session_key": "session"}
+
+        self.assertIsNone(backend.get_exclusion_reason(hit_count, **kwargs))
+        mock_ip_limit.assert_called_once_with("127.0.0.1")
+        mock_session_limit.assert_called_once_with("session", hit_count)
+
+        mock_session_limit.return_value = True
+        self.assertEqual(backend.get_exclusion_reason(hit_count, **kwargs), "session_limit")
+
+        mock_ip_limit.return_value = True
+        self.assertEqual(backend.get_exclusion_reason(hit_count, **kwargs), "ip_limit")
+
+        BlockedUserAgent.objects.create(user_agent="agent")
+        self.assertEqual(backend.get_exclusion_reason(hit_count, **kwargs), "blocked_user_agent")
+
+        BlockedIP.objects.create(ip="127.0.0.1")
+        self.assertEqual(backend.get_exclusion_reason(hit_count, **kwargs), "blocked_ip")
+
+
+class TestDatabaseBackend(TestCase):
+    def setUp(self):
+        self.backend = DatabaseBackend()
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def test_increment(self):
+        self.backend.increment(self.hit_count, 2)
+        self.backend.increment(self.hit_count, -1)
+
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 1)
+
+    def test_get_total_after_increment(self):
+        self.backend.increment(self.hit_count)
+
+        self.assertEqual(self.backend.get_total(self.hit_count), 1)
+
+    def test_increment_returns_total(self):
+        HitCount.objects.filter(pk=self.hit_count.pk).update(hits=5)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.increment(self.hit_count, 2), 7)
+            self.assertEqual(self.backend.get_total(self.hit_count), 7)
+
+    def test_increment_without_returning(self):
+        with patch.object(connection.Database, "sqlite_version_info", (3, 34, 1)):
+            self.assertIsNone(self.backend.increment(self.hit_count))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_total(self.hit_count), 1)
+
+    def test_hits_in_last(self):
+        Hit.objects.create(hitcount=self.hit_count)
+
+        self.assertEqual(self.backend.hits_in_last(self.hit_count, days=1), 1)
+
+
+class TestLocMemBackend(TestCase):
+    def setUp(self):
+        self.backend = LocMemBackend()
+        self.addCleanup(self.backend.cache.clear)
+        self.hit_count = HitCount.objects.create(
+            hits=5, content_object=Post.objects.create(title="my title", content="text")
+        )
+
+    def test_increment_does_not_touch_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.increment(self.hit_count, 3), 8)
+            self.assertEqual(self.backend.increment(self.hit_count, -1), 7)
+
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 5)
+        self.assertEqual(self.backend.get_total(self.hit_count), 7)
+
+    def test_increment_after_eviction(self):
+        self.backend.increment(self.hit_count)
+        with patch.object(self.backend.cache, "incr", side_effect=ValueError):
+            self.backend.increment(self.hit_count)
+
+        self.assertEqual(self.backend.get_total(self.hit_count), 6)
+
+    def test_reconcile(self):
+        other_hit_count = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        self.backend.increment(self.hit_count, 3)
+
+        self.assertEqual(self.backend.reconcile(), 1)
+
+        self.hit_count.refresh_from_db()
+        other_hit_count.refresh_from_db()
+        self.assertEqual(self.hit_count.hits, 8)
+        self.assertEqual(other_hit_count.hits, 0)
+        self.assertEqual(self.backend.get_total(self.hit_count), 8)
+        # nothing is left to reconcile.
+        self.assertEqual(self.backend.reconcile(), 0)
+
+    def test_reconcile_after_eviction(self):
+        other_hit_count = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        self.backend.increment(self.hit_count, 3)
+        self.backend.increment(other_hit_count, 2)
+
+        with patch.object(self.backend.cache, "incr", side_effect=ValueError):
+            self.assertEqual(self.backend.reconcile(), 2)
+
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 8)
+        self.assertEqual(HitCount.objects.get(pk=other_hit_count.pk).hits, 2)
+        # the lock is released.
+        self.assertIsNone(self.backend.cache.get("hitcount:hits:reconcile"))
+
+    def test_reconcile_is_skipped_while_another_is_running(self):
+        self.backend.increment(self.hit_count)
+        self.backend.cache.add("hitcount:hits:reconcile", 1)
+
+        self.assertEqual(self.backend.reconcile(), 0)
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 5)
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.cache.LocMemBackend")
+    def test_hit_increments_backend(self):
+        Hit.objects.create(hitcount=self.hit_count)
+
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 5)
+        self.assertEqual(self.hit_count.hits_in_last(days=1), 1)
+        self.assertEqual(get_backend().get_total(self.hit_count), 6)
+
+
+@patch.object(settings, "HITCOUNT_SHARDS", 4)
+@patch.object(settings, "HITCOUNT_SHARD_PROMOTION_RATE", 2)
+class TestShardedBackend(TestCase):
+    def setUp(self):
+        self.backend = ShardedBackend()
+        self.hit_count = HitCount.objects.create(
+            hits=5, content_object=Post.objects.create(title="my title", content="text")
+        )
+
+    def test_objects_are_promoted_past_rate(self):
+        for _ in range(2):
+            self.backend.increment(self.hit_count)
+
+        self.assertFalse(HitCountShard.objects.exists())
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 7)
+
+        for _ in range(10):
+            self.backend.increment(self.hit_count)
+
+        self.assertEqual(HitCountShard.objects.filter(hitcount=self.hit_count).count(), 4)
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 7)
+        self.assertEqual(self.backend.get_total(self.hit_count), 17)
+
+    @patch.object(settings, "HITCOUNT_SHARD_PROMOTION_RATE", 0)
+    def test_increment_touches_one_shard(self):
+        self.backend.increment(self.hit_count)
+
+        with self.assertNumQueries(1):
+            self.backend.increment(self.hit_count, 2)
+
+        self.assertEqual(self.backend.get_total(self.hit_count), 8)
+
+    @patch("hitcount.backends.sharded.time.monotonic")
+    def test_rates_are_per_minute(self, mock_monotonic):
+        for i in range(3):
+            mock_monotonic.return_value = i * 60
+            self.backend.increment(self.hit_count)
+
+        self.assertFalse(HitCountShard.objects.exists())
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.sharded.ShardedBackend")
+    @patch.object(settings, "HITCOUNT_SHARD_PROMOTION_RATE", 0)
+    def test_totals_are_loaded_with_hit_counts(self):
+        other = Post.objects.create(title="other", content="text")
+        unsaved = Post.objects.create(title="unsaved", content="text")
+        HitCount.objects.create(content_object=other, hits=2)
+        for _ in range(3):
+            get_backend().increment(self.hit_count)
+
+        hit_counts = HitCount.objects.get_for_objects([self.hit_count.content_object, other, unsaved], create=False)
+
+        with self.assertNumQueries(0):
+            totals = [get_backend().get_total(hit_count) for hit_count in hit_counts.values()]
+        self.assertEqual(totals, [8, 2, 0])
+
+        # the loaded sum isn't used once the shards are incremented.
+        hit_count = hit_counts[self.hit_count.content_object]
+        get_backend().increment(hit_count)
+        self.assertEqual(get_backend().get_total(hit_count), 9)
+
+    @patch("hitcount.backends.sharded.time.monotonic", return_value=0)
+    def test_promotions_expire(self, mock_monotonic):
+        for _ in range(3):
+            self.backend.increment(self.hit_count)
+        self.assertEqual(self.backend._promoted, {self.hit_count.pk})
+
+        # still promoted in the next minute.
+        mock_monotonic.return_value = 60
+        self.assertIs(self.backend._is_promoted(self.hit_count.pk), True)
+
+        mock_monotonic.return_value = 120
+        self.assertIs(self.backend._is_promoted(self.hit_count.pk), False)
+        self.assertEqual(self.backend._promoted, set())
+        self.assertEqual(self.backend._previously_promoted, set())
+
+    @patch.object(settings, "HITCOUNT_SHARD_PROMOTION_RATE", 0)
+    def test_reconcile(self):
+        other_hit_count = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        for _ in range(3):
+            self.backend.increment(self.hit_count)
+
+        self.assertEqual(self.backend.reconcile(), 1)
+
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 8)
+        self.assertEqual(HitCount.objects.get(pk=other_hit_count.pk).hits, 0)
+        self.assertFalse(HitCountShard.objects.exists())
+        self.assertEqual(self.backend.reconcile(), 0)
+
+        # increments after a reconciliation create the shards again.
+        self.hit_count.refresh_from_db()
+        self.backend.increment(self.hit_count)
+        self.assertEqual(self.backend.get_total(self.hit_count), 9)
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.sharded.ShardedBackend")
+    @patch.object(settings, "HITCOUNT_SHARD_PROMOTION_RATE", 0)
+    def test_hit_increments_backend(self):
+        Hit.objects.create(hitcount=self.hit_count)
+        Hit.objects.get().delete()
+        Hit.objects.create(hitcount=self.hit_count)
+
+        hit_count = HitCount.objects.get(pk=self.hit_count.pk)
+        self.assertEqual(hit_count.hits, 5)
+        self.assertEqual(get_backend().get_total(hit_count), 6)
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from hitcount.blocklist import Blocklist
+from hitcount.blocklist import blocklist
+from hitcount.blocklist import IPNetworkSet
+from hitcount.blocklist import UserAgentMatcher
+from hitcount.conf import settings
+from hitcount.models import BlockedIP
+from hitcount.models import BlockedUserAgent
+
+
+class TestIPNetworkSet(SimpleTestCase):
+    def test_contains(self):
+        networks = IPNetworkSet(["10.0.0.0/8", "192.0.2.1", "2001:db8::/32", "::1"])
+
+        self.assertEqual(len(networks), 4)
+        for ip, expected in [
+            ("10.1.2.3", True),
+            ("11.0.0.1", False),
+            ("192.0.2.1", True),
+            ("192.0.2.2", False),
+            ("2001:db8:ffff::1", True),
+            ("2001:db9::1", False),
+            ("::1", True),
+            ("not an ip", False),
+        ]:
+            with self.subTest(ip=ip):
+                self.assertIs(ip in networks, expected)
+
+    def test_empty(self):
+        self.assertNotIn("10.0.0.1", IPNetworkSet())
+
+    def test_whole_address_space(self):
+        self.assertIn("203.0.113.1", IPNetworkSet(["0.0.0.0/0"]))
+
+
+class TestUserAgentMatcher(SimpleTestCase):
+    def test_contains(self):
+        matcher = UserAgentMatcher(
+            [
+                ("my_clever_agent", "exact"),
+                ("bot", "contains"),
+                ("Crawler", "contains"),
+                ("HeadlessChrome", "contains"),
+                (r"^curl/\d+", "regex"),
+            ]
+        )
+
+        for user_agent, expected in [
+            ("my_clever_agent", True),
+            ("my_clever_agent/2.0", False),
+            ("Mozilla/5.0 (compatible; Googlebot/2.1)", True),
+            ("Mozilla/5.0 (compatible; BOT)", True),
+            ("some crawler", True),
+            ("Mozilla/5.0 HeadlessChrome/119.0.0.0 Safari/537.36", True),
+            ("curl/8.4.0", True),
+            ("my curl/8.4.0", False),
+            ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/119.0", False),
+        ]:
+            with self.subTest(user_agent=user_agent):
+                self.assertIs(user_agent in matcher, expected)
+
+    def test_empty(self):
+        self.assertNotIn("my_clever_agent", UserAgentMatcher())
+
+    def test_invalid_expressions_are_ignored(self):
+        matcher = UserAgentMatcher([("(unclosed", "regex"), ("(?i)bot", "regex"), ("spider", "regex")])
+
+        self.assertIn("spider", matcher)
+        self.assertNotIn("(unclosed", matcher)
+        self.assertNotIn("bot", matcher)
+
+    def test_expressions_that_cannot_be_combined(self):
+        matcher = UserAgentMatcher([("(?P<name>bot)", "regex"), ("(?P<name>spider)", "regex")])
+
+        self.assertEqual(len(matcher.patterns), 2)
+        self.assertIn("spider", matcher)
+        self.assertIn("bot", matcher)
+
+
+@patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default")
+@patch.object(settings, "HITCOUNT_BLOCKLIST_CHECK_INTERVAL", 60)
+class TestBlocklist(TestCase):
+    def setUp(self):
+        self.blocklist = Blocklist()
+        self.addCleanup(blocklist.clear)
+        BlockedIP.objects.create(ip="10.1.2.1")
+        BlockedUserAgent.objects.create(user_agent="my_clever_agent")
+
+    def test_is_blocked(self):
+        self.assertIs(self.blocklist.is_ip_blocked("10.1.2.1"), True)
+        self.assertIs(self.blocklist.is_ip_blocked("10.1.1.1"), False)
+        self.assertIs(self.blocklist.is_user_agent_blocked("my_clever_agent"), True)
+        self.assertIs(self.blocklist.is_user_agent_blocked("my_agent"), False)
+
+    def test_is_blocked_by_network(self):
+        BlockedIP.objects.create(ip="192.0.2.0/24")
+        # invalid entries are ignored.
+        BlockedIP.objects.create(ip="not an ip")
+
+        self.assertIs(self.blocklist.is_ip_blocked("192.0.2.10"), True)
+        self.assertIs(self.blocklist.is_ip_blocked("198.51.100.10"), False)
+
+    def test_is_blocked_by_pattern(self):
+        BlockedUserAgent.objects.create(user_agent="bot", match_type=BlockedUserAgent.MatchType.CONTAINS)
+
+        self.assertIs(self.blocklist.is_user_agent_blocked("Mozilla/5.0 (compatible; Googlebot/2.1)"), True)
+        self.assertIs(self.blocklist.is_user_agent_blocked("Mozilla/5.0 Firefox/119.0"), False)
+
+    async def test_is_blocked_async(self):
+        await BlockedIP.objects.acreate(ip="192.0.2.0/24")
+
+        self.assertIs(await self.blocklist.ais_ip_blocked("10.1.2.1"), True)
+        self.assertIs(await self.blocklist.ais_ip_blocked("192.0.2.10"), True)
+        self.assertIs(await self.blocklist.ais_ip_blocked("10.1.1.1"), False)
+        self.assertIs(await self.blocklist.ais_user_agent_blocked("my_clever_agent"), True)
+        self.assertIs(await self.blocklist.ais_user_agent_blocked("my_agent"), False)
+
+    def test_lists_are_loaded_once(self):
+        self.blocklist.refresh()
+
+        with self.assertNumQueries(0):
+            self.blocklist.is_ip_blocked("10.1.2.1")
+            self.blocklist.is_user_agent_blocked("my_clever_agent")
+
+    def test_invalidate_from_another_process(self):
+        self.blocklist.refresh()
+        BlockedIP.objects.create(ip="10.1.1.1")
+
+        # the change isn't noticed until the check interval has passed.
+        self.assertIs(self.blocklist.is_ip_blocked("10.1.1.1"), False)
+
+        with patch.object(settings, "HITCOUNT_BLOCKLIST_CHECK_INTERVAL", 0):
+            self.assertIs(self.blocklist.is_ip_blocked("10.1.1.1"), True)
+
+    def test_version_is_recreated_when_missing(self):
+        self.blocklist.cache.delete(Blocklist.version_key)
+
+        self.assertIsNotNone(self.blocklist.get_version())
+        self.assertEqual(self.blocklist.get_version(), self.blocklist.get_version())
+
+    def test_signals_invalidate_current_process(self):
+        self.assertIs(blocklist.is_ip_blocked("10.1.1.1"), False)
+
+        blocked_ip = BlockedIP.objects.create(ip="10.1.1.1")
+        self.assertIs(blocklist.is_ip_blocked("10.1.1.1"), True)
+
+        blocked_ip.delete()
+        self.assertIs(blocklist.is_ip_blocked("10.1.1.1"), False)
+
+        blocked_user_agent = BlockedUserAgent.objects.create(user_agent="my_agent")
+        self.assertIs(blocklist.is_user_agent_blocked("my_agent"), True)
+
+        blocked_user_agent.delete()
+        self.assertIs(blocklist.is_user_agent_blocked("my_agent"), False)
+
+    def test_signals_invalidate_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            BlockedIP.objects.create(ip="10.1.1.1")
+
+        self.assertEqual(len(callbacks), 1)
@@ -0,0 +1,222 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from blog.models import Post
+from hitcount.bloom import BloomFilter
+from hitcount.bloom import RotatingBloomFilter
+from hitcount.bloom import SessionHitFilter
+from hitcount.bloom import session_hit_filter
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+
+def seed_now(self, bloom_filter, seeded):
+    # the test database can't be shared with another thread.
+    self._seed(bloom_filter)
+    seeded.set()
+
+
+class TestBloomFilter(SimpleTestCase):
+    def test_sizing(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+
+        self.assertEqual(bloom_filter.size, 9586)
+        self.assertEqual(bloom_filter.hash_count, 7)
+        self.assertEqual(len(bloom_filter.bits), 1199)
+
+    def test_add(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = ["session-%s:1" % i for i in range(1000)]
+        for key in keys:
+            bloom_filter.add(key)
+
+        for key in keys:
+            self.assertIn(key, bloom_filter)
+
+        false_positives = sum("session-%s:2" % i in bloom_filter for i in range(10000))
+        self.assertLess(false_positives, 200)
+
+    def test_update(self):
+        bloom_filter = BloomFilter(capacity=100, error_rate=0.01)
+        other = BloomFilter(capacity=100, error_rate=0.01)
+        other.add("session:1")
+
+        bloom_filter.update(other.bits)
+
+        self.assertIn("session:1", bloom_filter)
+        self.assertIn("session:1", BloomFilter(100, 0.01, bits=other.bits))
+
+    def test_update_with_other_size(self):
+        with self.assertRaises(ValueError):
+            BloomFilter(capacity=100, error_rate=0.01).update(bytearray(1))
+
+
+class TestRotatingBloomFilter(SimpleTestCase):
+    def make_filter(self, **kwargs):
+        return RotatingBloomFilter(timedelta(hours=1), slices=4, capacity=100, error_rate=0.01, **kwargs)
+
+    @patch("hitcount.bloom.time.time")
+    def test_strings_are_forgotten_after_period(self, mock_time):
+        bloom_filter = self.make_filter()
+        mock_time.return_value = 10000 * 900 + 800
+        bloom_filter.add("session:1")
+
+        # still within the period.
+        mock_time.return_value += 3600
+        self.assertIn("session:1", bloom_filter)
+
+        # its slice has gone out of the period.
+        mock_time.return_value += 900
+        self.assertNotIn("session:1", bloom_filter)
+        self.assertEqual(len(bloom_filter._filters), 0)
+
+    def test_filters_are_shared_through_cache(self):
+        self.addCleanup(self.make_filter(cache="default").cache.clear)
+        bloom_filter = self.make_filter(cache="default")
+        other = self.make_filter(cache="default")
+
+        bloom_filter.add("session:1")
+        # the first one only pushes its filters at its next sync.
+        bloom_filter._synced_at = None
+        self.assertNotIn("session:2", bloom_filter)
+
+        self.assertIn("session:1", other)
+
+    @patch("hitcount.bloom.time.time", return_value=10000 * 900 + 800)
+    def test_add_with_timestamp(self, mock_time):
+        bloom_filter = self.make_filter()
+
+        bloom_filter.add("session:1", timestamp=mock_time.return_value - 3600)
+        bloom_filter.add("session:2", timestamp=mock_time.return_value - 5400)
+
+        self.assertIn("session:1", bloom_filter)
+        self.assertNotIn("session:2", bloom_filter)
+        # forgotten along with the slice it was added to.
+        mock_time.return_value += 900
+        self.assertNotIn("session:1", bloom_filter)
+
+    def test_cache_is_used_outside_of_lock(self):
+        bloom_filter = self.make_filter(cache="default")
+        self.addCleanup(bloom_filter.cache.clear)
+
+        def assert_unlocked(*args, **kwargs):
+            self.assertIs(bloom_filter._lock.locked(), False)
+            return {}
+
+        with patch.object(bloom_filter.cache, "get_many", side_effect=assert_unlocked) as mock_get_many:
+            with patch.object(bloom_filter.cache, "set_many", side_effect=assert_unlocked) as mock_set_many:
+                bloom_filter.add("session:1")
+                self.assertIn("session:1", bloom_filter)
+
+        # synced only once within the interval.
+        mock_get_many.assert_called_once()
+        mock_set_many.assert_called_once()
+
+    def test_clear(self):
+        bloom_filter = self.make_filter()
+        bloom_filter.add("session:1")
+
+        bloom_filter.clear()
+
+        self.assertNotIn("session:1", bloom_filter)
+
+    def test_warns_once_saturated(self):
+        bloom_filter = self.make_filter()
+        for i in range(100):
+            bloom_filter.add("session:%s" % i)
+
+        with self.assertLogs("hitcount.bloom", "WARNING") as logs:
+            bloom_filter.add("session:100")
+            bloom_filter.add("session:101")
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("capacity of 100", logs.output[0])
+
+
+@patch.object(settings, "HITCOUNT_BLOOM_FILTER", True)
+@patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+class TestSessionHitFilter(TestCase):
+    def setUp(self):
+        self.addCleanup(session_hit_filter.clear)
+        patcher = patch.object(SessionHitFilter, "_start_seeding", autospec=True, side_effect=seed_now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def test_unknown_session_skips_database(self):
+        session_hit_filter.get_filter()
+        # a hit the filter wasn't told about.
+        Hit.objects.create(hitcount=self.hit_count, session="session")
+
+        with self.assertNumQueries(0):
+            self.assertIs(Hit.objects.has_limit_reached_by_session("session", self.hit_count), False)
+            self.assertIsNone(Hit.objects.get_exclusion_reason(self.hit_count, session_key="session"))
+
+    def test_known_session_checks_database(self):
+        Hit.objects.create(hitcount=self.hit_count, session="session")
+        session_hit_filter.add("session", self.hit_count)
+
+        self.assertIs(Hit.objects.has_limit_reached_by_session("session", self.hit_count), True)
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hit_count, session_key="session"), "session_limit")
+
+    def test_filter_is_seeded_with_active_hits(self):
+        Hit.objects.create(hitcount=self.hit_count, session="session")
+        with patch("django.utils.timezone.now", return_value=timezone.now() - timedelta(days=8)):
+            Hit.objects.create(hitcount=self.hit_count, session="inactive")
+
+        with self.assertNumQueries(1):
+            self.assertIs(session_hit_filter.might_contain("session", self.hit_count), True)
+        self.assertIs(session_hit_filter.might_contain("inactive", self.hit_count), False)
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hit_count, session_key="session"), "session_limit")
+
+    @patch.object(settings, "HITCOUNT_BLOOM_FILTER_CACHE", "default")
+    def test_shared_filter_is_not_seeded(self):
+        self.addCleanup(cache.clear)
+        Hit.objects.create(hitcount=self.hit_count, session="session")
+        session_hit_filter.get_filter()
+        session_hit_filter.clear()
+
+        # the filters stored by the first one are enough.
+        with self.assertNumQueries(0):
+            self.assertIs(session_hit_filter.might_contain("session", self.hit_count), True)
+        self.assertIs(session_hit_filter.might_contain("other", self.hit_count), False)
+
+    def test_filter_is_rebuilt_when_settings_change(self):
+        session_hit_filter.add("session", self.hit_count)
+
+        with patch.object(settings, "HITCOUNT_BLOOM_FILTER_CAPACITY", 10):
+            self.assertIs(session_hit_filter.might_contain("session", self.hit_count), False)
+
+
+@patch.object(settings, "HITCOUNT_BLOOM_FILTER", True)
+class TestSessionHitFilterSeeding(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(session_hit_filter.clear)
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def test_filter_is_seeded_in_background(self):
+        Hit.objects.create(hitcount=self.hit_count, session="session")
+
+        with patch.object(session_hit_filter, "_seed", wraps=session_hit_filter._seed) as mock_seed:
+            with self.assertNumQueries(0):
+                session_hit_filter.get_filter()
+
+            self.assertIs(session_hit_filter.wait(timeout=5), True)
+        mock_seed.assert_called_once()
+        self.assertIs(session_hit_filter.might_contain("session", self.hit_count), True)
+        self.assertIs(session_hit_filter.might_contain("other", self.hit_count), False)
+
+    def test_every_session_might_have_hit_until_seeded(self):
+        with patch.object(SessionHitFilter, "_start_seeding"):
+            self.assertIs(session_hit_filter.might_contain("other", self.hit_count), True)
+            self.assertIs(session_hit_filter.wait(timeout=0), False)
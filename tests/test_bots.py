@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from hitcount.bots import is_bot
+
+
+class TestIsBot(SimpleTestCase):
+    def test_bots(self):
+        for user_agent in [
+            "",
+            "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+            "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+            "Mozilla/5.0 (compatible; Baiduspider/2.0; +http://www.baidu.com/search/spider.html)",
+            "Mozilla/5.0 (compatible; YandexBot/3.0; +http://yandex.com/bots)",
+            "Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)",
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/119.0.0.0",
+            "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
+            "Mediapartners-Google",
+            "python-requests/2.31.0",
+            "curl/8.4.0",
+            "Wget/1.21.4",
+        ]:
+            with self.subTest(user_agent=user_agent):
+                self.assertIs(is_bot(user_agent), True)
+
+    def test_browsers(self):
+        for user_agent in [
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:119.0) Gecko/20100101 Firefox/119.0",
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+            "Version/17.1 Safari/605.1.15",
+            "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 "
+            "Mobile Safari/537.36",
+            "my_clever_agent",
+        ]:
+            with self.subTest(user_agent=user_agent):
+                self.assertIs(is_bot(user_agent), False)
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.buffer import HitBuffer
+from hitcount.buffer import flush_hits
+from hitcount.buffer import hit_buffer
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+
+@patch.object(settings, "HITCOUNT_BUFFER_FLUSH_INTERVAL", 60)
+class TestHitBuffer(TestCase):
+    def setUp(self):
+        self.buffer = HitBuffer()
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def test_add_queues_hits(self):
+        self.buffer.add(Hit(hitcount=self.hit_count))
+
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(Hit.objects.count(), 0)
+
+    @patch.object(settings, "HITCOUNT_BUFFER_SIZE", 3)
+    def test_add_flushes_when_size_is_reached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.buffer.add(Hit(hitcount=self.hit_count))
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(Hit.objects.count(), 3)
+        self.hit_count.refresh_from_db()
+        self.assertEqual(self.hit_count.hits, 3)
+
+    def test_add_flushes_when_interval_has_passed(self):
+        self.buffer.add(Hit(hitcount=self.hit_count))
+
+        with patch.object(settings, "HITCOUNT_BUFFER_FLUSH_INTERVAL", 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.buffer.add(Hit(hitcount=self.hit_count))
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(Hit.objects.count(), 2)
+
+    @patch.object(settings, "HITCOUNT_BUFFER_SIZE", 2)
+    def test_add_flushes_after_commit(self):
+        self.buffer.add(Hit(hitcount=self.hit_count))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.buffer.add(Hit(hitcount=self.hit_count))
+
+        # not written yet, a rollback would leave them queued.
+        self.assertEqual(len(self.buffer), 2)
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(Hit.objects.count(), 2)
+
+    def test_flush(self):
+        other_hit_count = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        for hit_count in (self.hit_count, self.hit_count, other_hit_count):
+            self.buffer.add(Hit(hitcount=hit_count))
+
+        # a SELECT of the HitCounts, one INSERT for the hits and one UPDATE
+        # per HitCount, wrapped in a savepoint.
+        with self.assertNumQueries(6):
+            self.assertEqual(self.buffer.flush(), 3)
+
+        self.hit_count.refresh_from_db()
+        other_hit_count.refresh_from_db()
+        self.assertEqual(self.hit_count.hits, 2)
+        self.assertEqual(other_hit_count.hits, 1)
+
+    def test_flush_empty_buffer(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_requeues_hits_on_failure(self):
+        self.buffer.add(Hit(hitcount=self.hit_count))
+
+        with patch.object(Hit.objects, "bulk_record", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+
+        self.assertEqual(len(self.buffer), 1)
+
+    @patch.object(settings, "HITCOUNT_BUFFER_SIZE", 2)
+    def test_add_logs_flush_errors(self):
+        self.buffer.add(Hit(hitcount=self.hit_count))
+
+        with patch.object(Hit.objects, "bulk_record", side_effect=RuntimeError):
+            with self.assertLogs("hitcount.buffer", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.buffer.add(Hit(hitcount=self.hit_count))
+
+        self.assertEqual(len(self.buffer), 2)
+
+    def test_flush_drops_hits_of_deleted_hit_counts(self):
+        other_hit_count = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        for hit_count in (self.hit_count, other_hit_count):
+            self.buffer.add(Hit(hitcount=hit_count))
+        other_hit_count.delete()
+
+        with self.assertLogs("hitcount.buffer", "WARNING"):
+            self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(list(Hit.objects.values_list("hitcount", flat=True)), [self.hit_count.pk])
+
+
+class TestFlushHits(TestCase):
+    def test_flush_hits(self):
+        hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+        with patch.object(settings, "HITCOUNT_BUFFER_FLUSH_INTERVAL", 60):
+            hit_buffer.add(Hit(hitcount=hit_count))
+
+        # called with the arguments of a worker shutdown hook, e.g. gunicorn's `worker_exit(server, worker)`.
+        flush_hits(None, None)
+
+        self.assertEqual(len(hit_buffer), 0)
+        self.assertEqual(Hit.objects.count(), 1)
@@ -9,6 +9,7 @@ from django.utils import timezone
 from blog.models import Post
 from hitcount.conf import settings
 from hitcount.models import Hit
+from hitcount.models import HitRollup
 from hitcount.utils import get_hitcount_model
 
 
@@ -50,3 +51,17 @@ class TestHitCountCleanUp(TestCase):
         call_command(self.COMMAND_NAME, stdout=out)
 
         self.assertIn("Successfully removed 4 Hits", out.getvalue())
+
+    @patch.object(settings, "HITCOUNT_ROLLUPS", True)
+    @patch.object(settings, "HITCOUNT_KEEP_HOURLY_ROLLUPS", {"weeks": 4})
+    def test_remove_expired_rollups(self):
+        HitRollup.objects.record(Hit.objects.all())
+        out = StringIO()
+
+        call_command(self.COMMAND_NAME, stdout=out)
+
+        self.assertIn("Successfully removed 4 rollups", out.getvalue())
+        self.assertEqual(HitRollup.objects.filter(period=HitRollup.Period.HOUR).count(), 6)
+        self.assertEqual(HitRollup.objects.filter(period=HitRollup.Period.DAY).count(), 10)
+        # the counts of the removed hits are kept, from the start of the day the window starts in.
+        self.assertEqual(HitCount.objects.get().hits_in_last(days=40), 9)
@@ -0,0 +1,43 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.backends import get_backend
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+
+class TestHitCountFlush(TestCase):
+    COMMAND_NAME = "hitcount_flush"
+
+    def setUp(self):
+        post = Post.objects.create(title="hi", content="some text")
+        self.hit_count = HitCount.objects.create(content_object=post)
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.cache.LocMemBackend")
+    def test_reconcile_backend(self):
+        self.addCleanup(get_backend().cache.clear)
+        for _ in range(2):
+            Hit.objects.create(hitcount=self.hit_count)
+        out = StringIO()
+
+        call_command(self.COMMAND_NAME, stdout=out)
+
+        self.assertIn("Successfully reconciled 1 HitCounts", out.getvalue())
+        self.hit_count.refresh_from_db()
+        self.assertEqual(self.hit_count.hits, 2)
+
+    @patch.object(settings, "HITCOUNT_BACKEND", "hitcount.backends.cache.LocMemBackend")
+    def test_nothing_to_reconcile(self):
+        out = StringIO()
+
+        call_command(self.COMMAND_NAME, stdout=out)
+
+        self.assertIn("Successfully reconciled 0 HitCounts", out.getvalue())
@@ -0,0 +1,58 @@
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management import CommandError
+from django.test import TestCase
+
+from hitcount.blocklist import blocklist
+from hitcount.conf import settings
+from hitcount.models import BlockedIP
+
+
+class TestHitCountImportBlockedIPs(TestCase):
+    COMMAND_NAME = "hitcount_import_blocked_ips"
+
+    def setUp(self):
+        BlockedIP.objects.create(ip="10.0.0.0/8")
+
+        blocked_ips = tempfile.NamedTemporaryFile("w", suffix=".txt")
+        self.addCleanup(blocked_ips.close)
+        blocked_ips.write(
+            "# cloud ranges\n10.0.0.0/8\n192.0.2.7/24  # a scraper\n\n2001:db8::/32\n198.51.100.1\nnot an ip\n"
+        )
+        blocked_ips.flush()
+        self.path = blocked_ips.name
+
+    def test_import(self):
+        out = StringIO()
+        err = StringIO()
+
+        call_command(self.COMMAND_NAME, self.path, stdout=out, stderr=err)
+
+        self.assertIn("Successfully blocked 3 IPs", out.getvalue())
+        self.assertIn("Skipped invalid network on line 7", err.getvalue())
+        self.assertCountEqual(
+            BlockedIP.objects.values_list("ip", flat=True),
+            ["10.0.0.0/8", "192.0.2.0/24", "2001:db8::/32", "198.51.100.1"],
+        )
+
+    def test_import_from_stdin(self):
+        with patch("sys.stdin", StringIO("203.0.113.0/24\n")):
+            call_command(self.COMMAND_NAME, "-", stdout=StringIO())
+
+        self.assertIs(BlockedIP.objects.is_blocked("203.0.113.9"), True)
+
+    @patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default")
+    def test_import_invalidates_blocklist(self):
+        self.addCleanup(blocklist.clear)
+        self.assertIs(BlockedIP.objects.is_blocked("192.0.2.9"), False)
+
+        call_command(self.COMMAND_NAME, self.path, stdout=StringIO(), stderr=StringIO())
+
+        self.assertIs(BlockedIP.objects.is_blocked("192.0.2.9"), True)
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command(self.COMMAND_NAME, "/does/not/exist.txt")
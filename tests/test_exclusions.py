@@ -0,0 +1,101 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.test import TestCase
+
+from hitcount.conf import settings
+from hitcount.exclusions import excluded_users
+
+
+@patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
+@patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP_CACHE", "default")
+class TestExcludedUsers(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name="Admin")
+        cls.user = User.objects.create_user("admin")
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def assertExcluded(self, expected):
+        self.assertIs(excluded_users.is_excluded(self.user), expected)
+
+    def test_answer_cached(self):
+        self.user.groups.add(self.group)
+
+        with self.assertNumQueries(1):
+            self.assertExcluded(True)
+        with self.assertNumQueries(0):
+            self.assertExcluded(True)
+
+    def test_not_cached_without_setting(self):
+        self.assertExcluded(False)
+
+        with patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP_CACHE", None):
+            self.assertNumQueries(1, excluded_users.is_excluded, self.user)
+            self.assertNumQueries(1, excluded_users.is_excluded, self.user)
+
+    def test_anonymous_user(self):
+        with self.assertNumQueries(0):
+            self.assertIs(excluded_users.is_excluded(None), False)
+
+    def test_invalidated_by_user_groups(self):
+        self.assertExcluded(False)
+
+        self.user.groups.add(self.group)
+        self.assertExcluded(True)
+
+        self.user.groups.clear()
+        self.assertExcluded(False)
+
+    def test_invalidated_by_group_users(self):
+        self.assertExcluded(False)
+
+        self.group.user_set.add(self.user)
+        self.assertExcluded(True)
+
+        self.group.user_set.remove(self.user)
+        self.assertExcluded(False)
+
+        self.group.user_set.add(self.user)
+        self.assertExcluded(True)
+
+        self.group.user_set.clear()
+        self.assertExcluded(False)
+
+    def test_invalidated_by_group_changes(self):
+        other = Group.objects.create(name="Editor")
+        self.user.groups.add(other)
+        self.assertExcluded(False)
+
+        self.group.name = "Staff"
+        self.group.save()
+        other.name = "Admin"
+        other.save()
+        self.assertExcluded(True)
+
+        other.delete()
+        self.assertExcluded(False)
+
+    def test_only_user_groups_listened_to(self):
+        self.assertIs(m2m_changed.has_listeners(User.groups.through), True)
+        self.assertIs(m2m_changed.has_listeners(User.user_permissions.through), False)
+
+    def test_other_users_kept(self):
+        other = User.objects.create_user("editor")
+        self.assertExcluded(False)
+
+        other.groups.add(self.group)
+
+        with self.assertNumQueries(0):
+            self.assertExcluded(False)
+
+    async def test_ais_excluded(self):
+        await self.user.groups.aadd(self.group)
+
+        self.assertIs(await excluded_users.ais_excluded(self.user), True)
+        self.assertIs(await excluded_users.ais_excluded(None), False)
@@ -0,0 +1,47 @@
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from hitcount.conf import settings
+from hitcount.executor import HitExecutor
+
+
+@patch.object(settings, "HITCOUNT_BACKGROUND_WORKERS", 1)
+@patch.object(settings, "HITCOUNT_BACKGROUND_QUEUE_SIZE", 2)
+class TestHitExecutor(SimpleTestCase):
+    def setUp(self):
+        self.executor = HitExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def test_submit(self):
+        results = []
+
+        self.assertIs(self.executor.submit(results.append, 1), True)
+        self.assertIs(self.executor.wait(timeout=5), True)
+
+        self.assertEqual(results, [1])
+        self.assertEqual(
+            self.executor.get_stats(), {"queued": 0, "submitted": 1, "rejected": 0, "completed": 1, "failed": 0}
+        )
+
+    def test_queue_is_bounded(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        self.assertIs(self.executor.submit(release.wait), True)
+        self.assertIs(self.executor.submit(release.wait), True)
+        self.assertIs(self.executor.submit(release.wait), False)
+        self.assertEqual(self.executor.get_stats()["queued"], 2)
+        self.assertEqual(self.executor.get_stats()["rejected"], 1)
+
+        release.set()
+        self.assertIs(self.executor.wait(timeout=5), True)
+        self.assertIs(self.executor.submit(release.wait), True)
+
+    def test_failed_task(self):
+        with self.assertLogs("hitcount.executor", "ERROR"):
+            self.executor.submit(int, "not a number")
+            self.assertIs(self.executor.wait(timeout=5), True)
+
+        self.assertEqual(self.executor.get_stats()["failed"], 1)
@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+
+from hitcount.hyperloglog import HyperLogLog
+
+
+class TestHyperLogLog(SimpleTestCase):
+    def test_count(self):
+        for cardinality in (0, 10, 1000, 100000):
+            with self.subTest(cardinality=cardinality):
+                hyperloglog = HyperLogLog()
+                for i in range(cardinality):
+                    hyperloglog.add("session-%s" % i)
+
+                self.assertAlmostEqual(len(hyperloglog), cardinality, delta=cardinality * 0.05)
+
+    def test_add_same_value(self):
+        hyperloglog = HyperLogLog()
+
+        self.assertIs(hyperloglog.add("session"), True)
+        self.assertIs(hyperloglog.add("session"), False)
+        self.assertEqual(hyperloglog.count(), 1)
+
+    def test_fixed_size(self):
+        self.assertEqual(len(HyperLogLog().registers), 4096)
+        self.assertEqual(len(HyperLogLog(precision=8).registers), 256)
+
+    def test_invalid_precision(self):
+        for precision in (3, 17):
+            with self.subTest(precision=precision), self.assertRaises(ValueError):
+                HyperLogLog(precision=precision)
+
+        with self.assertRaises(ValueError):
+            HyperLogLog(registers=bytes(100))
+
+    def test_update(self):
+        hyperloglog = HyperLogLog()
+        other = HyperLogLog()
+        for i in range(1000):
+            hyperloglog.add("session-%s" % i)
+            other.add("session-%s" % (i + 500))
+
+        hyperloglog.update(other.registers)
+
+        self.assertAlmostEqual(hyperloglog.count(), 1500, delta=1500 * 0.05)
+        self.assertEqual(HyperLogLog(registers=bytes(hyperloglog.registers)).count(), hyperloglog.count())
+
+    def test_fold(self):
+        hyperloglog = HyperLogLog(precision=14)
+        expected = HyperLogLog(precision=10)
+        for i in range(5000):
+            hyperloglog.add("session-%s" % i)
+            expected.add("session-%s" % i)
+
+        # the same as if the strings had been added at the lower precision.
+        self.assertEqual(hyperloglog.fold(10).registers, expected.registers)
+        self.assertEqual(hyperloglog.fold(14).registers, hyperloglog.registers)
+        with self.assertRaises(ValueError):
+            hyperloglog.fold(16)
+
+    def test_update_with_other_precision(self):
+        for precision, other_precision in [(12, 14), (14, 12)]:
+            with self.subTest(precision=precision, other_precision=other_precision):
+                hyperloglog = HyperLogLog(precision)
+                other = HyperLogLog(other_precision)
+                for i in range(1000):
+                    hyperloglog.add("session-%s" % i)
+                    other.add("session-%s" % (i + 500))
+
+                hyperloglog.update(other.registers)
+
+                self.assertEqual(hyperloglog.precision, 12)
+                self.assertAlmostEqual(hyperloglog.count(), 1500, delta=1500 * 0.05)
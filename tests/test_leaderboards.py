@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.conf import settings
+from hitcount.leaderboards import leaderboards
+from hitcount.models import Hit
+from hitcount.models import HitCount
+
+
+@patch.object(settings, "HITCOUNT_LEADERBOARD_CACHE", "default")
+@patch.object(settings, "HITCOUNT_LEADERBOARD_SIZE", 3)
+class TestLeaderboards(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.hit_counts = [
+            HitCount.objects.create(content_object=Post.objects.create(title="post %s" % i, content="text"), hits=hits)
+            for i, hits in enumerate([5, 4, 3, 2])
+        ]
+        # the content type is cached.
+        ContentType.objects.get_for_model(Post)
+
+    def assertTop(self, indexes, n=3, **period):
+        with self.assertNumQueries(0):
+            entries = HitCount.objects.top(Post, n=n, **period)
+        self.assertEqual([entry.hit_count.pk for entry in entries], [self.hit_counts[i].pk for i in indexes])
+
+    def test_top(self):
+        with self.assertNumQueries(1):
+            entries = HitCount.objects.top(Post, n=2)
+
+        self.assertEqual(entries, [(self.hit_counts[0], 5), (self.hit_counts[1], 4)])
+        self.assertTop([0, 1, 2])
+
+    def test_more_than_the_size(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(HitCount.objects.top(Post, n=4)), 4)
+        self.assertIsNone(cache.get(leaderboards.make_key(self.hit_counts[0].content_type_id)))
+
+    def test_updated_with_hit_counts(self):
+        HitCount.objects.top(Post, n=3)
+
+        for __ in range(3):
+            Hit.objects.create(hitcount=self.hit_counts[3])
+        self.hit_counts[1].increase(2)
+
+        self.assertTop([1, 0, 3])
+        self.assertEqual(HitCount.objects.top(Post, n=1)[0].hits, 6)
+
+    def test_off_the_board_after_decrease(self):
+        HitCount.objects.top(Post, n=3)
+
+        # still ahead of the other HitCounts on the board.
+        self.hit_counts[0].decrease(1)
+        self.assertTop([0, 1, 2])
+
+        self.hit_counts[0].decrease(3)
+        with self.assertNumQueries(1):
+            entries = HitCount.objects.top(Post, n=3)
+        self.assertEqual(entries, [(self.hit_counts[1], 4), (self.hit_counts[2], 3), (self.hit_counts[3], 2)])
+
+    def test_all_the_hit_counts_on_the_board(self):
+        HitCount.objects.filter(pk__in=[self.hit_counts[2].pk, self.hit_counts[3].pk]).delete()
+        HitCount.objects.top(Post, n=1)
+
+        self.hit_counts[0].decrease(5)
+        post = Post.objects.create(title="other", content="text")
+        hit_count = HitCount.objects.get_for_object(post)
+        hit_count.increase()
+
+        with self.assertNumQueries(0):
+            entries = HitCount.objects.top(Post, n=3)
+        self.assertEqual(entries, [(self.hit_counts[1], 4), (hit_count, 1), (self.hit_counts[0], 0)])
+
+    @patch.object(settings, "HITCOUNT_ROLLUPS", True)
+    def test_period(self):
+        for hit_count, hits in zip(self.hit_counts, [1, 0, 2, 3]):
+            Hit.objects.bulk_record(Hit(hitcount=hit_count, session="session") for _ in range(hits))
+
+        with self.assertNumQueries(1):
+            entries = HitCount.objects.top(Post, n=3, days=7)
+        self.assertEqual(entries, [(self.hit_counts[3], 3), (self.hit_counts[2], 2), (self.hit_counts[0], 1)])
+
+        HitCount.objects.top(Post, n=3)
+
+        # the boards over a period are only read again once they expire.
+        Hit.objects.create(hitcount=self.hit_counts[1])
+        self.assertTop([3, 2, 0], days=7)
+        self.assertTop([0, 1, 2])
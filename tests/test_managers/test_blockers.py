@@ -1,5 +1,12 @@
+from unittest.mock import patch
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from hitcount.blocklist import blocked_expressions
+from hitcount.blocklist import blocklist
+from hitcount.conf import settings
 from hitcount.models import BlockedIP
 from hitcount.models import BlockedUserAgent
 
@@ -14,6 +21,40 @@ class TestBlockIPManager(TestCase):
         self.assertIs(BlockedIP.objects.is_blocked("10.1.2.1"), True)
         self.assertIs(BlockedIP.objects.is_blocked("10.1.1.1"), False)
 
+    def test_is_blocked_by_network(self):
+        BlockedIP.objects.create(ip="10.1.0.0/16")
+        BlockedIP.objects.create(ip="2001:db8::/32")
+
+        with self.assertNumQueries(1):
+            self.assertIs(BlockedIP.objects.is_blocked("10.1.2.1"), True)
+        self.assertIs(BlockedIP.objects.is_blocked("10.2.2.1"), False)
+        self.assertIs(BlockedIP.objects.is_blocked("2001:db8:1::1"), True)
+        self.assertIs(BlockedIP.objects.is_blocked("2001:db9::1"), False)
+
+    @patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default")
+    def test_is_blocked_in_memory(self):
+        self.addCleanup(blocklist.clear)
+        BlockedIP.objects.create(ip="10.1.2.1")
+        BlockedIP.objects.create(ip="192.0.2.0/24")
+        blocklist.refresh()
+
+        with self.assertNumQueries(0):
+            self.assertIs(BlockedIP.objects.is_blocked("10.1.2.1"), True)
+            self.assertIs(BlockedIP.objects.is_blocked("10.1.1.1"), False)
+            self.assertIs(BlockedIP.objects.is_blocked("192.0.2.100"), True)
+
+    async def test_is_blocked_async(self):
+        await BlockedIP.objects.acreate(ip="10.1.0.0/16")
+
+        self.assertIs(await BlockedIP.objects.ais_blocked(), False)
+        self.assertIs(await BlockedIP.objects.ais_blocked("10.1.2.1"), True)
+        self.assertIs(await BlockedIP.objects.ais_blocked("10.2.2.1"), False)
+
+        with patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default"):
+            self.addCleanup(blocklist.clear)
+            self.assertIs(await BlockedIP.objects.ais_blocked("10.1.2.1"), True)
+            self.assertIs(await BlockedIP.objects.ais_blocked("10.2.2.1"), False)
+
 
 class TestBlockUserAgentManager(TestCase):
     def test_is_blocked(self):
@@ -27,3 +68,75 @@ class TestBlockUserAgentManager(TestCase):
 
         self.assertIs(BlockedUserAgent.objects.is_blocked(user_agent_windows), True)
         self.assertIs(BlockedUserAgent.objects.is_blocked(user_agent_mac), False)
+
+    def test_is_blocked_by_pattern(self):
+        self.addCleanup(blocked_expressions.clear)
+        BlockedUserAgent.objects.create(user_agent="bot", match_type=BlockedUserAgent.MatchType.CONTAINS)
+        BlockedUserAgent.objects.create(user_agent="^curl/[0-9]+", match_type=BlockedUserAgent.MatchType.REGEX)
+        BlockedUserAgent.objects.create(user_agent="50%_off", match_type=BlockedUserAgent.MatchType.CONTAINS)
+
+        self.assertIs(BlockedUserAgent.objects.is_blocked("Mozilla/5.0 (compatible; GoogleBot/2.1)"), True)
+        with self.assertNumQueries(0):
+            self.assertIs(BlockedUserAgent.objects.is_blocked("curl/8.4.0"), True)
+        self.assertIs(BlockedUserAgent.objects.is_blocked("my curl/8.4.0"), False)
+        # the wildcards of LIKE are escaped.
+        self.assertIs(BlockedUserAgent.objects.is_blocked("agent 50%_off"), True)
+        self.assertIs(BlockedUserAgent.objects.is_blocked("agent 50 percent off"), False)
+
+    def test_regex_matched_in_python(self):
+        self.addCleanup(blocked_expressions.clear)
+        BlockedUserAgent.objects.create(user_agent=r"(?P<name>bot)/\d", match_type=BlockedUserAgent.MatchType.REGEX)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIs(BlockedUserAgent.objects.is_blocked("mybot/2"), True)
+            self.assertIs(BlockedUserAgent.objects.is_blocked("mybot/v2"), False)
+
+        # the expression isn't handed to the regex dialect of the database.
+        self.assertFalse(any("REGEXP" in query["sql"].upper() for query in queries))
+
+    def test_expressions_compiled_once(self):
+        self.addCleanup(blocked_expressions.clear)
+        BlockedUserAgent.objects.create(user_agent=r"^curl/\d", match_type=BlockedUserAgent.MatchType.REGEX)
+        self.assertIs(BlockedUserAgent.objects.is_blocked("curl/8"), True)
+
+        with patch("hitcount.blocklist.UserAgentMatcher") as mock_matcher:
+            with self.assertNumQueries(1):
+                self.assertIs(BlockedUserAgent.objects.is_blocked("agent"), False)
+            # read again, but not compiled again as long as they are the same.
+            blocked_expressions.clear()
+            self.assertIs(BlockedUserAgent.objects.is_blocked("agent"), False)
+        mock_matcher.assert_not_called()
+
+        BlockedUserAgent.objects.create(user_agent="^wget/", match_type=BlockedUserAgent.MatchType.REGEX)
+        self.assertIs(BlockedUserAgent.objects.is_blocked("wget/1.21"), True)
+
+    async def test_expressions_matched_async(self):
+        self.addCleanup(blocked_expressions.clear)
+        await BlockedUserAgent.objects.acreate(user_agent=r"^curl/\d", match_type=BlockedUserAgent.MatchType.REGEX)
+
+        self.assertIs(await BlockedUserAgent.objects.ais_blocked("curl/8"), True)
+        self.assertIs(await BlockedUserAgent.objects.ais_blocked("agent"), False)
+
+    @patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default")
+    def test_is_blocked_in_memory(self):
+        self.addCleanup(blocklist.clear)
+        BlockedUserAgent.objects.create(user_agent="my_clever_agent")
+        BlockedUserAgent.objects.create(user_agent="crawler", match_type=BlockedUserAgent.MatchType.CONTAINS)
+        blocklist.refresh()
+
+        with self.assertNumQueries(0):
+            self.assertIs(BlockedUserAgent.objects.is_blocked("my_clever_agent"), True)
+            self.assertIs(BlockedUserAgent.objects.is_blocked("my_agent"), False)
+            self.assertIs(BlockedUserAgent.objects.is_blocked("Some Crawler/1.0"), True)
+
+    async def test_is_blocked_async(self):
+        await BlockedUserAgent.objects.acreate(user_agent="crawler", match_type=BlockedUserAgent.MatchType.CONTAINS)
+
+        self.assertIs(await BlockedUserAgent.objects.ais_blocked(), False)
+        self.assertIs(await BlockedUserAgent.objects.ais_blocked("Some Crawler/1.0"), True)
+        self.assertIs(await BlockedUserAgent.objects.ais_blocked("my_agent"), False)
+
+        with patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default"):
+            self.addCleanup(blocklist.clear)
+            self.assertIs(await BlockedUserAgent.objects.ais_blocked("Some Crawler/1.0"), True)
+            self.assertIs(await BlockedUserAgent.objects.ais_blocked("my_agent"), False)
@@ -2,12 +2,20 @@ from datetime import timedelta
 from importlib import import_module
 from unittest.mock import patch
 
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.test import RequestFactory
 from django.test import TestCase
 from django.utils import timezone
 
 from blog.models import Post
+from hitcount.blocklist import blocked_expressions
+from hitcount.blocklist import blocklist
 from hitcount.conf import settings
+from hitcount.models import BlockedIP
+from hitcount.models import BlockedUserAgent
 from hitcount.models import Hit
 from hitcount.models import HitCount
 
@@ -74,6 +82,173 @@ class TestHitManager(TestCase):
         with patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 2):
             self.assertIs(Hit.objects.has_limit_reached_by_session(session_key, self.hitcount), True)
 
+    async def test_has_limit_reached_async(self):
+        await Hit.objects.acreate(hitcount=self.hitcount, ip="127.0.0.1", session="session")
+
+        with patch.object(settings, "HITCOUNT_HITS_PER_IP_LIMIT", 1):
+            self.assertIs(await Hit.objects.ahas_limit_reached_by_ip(), False)
+            self.assertIs(await Hit.objects.ahas_limit_reached_by_ip("127.0.0.1"), True)
+            self.assertIs(await Hit.objects.ahas_limit_reached_by_ip("127.0.0.2"), False)
+
+        with patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1):
+            self.assertIs(await Hit.objects.ahas_limit_reached_by_session("session", self.hitcount), True)
+            self.assertIs(await Hit.objects.ahas_limit_reached_by_session("other", self.hitcount), False)
+
+    def test_get_exclusion_reason_without_checks(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(Hit.objects.get_exclusion_reason(self.hitcount))
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
+    @patch.object(settings, "HITCOUNT_HITS_PER_IP_LIMIT", 2)
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 2)
+    def test_get_exclusion_reason(self):
+        user = User.objects.create_user("john", "lennon@thebeatles.com", "johnpassword")
+        kwargs = {"ip": "127.0.0.1", "user_agent": "agent", "user": user, "session_key": "session"}
+        self.addCleanup(blocked_expressions.clear)
+        # the blocked regular expressions are only read from time to time.
+        blocked_expressions.refresh()
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs))
+
+        Hit.objects.create(hitcount=self.hitcount, session="session")
+        self.assertIsNone(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs))
+        Hit.objects.create(hitcount=self.hitcount, session="session")
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "session_limit")
+
+        Hit.objects.create(hitcount=self.hitcount, ip="127.0.0.1")
+        Hit.objects.create(hitcount=self.hitcount, ip="127.0.0.1")
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "ip_limit")
+
+        Group.objects.create(name="Admin").user_set.add(user)
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "excluded_user_group")
+
+        BlockedUserAgent.objects.create(user_agent="agent")
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "blocked_user_agent")
+
+        BlockedIP.objects.create(ip="127.0.0.1")
+        with self.assertNumQueries(1):
+            self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "blocked_ip")
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_get_exclusion_reason_with_regex_user_agent(self):
+        self.addCleanup(blocked_expressions.clear)
+        other = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        Hit.objects.create(hitcount=self.hitcount, session="session")
+        # a Python expression, that the database may not understand.
+        BlockedUserAgent.objects.create(user_agent=r"(?P<name>bot)/\d", match_type=BlockedUserAgent.MatchType.REGEX)
+
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, user_agent="bot/2"), "blocked_user_agent")
+        # the other reasons are still checked when the expression doesn't match.
+        self.assertEqual(
+            Hit.objects.get_exclusion_reason(self.hitcount, user_agent="agent", session_key="session"), "session_limit"
+        )
+        self.assertEqual(
+            Hit.objects.get_exclusion_reasons([self.hitcount, other], user_agent="agent", session_key="session"),
+            {self.hitcount.pk: "session_limit", other.pk: None},
+        )
+        self.assertEqual(
+            Hit.objects.get_exclusion_reasons([self.hitcount, other], user_agent="bot/2"),
+            {self.hitcount.pk: "blocked_user_agent", other.pk: "blocked_user_agent"},
+        )
+        # the expressions were read once, the hits that don't match them are checked with a single query.
+        with self.assertNumQueries(1):
+            self.assertIsNone(Hit.objects.get_exclusion_reason(other, user_agent="agent", session_key="session"))
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
+    @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP_CACHE", "default")
+    def test_get_exclusion_reason_with_excluded_users_cached(self):
+        self.addCleanup(cache.clear)
+        user = User.objects.create_user("john", "lennon@thebeatles.com", "johnpassword")
+        Group.objects.create(name="Admin").user_set.add(user)
+        kwargs = {"ip": "127.0.0.1", "user_agent": "agent", "user": user}
+
+        self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "excluded_user_group")
+        # the blocklists are still checked first.
+        BlockedIP.objects.create(ip="127.0.0.1")
+        with self.assertNumQueries(1):
+            self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, **kwargs), "blocked_ip")
+
+        user.groups.clear()
+        self.assertIsNone(Hit.objects.get_exclusion_reason(self.hitcount, user=user))
+
+    @patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default")
+    def test_get_exclusion_reason_with_blocklists_in_memory(self):
+        self.addCleanup(blocklist.clear)
+        BlockedIP.objects.create(ip="127.0.0.1")
+        BlockedUserAgent.objects.create(user_agent="agent")
+        blocklist.refresh()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, ip="127.0.0.1"), "blocked_ip")
+            self.assertEqual(Hit.objects.get_exclusion_reason(self.hitcount, user_agent="agent"), "blocked_user_agent")
+            self.assertIsNone(Hit.objects.get_exclusion_reason(self.hitcount, ip="127.0.0.2", user_agent="other"))
+
+    async def test_get_exclusion_reason_async(self):
+        await BlockedUserAgent.objects.acreate(user_agent="agent")
+        await Hit.objects.acreate(hitcount=self.hitcount, ip="127.0.0.1", session="session")
+
+        self.assertEqual(
+            await Hit.objects.aget_exclusion_reason(self.hitcount, user_agent="agent"), "blocked_user_agent"
+        )
+        with patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1):
+            self.assertEqual(
+                await Hit.objects.aget_exclusion_reason(self.hitcount, session_key="session"), "session_limit"
+            )
+            self.assertIsNone(await Hit.objects.aget_exclusion_reason(self.hitcount, session_key="other"))
+
+        with patch.object(settings, "HITCOUNT_BLOCKLIST_CACHE", "default"):
+            self.addCleanup(blocklist.clear)
+            self.assertEqual(
+                await Hit.objects.aget_exclusion_reason(self.hitcount, user_agent="agent"), "blocked_user_agent"
+            )
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_get_exclusion_reasons(self):
+        other = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        Hit.objects.create(hitcount=self.hitcount, session="session")
+
+        with self.assertNumQueries(1):
+            reasons = Hit.objects.get_exclusion_reasons([self.hitcount, other], session_key="session")
+
+        self.assertEqual(reasons, {self.hitcount.pk: "session_limit", other.pk: None})
+        self.assertEqual(Hit.objects.get_exclusion_reasons([]), {})
+
+        BlockedIP.objects.create(ip="127.0.0.1")
+        self.assertEqual(
+            Hit.objects.get_exclusion_reasons([self.hitcount, other], ip="127.0.0.1"),
+            {self.hitcount.pk: "blocked_ip", other.pk: "blocked_ip"},
+        )
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_IP_LIMIT", 2)
+    def test_get_exclusion_reasons_with_ip_limit(self):
+        hitcounts = [self.hitcount] + [
+            HitCount.objects.create(content_object=Post.objects.create(title="other", content="text")) for _ in range(2)
+        ]
+        Hit.objects.create(hitcount=self.hitcount, ip="127.0.0.1")
+
+        reasons = Hit.objects.get_exclusion_reasons(hitcounts, ip="127.0.0.1")
+
+        # only one more hit can be counted for the IP.
+        self.assertEqual(list(reasons.values()), [None, "ip_limit", "ip_limit"])
+
+        Hit.objects.create(hitcount=self.hitcount, ip="127.0.0.1")
+        with self.assertNumQueries(1):
+            reasons = Hit.objects.get_exclusion_reasons(hitcounts, ip="127.0.0.1")
+        self.assertEqual(list(reasons.values()), ["ip_limit"] * 3)
+
+    def test_bulk_record(self):
+        hits = Hit.objects.bulk_record(Hit(hitcount=self.hitcount) for _ in range(3))
+
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(Hit.objects.count(), 4)
+        self.hitcount.refresh_from_db()
+        self.assertEqual(self.hitcount.hits, 4)
+
+    def test_bulk_record_without_hits(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(Hit.objects.bulk_record([]), [])
+
 
 class TestHitCountManager(TestCase):
     def setUp(self):
@@ -87,6 +262,104 @@ class TestHitCountManager(TestCase):
         self.assertEqual(HitCount.objects.get_for_object(self.post), hit_count)
         self.assertEqual(HitCount.objects.get_for_object(post2), hit_count2)
 
+    def test_get_for_object_creates_missing(self):
+        # the INSERT ignores a conflicting row, the second SELECT returns the winner.
+        with self.assertNumQueries(3):
+            hit_count = HitCount.objects.get_for_object(self.post)
+
+        self.assertEqual(hit_count.object_pk, self.post.pk)
+        self.assertEqual(hit_count.hits, 0)
+        self.assertEqual(HitCount.objects.get_for_object(self.post), hit_count)
+        self.assertEqual(HitCount.objects.count(), 1)
+
+    def test_get_for_object_after_concurrent_insert(self):
+        hit_count = HitCount.objects.create(content_object=self.post, hits=3)
+
+        with patch.object(HitCount.objects, "get", side_effect=[HitCount.DoesNotExist, hit_count]):
+            self.assertEqual(HitCount.objects.get_for_object(self.post), hit_count)
+
+        self.assertEqual(HitCount.objects.count(), 1)
+
+    def test_get_for_object_without_create(self):
+        with self.assertNumQueries(1):
+            hit_count = HitCount.objects.get_for_object(self.post, create=False)
+
+        self.assertIsNone(hit_count.pk)
+        self.assertEqual(hit_count.hits, 0)
+        self.assertEqual(hit_count.hits_in_last(days=1), 0)
+        self.assertEqual(hit_count.unique_visitors(), 0)
+        self.assertFalse(HitCount.objects.exists())
+
+        HitCount.objects.create(content_object=self.post, hits=3)
+        self.assertEqual(HitCount.objects.get_for_object(self.post, create=False).hits, 3)
+
+    def test_get_for_objects(self):
+        posts = [self.post] + [Post.objects.create(title="post %s" % i, content="text") for i in range(2)]
+        hit_count = HitCount.objects.create(content_object=self.post, hits=3)
+        blocked_ip = BlockedIP.objects.create(ip="127.0.0.1")
+        # the content types are cached.
+        ContentType.objects.get_for_models(Post, BlockedIP)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(HitCount.objects.get_for_objects([]), {})
+
+        with self.assertNumQueries(1):
+            hit_counts = HitCount.objects.get_for_objects(posts + [blocked_ip], create=False)
+
+        self.assertEqual(hit_counts[self.post], hit_count)
+        self.assertEqual([hit_counts[post].pk for post in posts[1:]], [None, None])
+        self.assertEqual(hit_counts[blocked_ip].hits, 0)
+        self.assertEqual(HitCount.objects.count(), 1)
+
+        # the missing ones are inserted together and read back.
+        with self.assertNumQueries(3):
+            hit_counts = HitCount.objects.get_for_objects(posts + [blocked_ip, self.post])
+
+        self.assertEqual(len(hit_counts), 4)
+        self.assertEqual(hit_counts[self.post].hits, 3)
+        self.assertEqual(hit_counts[blocked_ip].content_object, blocked_ip)
+        self.assertEqual(
+            {hit_count.pk for hit_count in hit_counts.values()}, set(HitCount.objects.values_list("pk", flat=True))
+        )
+
+    async def test_aget_for_object(self):
+        hit_count = await HitCount.objects.acreate(content_object=self.post)
+        post2 = await Post.objects.acreate(title="my title2", content="my text")
+
+        self.assertEqual(await HitCount.objects.aget_for_object(self.post), hit_count)
+        self.assertEqual((await HitCount.objects.aget_for_object(post2)).object_pk, post2.pk)
+        self.assertEqual(await HitCount.objects.acount(), 2)
+
+        post3 = await Post.objects.acreate(title="my title3", content="my text")
+        self.assertIsNone((await HitCount.objects.aget_for_object(post3, create=False)).pk)
+        self.assertEqual(await HitCount.objects.acount(), 2)
+
+    def test_top(self):
+        posts = [self.post] + [Post.objects.create(title="post %s" % i, content="text") for i in range(3)]
+        hit_counts = [
+            HitCount.objects.create(content_object=post, hits=hits) for post, hits in zip(posts, [5, 7, 7, 1])
+        ]
+        HitCount.objects.create(content_object=BlockedIP.objects.create(ip="127.0.0.1"), hits=100)
+        for hit_count, hits in zip(hit_counts, [1, 0, 2, 3]):
+            Hit.objects.bulk_record(Hit(hitcount=hit_count, session="session") for _ in range(hits))
+        with patch("django.utils.timezone.now", return_value=timezone.now() - timedelta(days=2)):
+            Hit.objects.create(hitcount=hit_counts[1])
+        ContentType.objects.get_for_model(Post)
+
+        with self.assertNumQueries(1):
+            entries = HitCount.objects.top(Post, n=3)
+
+        self.assertEqual(entries, [(hit_counts[2], 9), (hit_counts[1], 8), (hit_counts[0], 6)])
+        self.assertEqual(entries[0].hit_count.hits, 9)
+        self.assertEqual(HitCount.objects.top(self.post, n=1), [(hit_counts[2], 9)])
+
+        self.assertEqual(
+            HitCount.objects.top(Post, days=1), [(hit_counts[3], 3), (hit_counts[2], 2), (hit_counts[0], 1)]
+        )
+        with patch.object(settings, "HITCOUNT_ROLLUPS", True):
+            # the hits counted before the rollups aren't in them.
+            self.assertEqual(HitCount.objects.top(Post, days=1), [])
+
     def test_generic_relation(self):
         """
         Test generic relation back to HitCount from a model.
@@ -2,17 +2,30 @@ from datetime import timedelta
 from importlib import import_module
 from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import User
 from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from blog.models import Post
+from hitcount.bloom import SessionHitFilter
+from hitcount.bloom import session_hit_filter
+from hitcount.buffer import hit_buffer
 from hitcount.conf import settings
+from hitcount.executor import hit_executor
 from hitcount.mixins import HitCountViewMixin
 from hitcount.models import BlockedIP
 from hitcount.models import BlockedUserAgent
 from hitcount.models import Hit
 from hitcount.models import HitCount
+from tests.test_bloom import seed_now
 from tests.test_views import BaseHitCountViewTest
 
 
@@ -29,6 +42,59 @@ class TestHitCountViewMixin(BaseHitCountViewTest):
         hit = Hit.objects.last()
         self.assertIsNone(hit.ip)
 
+    @patch.object(settings, "HITCOUNT_BUFFER_HITS", True)
+    @patch.object(settings, "HITCOUNT_BUFFER_SIZE", 2)
+    @patch.object(settings, "HITCOUNT_BUFFER_FLUSH_INTERVAL", 60)
+    def test_buffered_hits(self):
+        self.addCleanup(hit_buffer.flush)
+        response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+        self.assertEqual(response.hit_message, "Hit counted: session key")
+        self.assertEqual(Hit.objects.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertEqual(Hit.objects.count(), 2)
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 2)
+
+    @patch.object(settings, "HITCOUNT_BLOOM_FILTER", True)
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_session_limit_with_bloom_filter(self):
+        self.addCleanup(session_hit_filter.clear)
+        # seeded with the active hits, there are none yet.
+        with patch.object(SessionHitFilter, "_start_seeding", autospec=True, side_effect=seed_now):
+            session_hit_filter.get_filter()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+        self.assertIs(response.hit_counted, True)
+        # the hits of a new session need not be looked at.
+        self.assertNotIn('FROM "hitcount_hit"', queries[0]["sql"])
+
+        response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+        self.assertIs(response.hit_counted, False)
+        self.assertEqual(response.hit_message, "Not counted: hits per session limit reached.")
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_BOTS", True)
+    def test_bot_not_counted(self):
+        self.request_post.META["HTTP_USER_AGENT"] = "Mozilla/5.0 (compatible; Googlebot/2.1)"
+        self.request_post.session = SessionStore(session_key=None)
+
+        with self.assertNumQueries(0):
+            response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, False)
+        self.assertEqual(response.hit_message, "Not counted: bot")
+        self.assertIsNone(self.request_post.session.session_key)
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_BOTS", True)
+    def test_browser_counted_when_excluding_bots(self):
+        response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+
     def test_session_key_is_not_present(self):
         session = SessionStore(session_key=None)
 
@@ -42,6 +108,27 @@ class TestHitCountViewMixin(BaseHitCountViewTest):
         hit = Hit.objects.last()
         self.assertIsNotNone(hit.session)
 
+    @patch.object(settings, "HITCOUNT_IDENTITY", "hash")
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_hashed_identity(self):
+        self.request_post.session = SessionStore(session_key=None)
+
+        # the checks, the UPDATE and the INSERT, but no session is saved.
+        with self.assertNumQueries(3):
+            response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+        self.assertIsNone(self.request_post.session.session_key)
+        self.assertEqual(len(Hit.objects.get().session), 40)
+
+        # the same visitor is recognised without a session.
+        response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+        self.assertIs(response.hit_counted, False)
+
+        self.request_post.META["HTTP_USER_AGENT"] = "another_agent"
+        response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+        self.assertIs(response.hit_counted, True)
+
     def test_anonymous_user_hit(self):
         response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
 
@@ -159,6 +246,18 @@ class TestHitCountViewMixin(BaseHitCountViewTest):
         self.assertIs(response.hit_counted, False)
         self.assertEqual(response.hit_message, "Not counted: hits per session limit reached.")
 
+    @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
+    @patch.object(settings, "HITCOUNT_HITS_PER_IP_LIMIT", 10)
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 10)
+    def test_eligibility_is_checked_with_one_query(self):
+        self.request_post.user = User.objects.create_user("john", "lennon@thebeatles.com", "johnpassword")
+
+        # one query for the checks, one UPDATE of the HitCount and one INSERT of the Hit.
+        with self.assertNumQueries(3):
+            response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+
     @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
     def test_excluded_user_group_not_counted(self):
         self.request_post.user = User.objects.create_user("john", "lennon@thebeatles.com", "johnpassword")
@@ -192,3 +291,229 @@ class TestHitCountViewMixin(BaseHitCountViewTest):
         response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
         self.assertIs(response.hit_counted, False)
         self.assertEqual(response.hit_message, "Not counted: user agent has been blocked")
+
+
+@patch.object(settings, "HITCOUNT_USE_IP", True)
+class TestAsyncHitCountViewMixin(BaseHitCountViewTest):
+    async def test_anonymous_user_hit(self):
+        response = await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+        self.assertEqual(response.hit_message, "Hit counted: session key")
+        hit = await Hit.objects.select_related("hitcount").aget()
+        self.assertEqual(hit.ip, "127.0.0.1")
+        self.assertEqual(hit.hitcount.hits, 1)
+
+    async def test_session_key_is_not_present(self):
+        self.request_post.session = SessionStore(session_key=None)
+
+        response = await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, True)
+        self.assertIsNotNone(self.request_post.session.session_key)
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    async def test_hits_per_session_limit(self):
+        await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        response = await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, False)
+        self.assertEqual(response.hit_message, "Not counted: hits per session limit reached.")
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_USER_GROUP", ("Admin",))
+    async def test_excluded_user_group_not_counted(self):
+        user = await User.objects.acreate(username="john")
+        group = await Group.objects.acreate(name="Admin")
+        await group.user_set.aadd(user)
+
+        async def auser():
+            return user
+
+        self.request_post.auser = auser
+
+        response = await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, False)
+        self.assertEqual(response.hit_message, "Not counted: user group has been excluded")
+
+    async def test_blocked_ip(self):
+        await BlockedIP.objects.acreate(ip="127.0.0.1")
+
+        response = await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+
+        self.assertIs(response.hit_counted, False)
+        self.assertEqual(response.hit_message, "Not counted: user IP has been blocked")
+
+    @patch.object(settings, "HITCOUNT_BUFFER_HITS", True)
+    @patch.object(settings, "HITCOUNT_BUFFER_SIZE", 2)
+    @patch.object(settings, "HITCOUNT_BUFFER_FLUSH_INTERVAL", 60)
+    async def test_buffered_hits(self):
+        self.addCleanup(hit_buffer.flush)
+
+        await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+        self.assertEqual(await Hit.objects.acount(), 0)
+
+        await HitCountViewMixin.ahit_count(self.request_post, self.hit_count)
+        # the flush waits for the transaction of the test to be committed.
+        self.assertEqual(len(hit_buffer), 2)
+
+        await sync_to_async(hit_buffer.flush)()
+        self.assertEqual(await Hit.objects.acount(), 2)
+
+
+@patch.object(settings, "HITCOUNT_BACKGROUND_HITS", True)
+class TestBackgroundHitCount(TransactionTestCase):
+    def setUp(self):
+        post = Post.objects.create(title="my title", content="my text")
+        self.hit_count = HitCount.objects.create(content_object=post)
+        self.request = RequestFactory().post("/", REMOTE_ADDR="127.0.0.1", HTTP_USER_AGENT="my_clever_agent")
+        self.request.session = SessionStore()
+        self.request.user = AnonymousUser()
+        self.addCleanup(hit_executor.shutdown)
+
+    def test_hit_is_recorded_in_background(self):
+        response = HitCountViewMixin.hit_count(self.request, self.hit_count)
+
+        self.assertEqual(response, (True, "Hit queued", None))
+        self.assertIs(hit_executor.wait(timeout=5), True)
+        hit = Hit.objects.get()
+        self.assertEqual(hit.session, self.request.session.session_key)
+        self.assertEqual(HitCount.objects.get(pk=self.hit_count.pk).hits, 1)
+
+    async def test_async_hit_is_recorded_in_background(self):
+        response = await HitCountViewMixin.ahit_count(self.request, self.hit_count)
+
+        self.assertEqual(response, (True, "Hit queued", None))
+        self.assertIs(await sync_to_async(hit_executor.wait)(timeout=5), True)
+        self.assertEqual(await Hit.objects.acount(), 1)
+
+    @patch.object(settings, "HITCOUNT_BACKGROUND_QUEUE_SIZE", 0)
+    async def test_async_overflow(self):
+        response = await HitCountViewMixin.ahit_count(self.request, self.hit_count)
+        self.assertEqual(response, (True, "Hit counted: session key", 1))
+
+        with patch.object(settings, "HITCOUNT_BACKGROUND_OVERFLOW", "drop"):
+            response = await HitCountViewMixin.ahit_count(self.request, self.hit_count)
+        self.assertEqual(response, (False, "Not counted: too many hits queued", None))
+        self.assertEqual(await Hit.objects.acount(), 1)
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_limits_are_checked_in_background(self):
+        HitCountViewMixin.hit_count(self.request, self.hit_count)
+        hit_executor.wait(timeout=5)
+
+        response = HitCountViewMixin.hit_count(self.request, self.hit_count)
+        hit_executor.wait(timeout=5)
+
+        # the hit is optimistically reported as counted.
+        self.assertIs(response.hit_counted, True)
+        self.assertEqual(Hit.objects.count(), 1)
+
+    @patch.object(settings, "HITCOUNT_BACKGROUND_QUEUE_SIZE", 0)
+    def test_overflow(self):
+        response = HitCountViewMixin.hit_count(self.request, self.hit_count)
+
+        self.assertEqual(response, (True, "Hit counted: session key", 1))
+        self.assertEqual(Hit.objects.count(), 1)
+
+        with patch.object(settings, "HITCOUNT_BACKGROUND_OVERFLOW", "drop"):
+            response = HitCountViewMixin.hit_count(self.request, self.hit_count)
+
+        self.assertEqual(response, (False, "Not counted: too many hits queued", None))
+        self.assertEqual(Hit.objects.count(), 1)
+
+
+@patch.object(settings, "HITCOUNT_BACKGROUND_HITS", True)
+class TestBackgroundHitCountInTransaction(BaseHitCountViewTest):
+    def test_hit_is_queued_on_commit(self):
+        with patch.object(hit_executor, "submit", return_value=True) as mock_submit:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+            # the HitCount may not be visible to the background threads until then.
+            self.assertEqual(response, (True, "Hit queued", None))
+            mock_submit.assert_not_called()
+
+            callbacks[0]()
+            mock_submit.assert_called_once()
+
+    @patch.object(settings, "HITCOUNT_BACKGROUND_QUEUE_SIZE", 0)
+    def test_overflow_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            HitCountViewMixin.hit_count_many(self.request_post, [self.hit_count])
+
+        self.assertEqual(Hit.objects.count(), 1)
+
+        with patch.object(settings, "HITCOUNT_BACKGROUND_OVERFLOW", "drop"):
+            with self.captureOnCommitCallbacks(execute=True):
+                HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        self.assertEqual(Hit.objects.count(), 1)
+
+
+@patch.object(settings, "HITCOUNT_USE_IP", True)
+class TestHitCountMany(BaseHitCountViewTest):
+    def setUp(self):
+        super().setUp()
+        self.hit_counts = [self.hit_count] + [
+            HitCount.objects.create(content_object=Post.objects.create(title="post %s" % i, content="text"))
+            for i in range(2)
+        ]
+
+    @patch.object(settings, "HITCOUNT_HITS_PER_IP_LIMIT", 10)
+    @patch.object(settings, "HITCOUNT_HITS_PER_SESSION_LIMIT", 1)
+    def test_hits_are_counted_together(self):
+        HitCountViewMixin.hit_count(self.request_post, self.hit_count)
+
+        # one query for the checks, one for what is left of the IP limit, and the
+        # savepoint, INSERT, UPDATEs and release of the bulk write.
+        with self.assertNumQueries(7):
+            responses = HitCountViewMixin.hit_count_many(self.request_post, self.hit_counts)
+
+        self.assertEqual(
+            responses,
+            {
+                self.hit_counts[0].pk: (False, "Not counted: hits per session limit reached.", None),
+                self.hit_counts[1].pk: (True, "Hit counted: session key", 1),
+                self.hit_counts[2].pk: (True, "Hit counted: session key", 1),
+            },
+        )
+        self.assertEqual(Hit.objects.count(), 3)
+        self.assertEqual(list(HitCount.objects.order_by("pk").values_list("hits", flat=True)), [1, 1, 1])
+
+    def test_without_hitcounts(self):
+        self.assertEqual(HitCountViewMixin.hit_count_many(self.request_post, []), {})
+
+    @patch.object(settings, "HITCOUNT_EXCLUDE_BOTS", True)
+    def test_bot_not_counted(self):
+        self.request_post.META["HTTP_USER_AGENT"] = "curl/8.4.0"
+
+        responses = HitCountViewMixin.hit_count_many(self.request_post, self.hit_counts)
+
+        self.assertEqual(set(responses.values()), {(False, "Not counted: bot", None)})
+        self.assertFalse(Hit.objects.exists())
+
+
+class TestHitCountQuerySetMixin(TestCase):
+    def setUp(self):
+        self.posts = [Post.objects.create(title="post %s" % i, content="text") for i in range(4)]
+        for post, hits in zip(self.posts, [3, 0, 7]):
+            HitCount.objects.create(content_object=post, hits=hits)
+        # the posts loaded by the migrations of the blog are left out.
+        self.queryset = Post.objects.filter(pk__in=[post.pk for post in self.posts])
+        # the HitCount of an object of another model is left out too.
+        HitCount.objects.create(content_object=BlockedIP.objects.create(ip="127.0.0.1"), hits=100)
+
+    def test_with_hit_counts(self):
+        with self.assertNumQueries(1):
+            hits = dict(self.queryset.with_hit_counts().values_list("pk", "hits"))
+
+        self.assertEqual(hits, {post.pk: hits for post, hits in zip(self.posts, [3, 0, 7, 0])})
+        self.assertEqual(Post.objects.with_hit_counts("views").get(pk=self.posts[2].pk).views, 7)
+
+    def test_order_by_hits(self):
+        posts = self.posts
+        self.assertEqual(list(self.queryset.order_by_hits()), [posts[2], posts[0], posts[3], posts[1]])
+        self.assertEqual(list(self.queryset.order_by_hits(descending=False)), [posts[1], posts[3], posts[0], posts[2]])
+        self.assertEqual(list(self.queryset.with_hit_counts().filter(hits__gt=0).order_by_hits()), [posts[2], posts[0]])
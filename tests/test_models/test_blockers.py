@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase
+from django.test import TestCase
 
 from hitcount.models import BlockedIP
 from hitcount.models import BlockedUserAgent
@@ -13,8 +15,43 @@ class TestBlockedUserAgent(SimpleTestCase):
         self.assertEqual(str(ua), ua_text)
 
 
+class TestBlockedUserAgentClean(SimpleTestCase):
+    def test_regex_is_validated(self):
+        BlockedUserAgent(user_agent="(?i:bot)", match_type=BlockedUserAgent.MatchType.REGEX).clean()
+
+        for user_agent in ["(unclosed", "(?i)bot"]:
+            with self.subTest(user_agent=user_agent):
+                with self.assertRaises(ValidationError):
+                    BlockedUserAgent(user_agent=user_agent, match_type=BlockedUserAgent.MatchType.REGEX).clean()
+
+    def test_other_match_types_are_not_validated(self):
+        BlockedUserAgent(user_agent="(unclosed", match_type=BlockedUserAgent.MatchType.CONTAINS).clean()
+
+
 class TestBlockedIPModel(SimpleTestCase):
     def test_string_representation(self):
         ip = BlockedIP(ip="127.0.0.1")
 
         self.assertEqual(str(ip), "127.0.0.1")
+
+
+class TestBlockedIPSave(TestCase):
+    def test_ip_is_normalized(self):
+        for ip, expected in [
+            ("127.0.0.1", "127.0.0.1"),
+            ("127.0.0.2/32", "127.0.0.2"),
+            ("10.1.2.3/16", "10.1.0.0/16"),
+            ("2001:DB8:0::1", "2001:db8::1"),
+            ("2001:db8::/32", "2001:db8::/32"),
+        ]:
+            with self.subTest(ip=ip):
+                self.assertEqual(BlockedIP.objects.create(ip=ip).ip, expected)
+
+    def test_invalid_ip_is_saved_as_it_is(self):
+        self.assertEqual(BlockedIP.objects.create(ip="not an ip").ip, "not an ip")
+
+    def test_validation(self):
+        BlockedIP(ip="192.0.2.0/24").full_clean()
+
+        with self.assertRaises(ValidationError):
+            BlockedIP(ip="192.0.2.0/33").full_clean()
@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.utils import timezone
 
 from blog.models import Post
+from hitcount.conf import settings
 from hitcount.models import Hit
 from hitcount.utils import get_hitcount_model
 
@@ -162,3 +163,53 @@ class TestHitCountModel(TestCase):
 
         self.assertEqual(HitCount.objects.all().count(), 0)
         self.assertEqual(Hit.objects.all().count(), 0)
+
+
+@patch.object(settings, "HITCOUNT_TRENDING", True)
+@patch.object(settings, "HITCOUNT_TRENDING_HALF_LIFE", {"days": 1})
+class TestTrending(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.hit_counts = [
+            HitCount.objects.create(content_object=Post.objects.create(title="post %s" % i, content="text"))
+            for i in range(3)
+        ]
+
+    def create_hits(self, hit_count, hits, days=0):
+        with patch("django.utils.timezone.now", return_value=self.now - timedelta(days=days)):
+            for __ in range(hits):
+                Hit.objects.create(hitcount=hit_count)
+
+    def test_trending_score(self):
+        hit_count = self.hit_counts[0]
+        self.assertEqual(hit_count.trending_score(), 0)
+
+        self.create_hits(hit_count, 4, days=2)
+        self.create_hits(hit_count, 1)
+        Hit.objects.bulk_record(Hit(hitcount=hit_count, session="session") for __ in range(2))
+        hit_count.refresh_from_db()
+
+        with patch("django.utils.timezone.now", return_value=self.now):
+            self.assertAlmostEqual(hit_count.trending_score(), 4 / 4 + 1 + 2, places=3)
+        with patch("django.utils.timezone.now", return_value=self.now + timedelta(days=1)):
+            self.assertAlmostEqual(hit_count.trending_score(), 4 / 8 + 1 / 2 + 2 / 2, places=3)
+
+    def test_trending(self):
+        self.create_hits(self.hit_counts[0], 8, days=3)
+        self.create_hits(self.hit_counts[1], 2)
+        self.create_hits(self.hit_counts[2], 3, days=1)
+        HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        self.create_hits(HitCount.objects.create(content_object=self.hit_counts[0]), 10)
+
+        with self.assertNumQueries(1):
+            trending = list(HitCount.objects.trending(Post))
+
+        self.assertEqual(trending, [self.hit_counts[1], self.hit_counts[2], self.hit_counts[0]])
+        self.assertEqual(list(HitCount.objects.trending(Post, n=1)), [self.hit_counts[1]])
+
+    def test_disabled(self):
+        with patch.object(settings, "HITCOUNT_TRENDING", False):
+            self.create_hits(self.hit_counts[0], 1)
+
+        self.hit_counts[0].refresh_from_db()
+        self.assertIsNone(self.hit_counts[0].trending)
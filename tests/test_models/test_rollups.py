@@ -0,0 +1,180 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from blog.models import Post
+from hitcount.conf import settings
+from hitcount.managers.rollups import get_period_starts
+from hitcount.models import Hit
+from hitcount.models import HitRollup
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+NOW = datetime(2026, 10, 18, 14, 30, tzinfo=dt_timezone.utc)
+
+# minutes before NOW.
+HITS_AGO = [0, 10, 29, 45, 90, 150, 60 * 14 + 31, 60 * 24 + 5, 60 * 30, 60 * 24 * 3, 60 * 24 * 10, 60 * 24 * 40]
+
+WINDOWS = [
+    {"minutes": 30},
+    {"hours": 1},
+    {"hours": 2},
+    {"hours": 5},
+    {"days": 1},
+    {"days": 2},
+    {"days": 7},
+    {"days": 30},
+    {"days": 60},
+]
+
+
+@patch("django.utils.timezone.now", return_value=NOW)
+@patch.object(settings, "HITCOUNT_ROLLUPS", True)
+class TestHitRollup(TestCase):
+    def setUp(self):
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def create_hits(self):
+        for minutes in HITS_AGO:
+            with patch("django.utils.timezone.now", return_value=NOW - timedelta(minutes=minutes)):
+                Hit.objects.create(hitcount=self.hit_count)
+
+    def test_hits_in_last(self, mock_now):
+        for zone in ["UTC", "America/New_York", "Asia/Kolkata"]:
+            with timezone.override(zone):
+                Hit.objects.all().delete()
+                HitRollup.objects.all().delete()
+                self.create_hits()
+
+                for window in WINDOWS:
+                    with self.subTest(zone=zone, window=window):
+                        with patch.object(settings, "HITCOUNT_ROLLUPS", False):
+                            expected = self.hit_count.hits_in_last(**window)
+                        with self.assertNumQueries(2):
+                            self.assertEqual(self.hit_count.hits_in_last(**window), expected)
+
+    def test_rollups(self, mock_now):
+        self.create_hits()
+
+        hours = HitRollup.objects.filter(period=HitRollup.Period.HOUR)
+        days = HitRollup.objects.filter(period=HitRollup.Period.DAY)
+        self.assertEqual(hours.get(start=datetime(2026, 10, 18, 14, tzinfo=dt_timezone.utc)).hits, 3)
+        self.assertEqual(days.get(start=datetime(2026, 10, 18, tzinfo=dt_timezone.utc)).hits, 6)
+        self.assertEqual(sum(days.values_list("hits", flat=True)), len(HITS_AGO))
+
+    def test_counted_after_cleanup(self, mock_now):
+        self.create_hits()
+
+        Hit.objects.filter(created__lt=NOW - timedelta(hours=1)).delete()
+
+        self.assertEqual(self.hit_count.hits_in_last(days=7), 10)
+        self.assertEqual(self.hit_count.hits_in_last(hours=2), 5)
+        # only the hits in the hour the window starts in are missed.
+        self.assertEqual(self.hit_count.hits_in_last(hours=15), 6)
+
+    def test_counted_past_hourly_rollups(self, mock_now):
+        for _ in range(5):
+            with patch("django.utils.timezone.now", return_value=NOW - timedelta(days=40, hours=20)):
+                Hit.objects.create(hitcount=self.hit_count)
+        self.assertEqual(self.hit_count.hits_in_last(days=41), 5)
+
+        call_command("hitcount_cleanup", stdout=StringIO())
+
+        self.assertFalse(HitRollup.objects.filter(period=HitRollup.Period.HOUR).exists())
+        self.assertEqual(self.hit_count.hits_in_last(days=41), 5)
+        # the window starts at the start of its day.
+        self.assertEqual(self.hit_count.hits_in_last(days=40, hours=22), 5)
+
+    def test_deleted_hits(self, mock_now):
+        self.create_hits()
+
+        Hit.objects.order_by("created").last().delete()
+        # kept in the counts, like in the HitCount.
+        Hit.objects.order_by("created").first().delete(save_hitcount=True)
+
+        self.assertEqual(self.hit_count.hits_in_last(hours=1), 3)
+        self.assertEqual(self.hit_count.hits_in_last(days=60), len(HITS_AGO) - 1)
+
+    def test_bulk_record(self, mock_now):
+        Hit.objects.bulk_record(Hit(hitcount=self.hit_count, session="session") for _ in range(3))
+
+        self.assertEqual(HitRollup.objects.get(period=HitRollup.Period.HOUR).hits, 3)
+        self.assertEqual(self.hit_count.hits_in_last(minutes=5), 3)
+
+    def test_disabled(self, mock_now):
+        with patch.object(settings, "HITCOUNT_ROLLUPS", False):
+            self.create_hits()
+
+        self.assertFalse(HitRollup.objects.exists())
+
+    def test_series(self, mock_now):
+        self.create_hits()
+
+        series = self.hit_count.series(since=NOW - timedelta(days=3))
+        self.assertEqual(
+            series,
+            [
+                (datetime(2026, 10, day, tzinfo=dt_timezone.utc), hits)
+                for day, hits in [(15, 1), (16, 0), (17, 3), (18, 6)]
+            ],
+        )
+
+        series = self.hit_count.series("hour", since=NOW - timedelta(hours=3))
+        self.assertEqual([hits for __, hits in series], [0, 1, 2, 3])
+        self.assertEqual(series[-1][0], datetime(2026, 10, 18, 14, tzinfo=dt_timezone.utc))
+
+        with self.assertRaises(ValueError):
+            self.hit_count.series("week", since=NOW)
+
+    def test_series_in_time_zone(self, mock_now):
+        with timezone.override("America/New_York"):
+            self.create_hits()
+
+            series = self.hit_count.series(since=NOW - timedelta(days=1))
+
+        self.assertEqual([start.hour for start, __ in series], [0, 0])
+        self.assertEqual([hits for __, hits in series], [3, 6])
+
+    def test_bulk_series(self, mock_now):
+        other = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        self.create_hits()
+        Hit.objects.create(hitcount=other)
+
+        with self.assertNumQueries(1):
+            series = HitCount.objects.series([self.hit_count, other], since=NOW - timedelta(days=1))
+
+        self.assertEqual([hits for __, hits in series[self.hit_count]], [3, 6])
+        self.assertEqual([hits for __, hits in series[other]], [0, 1])
+        self.assertEqual(
+            [hits for __, hits in HitCount.objects.model_series(Post, since=NOW - timedelta(days=1))], [3, 7]
+        )
+
+    def test_series_without_hit_count(self, mock_now):
+        hit_count = HitCount.objects.get_for_object(Post.objects.create(title="other", content="text"), create=False)
+
+        with self.assertNumQueries(0):
+            self.assertEqual([hits for __, hits in hit_count.series(since=NOW - timedelta(days=2))], [0, 0, 0])
+
+
+class TestGetPeriodStarts(TestCase):
+    def test_daylight_saving_time(self):
+        since = datetime(2026, 10, 31, 12, tzinfo=dt_timezone.utc)
+        until = datetime(2026, 11, 2, 12, tzinfo=dt_timezone.utc)
+
+        with timezone.override("America/New_York"):
+            days = get_period_starts(since, until, "day")
+            hours = get_period_starts(since, until, "hour")
+
+        self.assertEqual([(day.day, day.hour) for day in days], [(31, 0), (1, 0), (2, 0)])
+        self.assertEqual([day.utcoffset() for day in days], [timedelta(hours=-4)] * 2 + [timedelta(hours=-5)])
+        # every hour of the 25 hours long day is there, once.
+        self.assertEqual(len(hours), 49)
+        self.assertEqual(len({hour.astimezone(dt_timezone.utc) for hour in hours}), 49)
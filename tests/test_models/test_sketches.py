@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from blog.models import Post
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.models import VisitorSketch
+from hitcount.utils import get_hitcount_model
+
+
+HitCount = get_hitcount_model()
+
+
+@patch.object(settings, "HITCOUNT_UNIQUE_VISITORS", True)
+class TestVisitorSketch(TestCase):
+    def setUp(self):
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def create_hit(self, session, days_ago=0):
+        created = timezone.now() - timedelta(days=days_ago)
+        with patch("django.utils.timezone.now") as mock_now:
+            mock_now.return_value = created
+            return Hit.objects.create(hitcount=self.hit_count, session=session)
+
+    def test_unique_visitors(self):
+        for session, days_ago in [("a", 0), ("a", 0), ("b", 0), ("a", 3), ("c", 3), ("d", 10)]:
+            self.create_hit(session, days_ago)
+
+        self.assertEqual(self.hit_count.unique_visitors(), 4)
+        self.assertEqual(self.hit_count.unique_visitors(days=1), 2)
+        self.assertEqual(self.hit_count.unique_visitors(days=7), 3)
+        self.assertEqual(self.hit_count.unique_visitors(days=30), 4)
+        # one sketch for all the visitors and one per day.
+        self.assertEqual(VisitorSketch.objects.count(), 4)
+
+    def test_change_of_precision(self):
+        self.create_hit("a", days_ago=1)
+        with patch.object(settings, "HITCOUNT_UNIQUE_VISITORS_PRECISION", 14):
+            self.create_hit("b")
+            self.create_hit("a")
+
+            self.assertEqual(self.hit_count.unique_visitors(days=2), 2)
+            self.assertEqual(self.hit_count.unique_visitors(), 2)
+
+    def test_visitors_are_kept_after_cleanup(self):
+        self.create_hit("a")
+        self.create_hit("b")
+
+        Hit.objects.all().delete()
+
+        self.assertEqual(self.hit_count.unique_visitors(), 2)
+
+    def test_bulk_record(self):
+        Hit.objects.bulk_record(Hit(hitcount=self.hit_count, session=session) for session in "abcab")
+
+        self.assertEqual(self.hit_count.unique_visitors(), 3)
+        self.assertEqual(self.hit_count.unique_visitors(days=1), 3)
+
+    def test_no_visitors(self):
+        self.assertEqual(self.hit_count.unique_visitors(), 0)
+        self.assertEqual(self.hit_count.unique_visitors(days=7), 0)
+
+    def test_disabled(self):
+        with patch.object(settings, "HITCOUNT_UNIQUE_VISITORS", False):
+            self.create_hit("a")
+
+        self.assertFalse(VisitorSketch.objects.exists())
+        self.assertEqual(self.hit_count.unique_visitors(), 0)
+
+    def test_precision_of_existing_sketches_is_kept(self):
+        with patch.object(settings, "HITCOUNT_UNIQUE_VISITORS_PRECISION", 8):
+            self.create_hit("a")
+
+        self.create_hit("b")
+
+        self.assertEqual(self.hit_count.unique_visitors(), 2)
+        self.assertEqual(len(VisitorSketch.objects.filter(day__isnull=True).get().registers), 256)
@@ -0,0 +1,108 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.models import HitCount
+from hitcount.recent import MinuteRing
+from hitcount.recent import RecentHits
+from hitcount.recent import get_minute
+from hitcount.recent import recent_hits
+
+
+NOW = datetime(2026, 10, 18, 14, 30, 30, tzinfo=dt_timezone.utc)
+
+
+class TestMinuteRing(TestCase):
+    def test_ring(self):
+        ring = MinuteRing(3)
+        for minute in [10, 10, 11, 12]:
+            ring.add(minute)
+
+        self.assertEqual(ring.count_since(11), 2)
+        # the slot of the minute 10 is reused.
+        ring.add(13, 5)
+        self.assertEqual(ring.count_since(0), 7)
+
+        self.assertEqual(sorted(ring.drain()), [(11, 1), (12, 1), (13, 5)])
+        self.assertEqual(ring.count_since(0), 0)
+
+
+@patch("django.utils.timezone.now", return_value=NOW)
+@patch.object(settings, "HITCOUNT_RECENT_HITS_CACHE", "default")
+@patch.object(settings, "HITCOUNT_RECENT_HITS_MINUTES", 10)
+@patch.object(settings, "HITCOUNT_RECENT_HITS_FLUSH_INTERVAL", 0)
+class TestRecentHits(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(recent_hits.flush)
+        self.hit_count = HitCount.objects.create(content_object=Post.objects.create(title="my title", content="text"))
+
+    def create_hits(self, minutes_ago):
+        for minutes in minutes_ago:
+            with patch("django.utils.timezone.now", return_value=NOW - timedelta(minutes=minutes)):
+                Hit.objects.create(hitcount=self.hit_count)
+
+    def test_hits_in_last(self, mock_now):
+        self.create_hits([12, 8, 4, 4, 0.5, 0])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.hit_count.hits_in_last(minutes=5), 4)
+            self.assertEqual(self.hit_count.hits_in_last(minutes=1), 2)
+            self.assertEqual(self.hit_count.hits_in_last(minutes=9), 5)
+
+        # the counts don't go back further than the first hit, nor than the ring.
+        self.assertNumQueries(1, self.hit_count.hits_in_last, minutes=10)
+        self.assertNumQueries(1, self.hit_count.hits_in_last, hours=1)
+
+    def test_counted_since_the_first_hit(self, mock_now):
+        self.create_hits([2])
+
+        self.assertNumQueries(1, self.hit_count.hits_in_last, minutes=3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.hit_count.hits_in_last(minutes=2), 1)
+
+    def test_merged_through_the_cache(self, mock_now):
+        worker = RecentHits()
+        worker.record([Hit(hitcount=self.hit_count, created=NOW - timedelta(minutes=minutes)) for minutes in [3, 1]])
+        self.create_hits([2])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.hit_count.hits_in_last(minutes=3), 3)
+
+    def test_pending_hits(self, mock_now):
+        worker = RecentHits()
+        with patch.object(settings, "HITCOUNT_RECENT_HITS_FLUSH_INTERVAL", 60):
+            worker.record([Hit(hitcount=self.hit_count, created=NOW - timedelta(minutes=3))])
+            worker.flush()
+            worker.record([Hit(hitcount=self.hit_count, created=NOW)])
+
+        # the hits of the other processes are only seen once they are flushed.
+        self.assertEqual(recent_hits.count(self.hit_count, NOW - timedelta(minutes=3)), 1)
+        self.assertEqual(worker.count(self.hit_count, NOW - timedelta(minutes=3)), 2)
+
+    @patch.object(settings, "HITCOUNT_RECENT_HITS_MAX_OBJECTS", 1)
+    def test_least_recently_hit_dropped(self, mock_now):
+        other = HitCount.objects.create(content_object=Post.objects.create(title="other", content="text"))
+        worker = RecentHits()
+
+        with patch.object(settings, "HITCOUNT_RECENT_HITS_FLUSH_INTERVAL", 60):
+            worker.record([Hit(hitcount=self.hit_count, created=NOW), Hit(hitcount=other, created=NOW)])
+
+        self.assertEqual(list(worker._rings), [other.pk])
+        self.assertIsNone(cache.get(worker.make_key(self.hit_count.pk, get_minute(NOW))))
+        worker.flush()
+        self.assertEqual(cache.get(worker.make_key(self.hit_count.pk, get_minute(NOW))), 1)
+        self.assertEqual(cache.get(worker.make_key(other.pk, get_minute(NOW))), 1)
+
+    def test_disabled(self, mock_now):
+        with patch.object(settings, "HITCOUNT_RECENT_HITS_CACHE", None):
+            self.create_hits([0])
+
+        self.assertIsNone(recent_hits.count(self.hit_count, NOW - timedelta(minutes=5)))
@@ -9,6 +9,7 @@ from django.test import TestCase
 from django.utils import timezone
 
 from blog.models import Post
+from hitcount.conf import settings
 from hitcount.models import Hit
 from hitcount.utils import get_hitcount_model
 
@@ -42,18 +43,24 @@ class TestGetHitCount(BaseTemplateTagsTest):
         {% get_hit_count for post%}
 
         If no HitCount object exists, the template tag should return zero
-        and have created an object for the next time.
+        without creating one.
         """
-        # no HitCounts to start
         self.assertEqual(HitCount.objects.all().count(), 1)
 
         post2 = Post.objects.create(title="second", content="post!")
 
         out = Template("{% load hitcount_tags %}{% get_hit_count for post %}").render(Context({"post": post2}))
 
-        # zero hits, but now one object
+        # zero hits, and still no object
         self.assertEqual(str(0), out)
-        self.assertEqual(HitCount.objects.all().count(), 2)
+        self.assertEqual(HitCount.objects.all().count(), 1)
+
+        out = Template('{% load hitcount_tags %}{% get_hit_count for post within "days=1" %}').render(
+            Context({"post": post2})
+        )
+
+        self.assertEqual(str(0), out)
+        self.assertEqual(HitCount.objects.all().count(), 1)
 
     def test_returns_10(self):
         """
@@ -214,6 +221,135 @@ class TestGetHitCountJSVariables(BaseTemplateTagsTest):
         )
 
 
+class TestGetUniqueVisitors(BaseTemplateTagsTest):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        hit_count = HitCount.objects.get_for_object(cls.post)
+        created = timezone.now() - timedelta(days=10)
+        with patch.object(settings, "HITCOUNT_UNIQUE_VISITORS", True):
+            Hit.objects.create(hitcount=hit_count, session="a")
+            Hit.objects.create(hitcount=hit_count, session="b")
+            with patch("django.utils.timezone.now") as mock_now:
+                mock_now.return_value = created
+                Hit.objects.create(hitcount=hit_count, session="c")
+
+    def test_usage(self):
+        out = self._render("{% load hitcount_tags %}{% get_unique_visitors for post %}", {"post": self.post})
+
+        self.assertEqual("3", out)
+
+    def test_within(self):
+        out = self._render(
+            "{% load hitcount_tags %}{% get_unique_visitors for post within days %}", {"post": self.post, "days": 7}
+        )
+
+        self.assertEqual("2", out)
+
+    def test_within_as_variable(self):
+        out = self._render(
+            "{% load hitcount_tags %}{% get_unique_visitors for post within 7 as visitors %}Visitors: {{ visitors }}",
+            {"post": self.post},
+        )
+
+        self.assertEqual("Visitors: 2", out)
+
+    def test_parsing_errors(self):
+        for template in [
+            "{% load hitcount_tags %}{% get_unique_visitors for post within %}",
+            "{% load hitcount_tags %}{% get_unique_visitors post %}",
+        ]:
+            with self.subTest(template=template), self.assertRaises(TemplateSyntaxError):
+                self._render(template, {"post": self.post})
+
+        with self.assertRaises(TemplateSyntaxError):
+            self._render("{% load hitcount_tags %}{% get_unique_visitors for post within week %}", {"post": self.post})
+
+
+class TestPrefetchHitCounts(BaseTemplateTagsTest):
+    def test_usage(self):
+        posts = list(Post.objects.order_by("pk"))
+        hits = ["10" if post == self.post else "0" for post in posts]
+
+        with self.assertNumQueries(1):
+            out = self._render(
+                "{% load hitcount_tags %}{% prefetch_hit_counts posts %}"
+                "{% for post in posts %}{% get_hit_count for post %},{% endfor %}",
+                {"posts": posts},
+            )
+
+        self.assertEqual(out, ",".join(hits) + ",")
+        self.assertEqual(HitCount.objects.count(), 1)
+
+    def test_js_variables(self):
+        with self.assertNumQueries(1):
+            self._render(
+                "{% load hitcount_tags %}{% prefetch_hit_counts posts %}"
+                "{% get_hit_count_js_variables for post as hit_count_js %}{{ hit_count_js.hits }}",
+                {"posts": [self.post], "post": self.post},
+            )
+
+        # the HitCount objects missing from the prefetch are created for their pk.
+        post = Post.objects.exclude(pk=self.post.pk).first()
+        out = self._render(
+            "{% load hitcount_tags %}{% prefetch_hit_counts posts %}"
+            "{% get_hit_count_js_variables for post as hit_count_js %}{{ hit_count_js.pk }}",
+            {"posts": [post], "post": post},
+        )
+
+        self.assertEqual(out, str(HitCount.objects.get_for_object(post, create=False).pk))
+
+    def test_parsing_errors(self):
+        for template, context in [
+            ("{% load hitcount_tags %}{% prefetch_hit_counts %}", {}),
+            ("{% load hitcount_tags %}{% prefetch_hit_counts posts %}", {}),
+            ("{% load hitcount_tags %}{% prefetch_hit_counts posts %}", {"posts": ["bob the baker"]}),
+        ]:
+            with self.subTest(template=template, context=context), self.assertRaises(TemplateSyntaxError):
+                self._render(template, context)
+
+
+class TestGetTopHitCounts(BaseTemplateTagsTest):
+    def setUp(self):
+        self.other = Post.objects.exclude(pk=self.post.pk).first()
+        HitCount.objects.create(content_object=self.other, hits=3)
+
+    def test_usage(self):
+        template = (
+            "{% load hitcount_tags %}{% get_top_hit_counts for model limit 2 as top %}"
+            "{% for entry in top %}{{ entry.hit_count.content_object.pk }}:{{ entry.hits }},{% endfor %}"
+        )
+
+        # the HitCounts, then the posts.
+        with self.assertNumQueries(2):
+            out = self._render(template, {"model": Post})
+
+        self.assertEqual(out, "%s:10,%s:3," % (self.post.pk, self.other.pk))
+        self.assertEqual(self._render(template, {"model": self.post}), out)
+
+    def test_model_label(self):
+        out = self._render(
+            '{% load hitcount_tags %}{% get_top_hit_counts for "blog.post" within "minutes=40" as top %}'
+            "{% for entry in top %}{{ entry.hits }},{% endfor %}",
+            {},
+        )
+
+        self.assertEqual(out, "3,")
+
+    def test_parsing_errors(self):
+        for template, context in [
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model %}", {}),
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model limit as top %}", {}),
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model limit 2 limit 3 as top %}", {}),
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model with 2 as top %}", {}),
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model as top %}", {}),
+            ('{% load hitcount_tags %}{% get_top_hit_counts for "blog.author" as top %}', {}),
+            ("{% load hitcount_tags %}{% get_top_hit_counts for model limit n as top %}", {"model": Post, "n": "x"}),
+        ]:
+            with self.subTest(template=template, context=context), self.assertRaises(TemplateSyntaxError):
+                self._render(template, context)
+
+
 class TestInsertHitCountJSVariables(BaseTemplateTagsTest):
     def test_usage(self):
         """
@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.template import Context
+from django.template import Template
+from django.test import RequestFactory
+from django.test import TestCase
+
+from blog.models import Post
+from hitcount.conf import settings
+from hitcount.models import Hit
+from hitcount.models import HitCount
+from hitcount.totals import hit_totals
+from hitcount.views import HitCountDetailView
+
+
+@patch.object(settings, "HITCOUNT_TOTALS_CACHE", "default")
+class TestHitTotals(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.post = Post.objects.create(title="my title", content="text")
+        self.hit_count = HitCount.objects.create(content_object=self.post, hits=5)
+        # the content type is cached.
+        ContentType.objects.get_for_model(Post)
+
+    def test_get(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 5))
+        with self.assertNumQueries(0):
+            self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 5))
+
+    def test_incremented_with_hit_counts(self):
+        hit_totals.get(self.post)
+
+        Hit.objects.create(hitcount=self.hit_count)
+        self.hit_count.decrease(2)
+        HitCount.objects.filter(pk=self.hit_count.pk).update(hits=10)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 4))
+
+    def test_incr_without_cached_total(self):
+        hit_totals.incr(self.hit_count)
+
+        self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 5))
+
+    def test_stale_total(self):
+        hit_totals.get(self.post)
+        HitCount.objects.filter(pk=self.hit_count.pk).update(hits=10)
+        stale = time.time() + settings.HITCOUNT_TOTALS_CACHE_TIMEOUT + 1
+
+        with patch("hitcount.totals.time.time", return_value=stale):
+            # the first caller reads the total again, while the others get the stale one.
+            with patch.object(hit_totals.cache, "add", return_value=False), self.assertNumQueries(0):
+                self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 5))
+            with self.assertNumQueries(1):
+                self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 10))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(hit_totals.get(self.post), (self.hit_count.pk, 10))
+
+    def test_object_without_hit_count(self):
+        post = Post.objects.create(title="other", content="text")
+
+        self.assertEqual(hit_totals.get(post), (None, 0))
+        self.assertFalse(HitCount.objects.filter(object_pk=post.pk).exists())
+
+        pk, hits = hit_totals.get(post, create=True)
+        self.assertEqual(pk, HitCount.objects.get(object_pk=post.pk).pk)
+        self.assertEqual(hits, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(hit_totals.get(post, create=True), (pk, 0))
+
+    def test_template_tags(self):
+        template = Template(
+            "{% load hitcount_tags %}{% get_hit_count for post %} "
+            "{% get_hit_count_js_variables for post as js %}{{ js.pk }} {{ js.hits }}"
+        )
+        context = Context({"post": self.post})
+        expected = "5 %s 5" % self.hit_count.pk
+
+        self.assertEqual(template.render(context), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(template.render(context), expected)
+
+    def test_detail_view(self):
+        request = RequestFactory().get("/")
+        view = HitCountDetailView.as_view(model=Post)
+
+        view(request, pk=self.post.pk)
+        # only the post is read.
+        with self.assertNumQueries(1):
+            response = view(request, pk=self.post.pk)
+
+        self.assertEqual(response.context_data["hitcount"], {"pk": self.hit_count.pk, "total_hits": 5})
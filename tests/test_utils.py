@@ -1,9 +1,17 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import User
+
 from blog.models import Post
 from hitcount.conf import settings
 from hitcount.models import HitCount
 from hitcount.utils import _get_model_from_string
 from hitcount.utils import get_hitcount_model
 from hitcount.utils import get_ip
+from hitcount.utils import get_ip_networks
+from hitcount.utils import get_trie_pattern
+from hitcount.utils import get_visitor_hash
+from hitcount.utils import normalize_ip_network
 
 
 class TestGetIP:
@@ -19,6 +27,20 @@ class TestGetIP:
 
         assert ip == "203.0.113.195"
 
+    def test_x_forwarded_list(self, rf):
+        rf.defaults["HTTP_X_FORWARDED_FOR"] = "203.0.113.195, 70.41.3.18, 150.172.238.178"
+
+        ip = get_ip(rf.get("/"))
+
+        assert ip == "203.0.113.195"
+
+    def test_ipv6(self, rf):
+        rf.defaults["HTTP_X_FORWARDED_FOR"] = "2001:DB8::1, 2001:db8::2"
+
+        ip = get_ip(rf.get("/"))
+
+        assert ip == "2001:db8::1"
+
     def test_neither_remote_addr_nor_x_forwarded_set(self, rf):
         rf.defaults["REMOTE_ADDR"] = ""
 
@@ -34,6 +56,25 @@ class TestGetIP:
         assert ip == "10.0.0.1"
 
 
+class TestGetVisitorHash:
+    def test_anonymous_user(self, rf):
+        request = rf.get("/", REMOTE_ADDR="203.0.113.195")
+        visitor_hash = get_visitor_hash(request, AnonymousUser(), "agent")
+
+        assert len(visitor_hash) == 40
+        assert visitor_hash == get_visitor_hash(request, AnonymousUser(), "agent")
+        assert visitor_hash != get_visitor_hash(request, AnonymousUser(), "other agent")
+        assert visitor_hash != get_visitor_hash(rf.get("/", REMOTE_ADDR="203.0.113.196"), None, "agent")
+
+    def test_authenticated_user(self, rf):
+        user = User(pk=1)
+
+        assert get_visitor_hash(rf.get("/"), user, "agent") == get_visitor_hash(
+            rf.get("/", REMOTE_ADDR="203.0.113.195"), user, "other agent"
+        )
+        assert get_visitor_hash(rf.get("/"), user, "agent") != get_visitor_hash(rf.get("/"), User(pk=2), "agent")
+
+
 class TestGetModelFromString:
     def test(self):
         assert _get_model_from_string("hitcount.HitCount") == HitCount
@@ -44,3 +85,41 @@ class TestGetHitCountModel:
         monkeypatch.setattr(settings, "HITCOUNT_HITCOUNT_MODEL", "blog.Post")
 
         assert get_hitcount_model() == Post
+
+
+class TestNormalizeIPNetwork:
+    def test_address(self):
+        assert normalize_ip_network(" 2001:DB8::1/128 ") == "2001:db8::1"
+
+    def test_network(self):
+        assert normalize_ip_network("10.1.2.3/8") == "10.0.0.0/8"
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            normalize_ip_network("10.1.2.3/33")
+
+
+class TestGetIPNetworks:
+    def test_ipv4(self):
+        networks = get_ip_networks("10.1.2.3")
+
+        assert len(networks) == 33
+        assert networks[:2] == ["10.1.2.3", "10.1.2.2/31"]
+        assert networks[-1] == "0.0.0.0/0"
+
+    def test_ipv6(self):
+        networks = get_ip_networks("2001:db8::1")
+
+        assert len(networks) == 129
+        assert "2001:db8::/32" in networks
+
+    def test_invalid(self):
+        assert get_ip_networks("not an ip") == ["not an ip"]
+
+
+class TestGetTriePattern:
+    def test(self):
+        assert get_trie_pattern(["bot", "bots", "boa", "crawl"]) == "(?:bo(?:a|t)|crawl)"
+
+    def test_special_characters_are_escaped(self):
+        assert get_trie_pattern(["a.b"]) == r"a\.b"
@@ -6,12 +6,18 @@ from django.contrib.auth.models import AnonymousUser
 from django.http import Http404
 from django.test import RequestFactory
 from django.test import TestCase
+from django.test.client import MULTIPART_CONTENT
+from django.utils import timezone
 
 from blog.models import Post
 from hitcount.conf import settings
+from hitcount.models import Hit
 from hitcount.utils import get_hitcount_model
+from hitcount.views import AsyncHitCountJSONView
+from hitcount.views import HitCountBatchView
 from hitcount.views import HitCountDetailView
 from hitcount.views import HitCountJSONView
+from hitcount.views import HitCountSeriesView
 
 HitCount = get_hitcount_model()
 
@@ -65,7 +71,9 @@ class TestHitCountJSONView(BaseHitCountViewTest):
         """
         response = HitCountJSONView.as_view()(self.request_post)
 
-        self.assertEqual(response.content, b'{"hit_counted": true, "hit_message": "Hit counted: session key"}')
+        self.assertEqual(
+            response.content, b'{"hit_counted": true, "hit_message": "Hit counted: session key", "total_hits": 1}'
+        )
 
     def test_count_hit_invalid_hitcount_pk(self):
         """
@@ -85,6 +93,148 @@ class TestHitCountJSONView(BaseHitCountViewTest):
         self.assertEqual(response.content, b"HitCount object_pk not present.")
 
 
+class TestAsyncHitCountJSONView(BaseHitCountViewTest):
+    async def test_require_post_only(self):
+        response = await AsyncHitCountJSONView.as_view()(self.request_get)
+
+        self.assertEqual(
+            json.loads(response.content), {"error_message": "Hits counted via POST only.", "success": False}
+        )
+
+    async def test_count_hit(self):
+        response = await AsyncHitCountJSONView.as_view()(self.request_post)
+
+        self.assertEqual(
+            response.content, b'{"hit_counted": true, "hit_message": "Hit counted: session key", "total_hits": 1}'
+        )
+
+    async def test_count_hit_invalid_hitcount_pk(self):
+        self.request_post.POST = self.request_post.POST.copy()
+        self.request_post.POST["hitcountPK"] = 15
+
+        response = await AsyncHitCountJSONView.as_view()(self.request_post)
+
+        self.assertEqual(response.content, b"HitCount object_pk not present.")
+
+
+class TestHitCountBatchView(BaseHitCountViewTest):
+    def setUp(self):
+        super().setUp()
+        self.other_hit_count = HitCount.objects.create(
+            content_object=Post.objects.create(title="other", content="text")
+        )
+
+    def post_hits(self, data, content_type=MULTIPART_CONTENT, **initkwargs):
+        request = self.factory.post("/", data, content_type=content_type, REMOTE_ADDR="127.0.0.1")
+        request.session = self.store
+        request.user = AnonymousUser()
+        return HitCountBatchView.as_view(**initkwargs)(request)
+
+    def test_count_hits(self):
+        pks = [self.hit_count.pk, self.other_hit_count.pk]
+        expected = {
+            str(pk): {"hit_counted": True, "hit_message": "Hit counted: session key", "total_hits": 1} for pk in pks
+        }
+
+        for data, content_type in [
+            ({"hitcountPK": pks}, MULTIPART_CONTENT),
+            ({"hitcountPK": "%s,%s" % tuple(pks)}, MULTIPART_CONTENT),
+            ({"hitcountPKs": pks}, "application/json"),
+        ]:
+            with self.subTest(data=data, content_type=content_type):
+                Hit.objects.all().delete()
+                HitCount.objects.update(hits=0)
+
+                response = self.post_hits(data, content_type)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected)
+                self.assertEqual(Hit.objects.count(), 2)
+
+    def test_empty_response(self):
+        response = self.post_hits({"hitcountPK": [self.hit_count.pk, 15]}, empty_response=True)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(Hit.objects.get().hitcount, self.hit_count)
+
+    def test_invalid_hitcount_pks(self):
+        for data, content_type in [
+            ({"hitcountPK": "1,two"}, MULTIPART_CONTENT),
+            ("not json", "application/json"),
+            ({"hitcountPKs": 1}, "application/json"),
+        ]:
+            with self.subTest(data=data, content_type=content_type):
+                response = self.post_hits(data, content_type)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.content, b"Invalid HitCount object_pks.")
+
+    def test_unknown_hitcount_pks(self):
+        response = self.post_hits({"hitcountPK": [15, 16]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b"HitCount object_pk not present.")
+
+    def test_too_many_hitcount_pks(self):
+        response = self.post_hits({"hitcountPK": ",".join(map(str, range(1, 102)))})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b"Too many HitCount object_pks.")
+
+
+class TestHitCountSeriesView(BaseHitCountViewTest):
+    def setUp(self):
+        super().setUp()
+        self.other_hit_count = HitCount.objects.create(
+            content_object=Post.objects.create(title="other", content="text")
+        )
+        with patch.object(settings, "HITCOUNT_ROLLUPS", True):
+            for hit_count, hits in [(self.hit_count, 2), (self.other_hit_count, 1)]:
+                Hit.objects.bulk_record(Hit(hitcount=hit_count, session="session") for __ in range(hits))
+
+    def get_series(self, data):
+        return HitCountSeriesView.as_view()(self.factory.get("/", data))
+
+    def test_series(self):
+        pks = [self.other_hit_count.pk, self.hit_count.pk]
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        response = self.get_series({"hitcountPK": "%s,%s" % tuple(pks), "last": 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "max-age=60")
+        data = json.loads(response.content)
+        self.assertEqual(data["interval"], "day")
+        self.assertEqual(data["starts"][-1], today.isoformat())
+        self.assertEqual(len(data["starts"]), 3)
+        self.assertEqual(data["series"], {str(pks[0]): [0, 0, 1], str(pks[1]): [0, 0, 2]})
+
+    def test_model_series(self):
+        response = self.get_series({"model": "blog.post", "interval": "hour", "last": 2})
+
+        self.assertEqual(json.loads(response.content)["series"], {"blog.post": [0, 3]})
+
+    def test_invalid_parameters(self):
+        for data, message in [
+            ({"hitcountPK": "1,two"}, b"Invalid HitCount object_pks or number of intervals."),
+            ({"hitcountPK": self.hit_count.pk, "last": "x"}, b"Invalid HitCount object_pks or number of intervals."),
+            ({"hitcountPK": self.hit_count.pk, "last": 0}, b"Invalid interval or number of intervals."),
+            ({"hitcountPK": self.hit_count.pk, "last": 1001}, b"Invalid interval or number of intervals."),
+            ({"hitcountPK": self.hit_count.pk, "interval": "week"}, b"Invalid interval or number of intervals."),
+            ({"hitcountPK": ",".join(map(str, range(1, 102)))}, b"Too many HitCount object_pks."),
+            ({"hitcountPK": 1500}, b"HitCount object_pk not present."),
+            ({}, b"HitCount object_pk not present."),
+            ({"model": "blog.author"}, b"Invalid model."),
+            ({"model": "blog"}, b"Invalid model."),
+        ]:
+            with self.subTest(data=data):
+                response = self.get_series(data)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.content, message)
+
+
 class TestHitCountDetailView(BaseHitCountViewTest):
     def test_count_hit(self):
         """
@@ -125,3 +275,15 @@ class TestHitCountDetailView(BaseHitCountViewTest):
 
         self.assertEqual(response.context_data["hitcount"]["total_hits"], 1)
         self.assertEqual(response.context_data["hitcount"]["pk"], self.hit_count.pk)
+
+    def test_count_hit_reports_fresh_total(self):
+        """
+        The total includes the hits counted since the HitCount was read.
+        """
+        view = HitCountDetailView.as_view(model=Post, count_hit=True)
+        HitCount.objects.filter(pk=self.hit_count.pk).update(hits=10)
+
+        with patch.object(HitCount.objects, "get_for_object", return_value=self.hit_count):
+            response = view(self.request_get, pk=self.post.pk)
+
+        self.assertEqual(response.context_data["hitcount"]["total_hits"], 11)